@@ -1,12 +1,11 @@
 import pygame
 import sys
-import random
-import time
-import json
-import os
 
-# Initialize pygame
-pygame.init()
+import puzzle_bank
+import puzzle_pool
+import snapshot
+import sudoku_generator
+from sudoku_core import Sudoku, get_score_store
 
 # Colors
 WHITE = (255, 255, 255)
@@ -28,247 +27,178 @@ GRID_SIZE = 9
 CELL_SIZE = 600 // GRID_SIZE
 GRID_OFFSET = 300
 
-# Fonts
-FONT = pygame.font.SysFont('Arial', 40)
-SMALL_FONT = pygame.font.SysFont('Arial', 20)
-NOTE_FONT = pygame.font.SysFont('Arial', 15)
-TITLE_FONT = pygame.font.SysFont('Arial', 50)
-
-# Create screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('Sudoku')
-
-# High scores file
-HIGH_SCORES_FILE = "sudoku_scores.json"
-
-class Sudoku:
-	def __init__(self, difficulty=0.5):
-		self.board = [[0 for _ in range(9)] for _ in range(9)] # Khởi tạo bảng chơi toàn số 0
-		self.solution = [[0 for _ in range(9)] for _ in range(9)] # Lưu lời giả hoàn chỉnh
-		self.user_input = [[0 for _ in range(9)] for _ in range(9)] # Ghi lại số người chơi đã nhập
-		self.notes = [[[False for _ in range(9)] for _ in range(9)] for _ in range(9)] # Ghi lại ghi chú
-		self.locked = [[False for _ in range(9)] for _ in range(9)] # Ô là số gốc thì không thể sửa
-		self.incorrect_cells = set() # Tập hợp chứa tọa độ các ô nhập sai
-		self.selected = None # Tọa độ của ô đang được chọn 
-		self.start_time = time.time() # Thời gian bắt đầu chơi (để tính giờ)
-		self.elapsed_time = 0 # Thời gian đã chơi (tính đến hiện tại)
-		self.mistakes = 0 # Số lần nhập sai
-		self.game_over = False # Cờ báo hiệu trò chơi kết thúc hay chưa
-		self.difficulty = difficulty # Mức độ khó của trò chơi
-		self.history = [] # Lưu lịch sử thao tác (để hoàn tác)
-		self.generate_board(difficulty) # Sinh bảng theo độ khó
-		
-	def generate_board(self, difficulty):
-		# Reset board
-		self.board = [[0 for _ in range(9)] for _ in range(9)]
-		
-		# Fill diagonal boxes randomly
-		self.fill_diagonal()
-		
-		# Solve the complete board
-		self.solve_board(self.board)
-		
-		# Save the solution
-		for i in range(9):
-			for j in range(9):
-				self.solution[i][j] = self.board[i][j]
-		
-		# Set difficulty levels
-		difficulty_levels = {
-			"easy": 0.5,    # Remove ~50% of numbers
-			"medium": 0.6,   # Remove ~60% of numbers
-			"hard": 0.7      # Remove ~70% of numbers
-		}
-		
-		if isinstance(difficulty, str):
-			difficulty = difficulty_levels.get(difficulty, 0.6)
-		
-		# Prepare cells to remove
-		cells = [(i, j) for i in range(9) for j in range(9)]
-		random.shuffle(cells)
-		to_remove = int(81 * difficulty)
-		
-		# Remove numbers to create puzzle
-		for i in range(to_remove):
-			row, col = cells[i]
-			self.board[row][col] = 0
-	
-	def fill_diagonal(self):
-		"""Fill the diagonal 3x3 boxes with random numbers"""
-		for box in range(0, 9, 3):
-			nums = list(range(1, 10))
-			random.shuffle(nums)
-			for i in range(3):
-				for j in range(3):
-					self.board[box + i][box + j] = nums.pop()
-	
-	def is_valid(self, board, row, col, num):
-		# Check row
-		if num in board[row]:
-			return False
-		
-		# Check column
-		for i in range(9):
-			if board[i][col] == num:
-				return False
-		
-		# Check 3x3 box
-		start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-		for i in range(3):
-			for j in range(3):
-				if board[start_row + i][start_col + j] == num:
-					return False
-		
-		return True
-	
-	def solve_board(self, board):
-		for row in range(9):
-			for col in range(9):
-				if board[row][col] == 0:
-					for num in random.sample(range(1, 10), 9):  # Try numbers in random order
-						if self.is_valid(board, row, col, num):
-							board[row][col] = num
-							if self.solve_board(board):
-								return True
-							board[row][col] = 0
-					return False
-		return True
-	
-	def place_number(self, row, col, num):
-		if self.locked[row][col]:
-			return False  # Không cho sửa ô đã bị khóa
-		
-		self.save_state()
-		
-		# Clear any notes for this cell
-		for i in range(9):
-			self.notes[row][col][i] = False
-		
-		if num == 0:
-			self.user_input[row][col] = 0
-			self.incorrect_cells.discard((row, col))
-			return True
-		
-		if self.solution[row][col] == num:
-			self.user_input[row][col] = num
-			self.incorrect_cells.discard((row, col))
-			self.locked[row][col] = True
-			return True
-		else:
-			self.user_input[row][col] = num
-			self.incorrect_cells.add((row, col))
-			self.mistakes += 1
-			return False
-	
-	def toggle_note(self, row, col, num):
-		if self.locked[row][col]:
-			return 
-
-		if self.board[row][col] == 0 and self.user_input[row][col] == 0:
-			self.save_state()
-			self.notes[row][col][num-1] = not self.notes[row][col][num-1]
-	
-	def clear_notes(self, row, col):
-		if any(self.notes[row][col]):
-			self.save_state()
-			for i in range(9):
-				self.notes[row][col][i] = False
-	
-	def save_state(self):
-		state = {
-			'user_input': [row[:] for row in self.user_input],
-			'notes': [[col[:] for col in row] for row in self.notes],
-			'incorrect_cells': set(self.incorrect_cells),
-			'mistakes': self.mistakes
-		}
-		self.history.append(state)
-	
-	def undo(self):
-		if self.history:
-			state = self.history.pop()
-			self.user_input = [row[:] for row in state['user_input']]
-			self.notes = [[col[:] for col in row] for row in state['notes']]
-			self.incorrect_cells = set(state['incorrect_cells'])
-	
-	def is_complete(self):
-		for row in range(9):
-			for col in range(9):
-				if self.board[row][col] == 0 and (row, col) not in self.incorrect_cells and self.user_input[row][col] == 0:
-					return False
-		self.game_over = True
-		self.save_score()
-		return True
-	
-	def save_score(self):
-		scores = self.load_scores()
-		
-		score_entry = {
-			'time': int(self.elapsed_time),
-			'mistakes': self.mistakes,
-			'difficulty': self.difficulty,
-			'date': time.strftime("%Y-%m-%d %H:%M:%S")
-		}
-		
-		if isinstance(self.difficulty, str):
-			diff_key = self.difficulty
-		else:
-			if self.difficulty < 0.55:
-				diff_key = "easy"
-			elif self.difficulty < 0.65:
-				diff_key = "medium"
-			else:
-				diff_key = "hard"
-		
-		if diff_key not in scores:
-			scores[diff_key] = []
-		
-		scores[diff_key].append(score_entry)
-		scores[diff_key].sort(key=lambda x: (x['time'], x['mistakes']))
-		scores[diff_key] = scores[diff_key][:10]
-		
-		with open(HIGH_SCORES_FILE, 'w') as f:
-			json.dump(scores, f)
-	
-	def load_scores(self):
-		try:
-			if os.path.exists(HIGH_SCORES_FILE):
-				with open(HIGH_SCORES_FILE, 'r') as f:
-					return json.load(f)
-		except:
-			pass
-		return {}
-	
-	def update_time(self):
-		if not self.game_over:
-			self.elapsed_time = time.time() - self.start_time
+# Board sizes on offer; GRID_SIZE, BOX_SIZE, CELL_SIZE and GRID_WIDTH follow
+# the current game (see set_board_size)
+BOARD_SIZES = (9, 16, 25)
+BOX_SIZE = 3
+GRID_WIDTH = CELL_SIZE * GRID_SIZE
 
-def draw_grid():
+# How digits are shown: 10 and up are letters, as on the usual 16x16 boards
+DIGIT_SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+
+# Screen regions repainted on their own
+CONTROLS_RECT = pygame.Rect(0, 0, GRID_OFFSET, SCREEN_HEIGHT - 70)
+STATUS_RECT = pygame.Rect(0, SCREEN_HEIGHT - 70, GRID_OFFSET, 70)
+
+# Frame pacing: the loop sleeps in pygame.event.wait() while nothing happens,
+# caps bursts of input at FPS and gets a TIMER_EVENT once a second for the clock
+FPS = 30
+TIMER_EVENT = pygame.USEREVENT + 1
+
+# Solve mode (S) runs the solver a slice per frame: a search node on 9x9 (its
+# singles fill many cells at once), a row's worth of placements on larger
+# boards, and never more than half a frame
+SOLVE_SECONDS = 0.5 / FPS
+
+# Fonts and the window, created by init_display() so importing this module
+# does not start pygame
+FONT = None
+SMALL_FONT = None
+NOTE_FONT = None
+TITLE_FONT = None
+screen = None
+
+def init_display():
+	# Initialize pygame, load the fonts, open the window and pre-render the board
+	global FONT, SMALL_FONT, NOTE_FONT, TITLE_FONT, screen
+	if screen is not None:
+		return
+	pygame.init()
+	FONT = pygame.font.SysFont('Arial', 40)
+	SMALL_FONT = pygame.font.SysFont('Arial', 20)
+	NOTE_FONT = pygame.font.SysFont('Arial', 15)
+	TITLE_FONT = pygame.font.SysFont('Arial', 50)
+	screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+	pygame.display.set_caption('Sudoku')
+	build_render_cache()
+
+# Ready puzzles kept per difficulty by the background prefetch pool
+PREFETCH_DEPTH = 2
+
+# Optional pre-built puzzle bank (see puzzle_bank.py), used instead of generating
+PUZZLE_BANK_FILE = "puzzles.bank"
+
+# Pre-rendered surfaces, built once by build_render_cache()
+DIGIT_GLYPHS = {} # Màu -> [None, ảnh số 1, ..., ảnh số GRID_SIZE]
+NOTE_GLYPHS = [] # Ảnh số ghi chú 1-GRID_SIZE (index 0 bỏ trống)
+TEXT_CACHE = {} # (font, chữ, màu) -> ảnh đã render, cho các nhãn cố định
+BACKGROUND = None # Nền tĩnh: khung lưới và bảng điều khiển
+
+# Control panel layout
+BUTTON_SIZE = 50
+MARGIN = 20
+WIDE_BUTTON = BUTTON_SIZE*3 + MARGIN*2
+
+def render_text(font, text, color):
+	# Render a constant label once and reuse the surface
+	key = (font, text, color)
+	surface = TEXT_CACHE.get(key)
+	if surface is None:
+		surface = TEXT_CACHE[key] = font.render(text, True, color)
+	return surface
+
+def number_button_layout():
+	# (button size, gap) of the BOX_SIZE x BOX_SIZE number buttons, which fill
+	# the same width as the wide buttons below them
+	gap = MARGIN if BOX_SIZE <= 3 else MARGIN // 2
+	return (WIDE_BUTTON - gap * (BOX_SIZE - 1)) // BOX_SIZE, gap
+
+def control_rects():
+	# Button rects for click detection: clear, notes, undo, menu and the number buttons
+	button, gap = number_button_layout()
+	y = MARGIN + BOX_SIZE * (button + gap) - gap + 2 * MARGIN
+	clear_rect = pygame.Rect(MARGIN, y, WIDE_BUTTON, BUTTON_SIZE)
+	note_rect = pygame.Rect(MARGIN, y + (BUTTON_SIZE + MARGIN), WIDE_BUTTON, BUTTON_SIZE)
+	undo_rect = pygame.Rect(MARGIN, y + 2*(BUTTON_SIZE + MARGIN), WIDE_BUTTON, BUTTON_SIZE)
+	menu_rect = pygame.Rect(MARGIN, y + 3*(BUTTON_SIZE + MARGIN), WIDE_BUTTON, BUTTON_SIZE)
+	
+	number_rects = []
+	for i in range(1, GRID_SIZE + 1):
+		row = (i-1) // BOX_SIZE
+		col = (i-1) % BOX_SIZE
+		x = MARGIN + col * (button + gap)
+		y = MARGIN + row * (button + gap)
+		number_rects.append(pygame.Rect(x, y, button, button))
+	
+	return clear_rect, note_rect, undo_rect, menu_rect, number_rects
+
+def draw_button(surface, rect, color, label, font=None):
+	pygame.draw.rect(surface, color, rect)
+	text = render_text(font or FONT, label, BLACK)
+	surface.blit(text, text.get_rect(center=rect.center))
+
+def build_render_cache():
+	global BACKGROUND
+	
+	# Every digit of the board in each color it is drawn in, sized to the cells
+	if GRID_SIZE == 9:
+		digit_font, note_font = FONT, NOTE_FONT
+	else:
+		digit_font = pygame.font.SysFont('Arial', CELL_SIZE * 2 // 3)
+		note_font = pygame.font.SysFont('Arial', max(8, CELL_SIZE // BOX_SIZE))
+	symbols = DIGIT_SYMBOLS[:GRID_SIZE]
+	for color in (BLACK, RED):
+		DIGIT_GLYPHS[color] = [None] + [digit_font.render(n, True, color) for n in symbols]
+	NOTE_GLYPHS[:] = [None] + [note_font.render(n, True, PURPLE) for n in symbols]
+	
+	BACKGROUND = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+	BACKGROUND.fill(WHITE)
+	
 	# Draw the left panel background
-	pygame.draw.rect(screen, LIGHT_BLUE, (0, 0, 300, SCREEN_HEIGHT))
+	pygame.draw.rect(BACKGROUND, LIGHT_BLUE, (0, 0, 300, SCREEN_HEIGHT))
 	
 	# Draw the grid background (right side)
-	pygame.draw.rect(screen, WHITE, (300, 0, 600, 600))
+	pygame.draw.rect(BACKGROUND, WHITE, (300, 0, 600, 600))
 	
 	# Draw grid lines (right side)
-	for i in range(0, 10, 3):
-		pygame.draw.line(screen, BLACK, (GRID_OFFSET, i * CELL_SIZE), (GRID_OFFSET + 600, i * CELL_SIZE), 4)
-		pygame.draw.line(screen, BLACK, (i * CELL_SIZE + GRID_OFFSET, 0), (i * CELL_SIZE + GRID_OFFSET, 600), 4)
+	for i in range(0, GRID_SIZE + 1, BOX_SIZE):
+		pygame.draw.line(BACKGROUND, BLACK, (GRID_OFFSET, i * CELL_SIZE), (GRID_OFFSET + GRID_WIDTH, i * CELL_SIZE), 4)
+		pygame.draw.line(BACKGROUND, BLACK, (i * CELL_SIZE + GRID_OFFSET, 0), (i * CELL_SIZE + GRID_OFFSET, GRID_WIDTH), 4)
+	
+	for i in range(1, GRID_SIZE):
+		if i % BOX_SIZE != 0:
+			pygame.draw.line(BACKGROUND, GRAY, (GRID_OFFSET, i * CELL_SIZE), (GRID_OFFSET + GRID_WIDTH, i * CELL_SIZE), 1)
+			pygame.draw.line(BACKGROUND, GRAY, (i * CELL_SIZE + GRID_OFFSET, 0), (i * CELL_SIZE + GRID_OFFSET, GRID_WIDTH), 1)
 	
-	for i in range(1, 9):
-		if i % 3 != 0:
-			pygame.draw.line(screen, GRAY, (GRID_OFFSET, i * CELL_SIZE), (GRID_OFFSET + 600, i * CELL_SIZE), 1)
-			pygame.draw.line(screen, GRAY, (i * CELL_SIZE + GRID_OFFSET, 0), (i * CELL_SIZE + GRID_OFFSET, 600), 1)
+	# Static control panel; the Notes button changes color so draw_controls paints it
+	clear_rect, _, undo_rect, menu_rect, number_rects = control_rects()
+	for i, rect in enumerate(number_rects):
+		draw_button(BACKGROUND, rect, WHITE, DIGIT_SYMBOLS[i], FONT if BOX_SIZE <= 3 else SMALL_FONT)
+	draw_button(BACKGROUND, clear_rect, WHITE, "Clear")
+	draw_button(BACKGROUND, undo_rect, WHITE, "Undo")
+	draw_button(BACKGROUND, menu_rect, WHITE, "Menu")
+
+def set_board_size(size):
+	# Switch the layout and the pre-rendered surfaces to a size x size board
+	global GRID_SIZE, BOX_SIZE, CELL_SIZE, GRID_WIDTH
+	if size == GRID_SIZE and BACKGROUND is not None:
+		return
+	GRID_SIZE = size
+	BOX_SIZE = int(size ** 0.5)
+	CELL_SIZE = 600 // size
+	GRID_WIDTH = CELL_SIZE * size
+	build_render_cache()
+
+def draw_grid():
+	# Grid lines and the static control panel come from the prebaked background
+	screen.blit(BACKGROUND, (0, 0))
 
 def draw_numbers(board, user_input, notes, incorrect_cells, selected=None, note_mode=False):
-	for row in range(9):
-		for col in range(9):
-			if board[row][col] != 0:
+	# board, user_input and notes are flat, indexed by row * GRID_SIZE + col
+	black_digits = DIGIT_GLYPHS[BLACK]
+	red_digits = DIGIT_GLYPHS[RED]
+	note_step = CELL_SIZE // BOX_SIZE
+	for row in range(GRID_SIZE):
+		for col in range(GRID_SIZE):
+			i = row * GRID_SIZE + col
+			if board[i] != 0:
 				x = col * CELL_SIZE + CELL_SIZE // 2 + GRID_OFFSET
 				y = row * CELL_SIZE + CELL_SIZE // 2
-				num_text = FONT.render(str(board[row][col]), True, BLACK)
-				num_rect = num_text.get_rect(center=(x, y))
-				screen.blit(num_text, num_rect)
-			elif user_input[row][col] != 0:
+				if (row, col) in incorrect_cells:
+					pygame.draw.rect(screen, LIGHT_RED, (col * CELL_SIZE + GRID_OFFSET, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+				num_text = black_digits[board[i]]
+				screen.blit(num_text, num_text.get_rect(center=(x, y)))
+			elif user_input[i] != 0:
 				x = col * CELL_SIZE + CELL_SIZE // 2 + GRID_OFFSET
 				y = row * CELL_SIZE + CELL_SIZE // 2
 				
@@ -278,20 +208,18 @@ def draw_numbers(board, user_input, notes, incorrect_cells, selected=None, note_
 				if (row, col) in incorrect_cells:
 					pygame.draw.rect(screen, LIGHT_RED, (col * CELL_SIZE + GRID_OFFSET, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
 				
-				num_text = FONT.render(str(user_input[row][col]), True, RED if (row, col) in incorrect_cells else BLACK)
-				num_rect = num_text.get_rect(center=(x, y))
-				screen.blit(num_text, num_rect)
+				num_text = (red_digits if (row, col) in incorrect_cells else black_digits)[user_input[i]]
+				screen.blit(num_text, num_text.get_rect(center=(x, y)))
 			else:
 				if selected and selected == (row, col) and note_mode:
 					pygame.draw.rect(screen, ORANGE, (col * CELL_SIZE + GRID_OFFSET, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
 				
-				for num in range(9):
-					if notes[row][col][num]:
-						note_x = col * CELL_SIZE + (num % 3) * (CELL_SIZE // 3) + (CELL_SIZE // 6) + GRID_OFFSET
-						note_y = row * CELL_SIZE + (num // 3) * (CELL_SIZE // 3) + (CELL_SIZE // 6)
-						note_text = NOTE_FONT.render(str(num+1), True, PURPLE)
-						note_rect = note_text.get_rect(center=(note_x, note_y))
-						screen.blit(note_text, note_rect)
+				for num in range(GRID_SIZE):
+					if notes[i] >> num & 1:
+						note_x = col * CELL_SIZE + (num % BOX_SIZE) * note_step + note_step // 2 + GRID_OFFSET
+						note_y = row * CELL_SIZE + (num // BOX_SIZE) * note_step + note_step // 2
+						note_text = NOTE_GLYPHS[num+1]
+						screen.blit(note_text, note_text.get_rect(center=(note_x, note_y)))
 	
 	if selected:
 		row, col = selected
@@ -299,140 +227,102 @@ def draw_numbers(board, user_input, notes, incorrect_cells, selected=None, note_
 		pygame.draw.rect(screen, border_color, (col * CELL_SIZE + GRID_OFFSET, row * CELL_SIZE, CELL_SIZE, CELL_SIZE), 3)
 
 def draw_controls(note_mode=False):
-	button_size = 50
-	margin = 20
-	start_x = margin
-	start_y = margin
-	
-	# Draw number buttons 1-9 in 3x3 grid
-	for i in range(1, 10):
-		row = (i-1) // 3
-		col = (i-1) % 3
-		x = start_x + col * (button_size + margin)
-		y = start_y + row * (button_size + margin)
-		
-		pygame.draw.rect(screen, WHITE, (x, y, button_size, button_size))
-		num_text = FONT.render(str(i), True, BLACK)
-		num_rect = num_text.get_rect(center=(x + button_size//2, y + button_size//2))
-		screen.blit(num_text, num_rect)
-	
-	# Clear button (X)
-	y = start_y + 3 * (button_size + margin) + margin
-	pygame.draw.rect(screen, WHITE, (start_x, y, button_size*3 + margin*2, button_size))
-	num_text = FONT.render("Clear", True, BLACK)
-	num_rect = num_text.get_rect(center=(start_x + (button_size*3 + margin*2)//2, y + button_size//2))
-	screen.blit(num_text, num_rect)
+	# Number, Clear, Undo and Menu buttons are part of the background
+	rects = control_rects()
 	
 	# Note mode button (N)
-	y += button_size + margin
-	button_color = YELLOW if note_mode else WHITE
-	pygame.draw.rect(screen, button_color, (start_x, y, button_size*3 + margin*2, button_size))
-	note_text = FONT.render("Notes", True, BLACK)
-	note_rect = note_text.get_rect(center=(start_x + (button_size*3 + margin*2)//2, y + button_size//2))
-	screen.blit(note_text, note_rect)
-	
-	# Undo button (U)
-	y += button_size + margin
-	pygame.draw.rect(screen, WHITE, (start_x, y, button_size*3 + margin*2, button_size))
-	undo_text = FONT.render("Undo", True, BLACK)
-	undo_rect = undo_text.get_rect(center=(start_x + (button_size*3 + margin*2)//2, y + button_size//2))
-	screen.blit(undo_text, undo_rect)
-	
-	# Menu button
-	y += button_size + margin
-	pygame.draw.rect(screen, WHITE, (start_x, y, button_size*3 + margin*2, button_size))
-	menu_text = FONT.render("Menu", True, BLACK)
-	menu_rect = menu_text.get_rect(center=(start_x + (button_size*3 + margin*2)//2, y + button_size//2))
-	screen.blit(menu_text, menu_rect)
+	draw_button(screen, rects[1], YELLOW if note_mode else WHITE, "Notes")
+	
+	draw_status()
 	
+	return rects
+
+def draw_status():
 	# Display time and mistakes at bottom of left panel
+	pygame.draw.rect(screen, LIGHT_BLUE, STATUS_RECT)
 	time_text = SMALL_FONT.render(f"Time: {int(game.elapsed_time)}s", True, BLACK)
 	mistakes_text = SMALL_FONT.render(f"Mistakes: {game.mistakes}", True, BLACK)
 	
-	screen.blit(time_text, (start_x, SCREEN_HEIGHT - 60))
-	screen.blit(mistakes_text, (start_x, SCREEN_HEIGHT - 30))
-	
-	# Return button rects for click detection
-	clear_rect = pygame.Rect(start_x, start_y + 3*(button_size + margin) + margin, button_size*3 + margin*2, button_size)
-	note_rect = pygame.Rect(start_x, y - 2*(button_size + margin), button_size*3 + margin*2, button_size)
-	undo_rect = pygame.Rect(start_x, y - (button_size + margin), button_size*3 + margin*2, button_size)
-	menu_rect = pygame.Rect(start_x, y, button_size*3 + margin*2, button_size)
-	
-	# Return number buttons rects (3x3 grid)
-	number_rects = []
-	for i in range(1, 10):
-		row = (i-1) // 3
-		col = (i-1) % 3
-		x = start_x + col * (button_size + margin)
-		y = start_y + row * (button_size + margin)
-		number_rects.append(pygame.Rect(x, y, button_size, button_size))
-	
-	return clear_rect, note_rect, undo_rect, menu_rect, number_rects
+	screen.blit(time_text, (20, SCREEN_HEIGHT - 60))
+	screen.blit(mistakes_text, (20, SCREEN_HEIGHT - 30))
 
 def draw_game_over():
 	overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
 	overlay.fill((0, 0, 0, 128))
 	screen.blit(overlay, (0, 0))
 	
-	game_over_text = FONT.render("Puzzle Complete!", True, WHITE)
+	game_over_text = render_text(FONT, "Solution Shown" if game.revealed else "Puzzle Complete!", WHITE)
 	time_text = FONT.render(f"Time: {int(game.elapsed_time)}s", True, WHITE)
 	mistakes_text = FONT.render(f"Mistakes: {game.mistakes}", True, WHITE)
-	restart_text = SMALL_FONT.render("Press R to restart or ESC to exit", True, WHITE)
+	if game.revealed:
+		rank_text = render_text(SMALL_FONT, "No score for a solved puzzle", WHITE)
+	else:
+		rank, total, percentile = get_score_store().rank(game.score_key(), int(game.elapsed_time), game.mistakes)
+		rank_text = SMALL_FONT.render(f"Rank {rank} of {total} (better than or equal to {percentile:.0f}%)", True, WHITE)
+	restart_text = render_text(SMALL_FONT, "Press R to restart or ESC to exit", WHITE)
 	
 	screen.blit(game_over_text, (SCREEN_WIDTH//2 - game_over_text.get_width()//2, SCREEN_HEIGHT//2 - 80))
 	screen.blit(time_text, (SCREEN_WIDTH//2 - time_text.get_width()//2, SCREEN_HEIGHT//2 - 20))
 	screen.blit(mistakes_text, (SCREEN_WIDTH//2 - mistakes_text.get_width()//2, SCREEN_HEIGHT//2 + 40))
-	screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 100))
+	screen.blit(rank_text, (SCREEN_WIDTH//2 - rank_text.get_width()//2, SCREEN_HEIGHT//2 + 100))
+	screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 140))
 
-def draw_menu():
+def draw_menu(board_size=9):
 	screen.fill(WHITE)
 	
-	title_text = TITLE_FONT.render("Sudoku", True, BLACK)
+	title_text = render_text(TITLE_FONT, "Sudoku", BLACK)
 	screen.blit(title_text, (SCREEN_WIDTH//2 - title_text.get_width()//2, 50))
 	
 	easy_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 200, 200, 50)
 	medium_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 280, 200, 50)
 	hard_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 360, 200, 50)
 	scores_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 440, 200, 50)
+	size_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 520, 200, 50)
 	
 	pygame.draw.rect(screen, LIGHT_GREEN, easy_rect)
 	pygame.draw.rect(screen, YELLOW, medium_rect)
 	pygame.draw.rect(screen, LIGHT_RED, hard_rect)
 	pygame.draw.rect(screen, LIGHT_BLUE, scores_rect)
+	pygame.draw.rect(screen, GRAY, size_rect)
 	
-	easy_text = FONT.render("Easy", True, BLACK)
-	medium_text = FONT.render("Medium", True, BLACK)
-	hard_text = FONT.render("Hard", True, BLACK)
-	scores_text = FONT.render("High Scores", True, BLACK)
+	easy_text = render_text(FONT, "Easy", BLACK)
+	medium_text = render_text(FONT, "Medium", BLACK)
+	hard_text = render_text(FONT, "Hard", BLACK)
+	scores_text = render_text(FONT, "High Scores", BLACK)
+	size_text = render_text(FONT, f"{board_size} x {board_size}", BLACK)
 	
 	screen.blit(easy_text, (easy_rect.centerx - easy_text.get_width()//2, easy_rect.centery - easy_text.get_height()//2))
 	screen.blit(medium_text, (medium_rect.centerx - medium_text.get_width()//2, medium_rect.centery - medium_text.get_height()//2))
 	screen.blit(hard_text, (hard_rect.centerx - hard_text.get_width()//2, hard_rect.centery - hard_text.get_height()//2))
 	screen.blit(scores_text, (scores_rect.centerx - scores_text.get_width()//2, scores_rect.centery - scores_text.get_height()//2))
+	screen.blit(size_text, (size_rect.centerx - size_text.get_width()//2, size_rect.centery - size_text.get_height()//2))
 	
-	return easy_rect, medium_rect, hard_rect, scores_rect
+	return easy_rect, medium_rect, hard_rect, scores_rect, size_rect
 
-def draw_scores():
+def draw_scores(board_size=9):
+	# Leaderboards of the board size chosen in the menu
 	screen.fill(WHITE)
 	
-	title_text = TITLE_FONT.render("High Scores", True, BLACK)
+	title = "High Scores" if board_size == 9 else f"High Scores {board_size}x{board_size}"
+	title_text = render_text(TITLE_FONT, title, BLACK)
 	screen.blit(title_text, (SCREEN_WIDTH//2 - title_text.get_width()//2, 30))
 	
 	back_rect = pygame.Rect(20, 20, 100, 40)
 	pygame.draw.rect(screen, LIGHT_BLUE, back_rect)
-	back_text = SMALL_FONT.render("Back", True, BLACK)
+	back_text = render_text(SMALL_FONT, "Back", BLACK)
 	screen.blit(back_text, (back_rect.centerx - back_text.get_width()//2, back_rect.centery - back_text.get_height()//2))
 	
-	scores = game.load_scores()
+	scores = get_score_store().load_scores()
 	y_offset = 100
 	
 	for difficulty in ["easy", "medium", "hard"]:
-		if difficulty in scores and scores[difficulty]:
-			diff_text = FONT.render(f"{difficulty.capitalize()}:", True, BLACK)
+		key = difficulty if board_size == 9 else f"{difficulty} {board_size}x{board_size}"
+		if key in scores and scores[key]:
+			diff_text = render_text(FONT, f"{difficulty.capitalize()}:", BLACK)
 			screen.blit(diff_text, (50, y_offset))
 			y_offset += 40
 			
-			for i, score in enumerate(scores[difficulty][:5]):
+			for i, score in enumerate(scores[key][:5]):
 				score_text = SMALL_FONT.render(
 					f"{i+1}. Time: {score['time']}s, Mistakes: {score['mistakes']} ({score['date']})", 
 					True, BLACK
@@ -451,7 +341,7 @@ def draw_confirmation():
 	box_rect = pygame.Rect(SCREEN_WIDTH//4, SCREEN_HEIGHT//3, SCREEN_WIDTH//2, SCREEN_HEIGHT//3)
 	pygame.draw.rect(screen, WHITE, box_rect)
 	
-	text = FONT.render("Quit to menu?", True, BLACK)
+	text = render_text(FONT, "Quit to menu?", BLACK)
 	yes_rect = pygame.Rect(SCREEN_WIDTH//4 + 50, SCREEN_HEIGHT//2, 100, 50)
 	no_rect = pygame.Rect(SCREEN_WIDTH//4 + 250, SCREEN_HEIGHT//2, 100, 50)
 	
@@ -460,8 +350,8 @@ def draw_confirmation():
 	
 	screen.blit(text, (box_rect.centerx - text.get_width()//2, box_rect.y + 30))
 	
-	yes_text = FONT.render("Yes", True, BLACK)
-	no_text = FONT.render("No", True, BLACK)
+	yes_text = render_text(FONT, "Yes", BLACK)
+	no_text = render_text(FONT, "No", BLACK)
 	
 	screen.blit(yes_text, (yes_rect.centerx - yes_text.get_width()//2, yes_rect.centery - yes_text.get_height()//2))
 	screen.blit(no_text, (no_rect.centerx - no_text.get_width()//2, no_rect.centery - no_text.get_height()//2))
@@ -470,7 +360,7 @@ def draw_confirmation():
 
 def get_cell_from_pos(pos):
 	x, y = pos
-	if x < GRID_OFFSET or x >= GRID_OFFSET + 600 or y < 0 or y >= 600:
+	if x < GRID_OFFSET or x >= GRID_OFFSET + GRID_WIDTH or y < 0 or y >= GRID_WIDTH:
 		return None
 	row = y // CELL_SIZE
 	col = (x - GRID_OFFSET) // CELL_SIZE
@@ -480,165 +370,335 @@ def get_number_from_pos(pos, number_rects):
 	x, y = pos
 	for i, rect in enumerate(number_rects):
 		if rect.collidepoint(x, y):
-			return i + 1  # Returns 1-9
+			return i + 1  # Returns 1-GRID_SIZE
 	return None
 
+def get_number_from_key(event):
+	# Number keys give 1-9; on larger boards Shift+A, Shift+B, ... give 10 and up,
+	# matching the letters on the board (plain letters stay shortcuts)
+	if pygame.K_1 <= event.key <= pygame.K_9:
+		return event.key - pygame.K_0
+	if event.mod & pygame.KMOD_SHIFT and pygame.K_a <= event.key <= pygame.K_z:
+		num = 10 + event.key - pygame.K_a
+		if num <= GRID_SIZE:
+			return num
+	return None
+
+def new_game(difficulty, size=9, resume=False):
+	# With resume, continue the unfinished game saved for this difficulty.
+	# Otherwise load from the puzzle bank if there is one, then try a
+	# prefetched puzzle (the bank and the pool hold 9x9 puzzles only), then
+	# a disguised copy of the last puzzle of this kind, and only generate on
+	# demand when there is none of those
+	if resume and AUTOSAVER:
+		saved = AUTOSAVER.load(difficulty, size)
+		if saved is not None:
+			set_board_size(size)
+			SEED_PUZZLES[(difficulty, size)] = (saved.board, saved.solution)
+			return saved
+	puzzle = None
+	if size == 9:
+		puzzle = PUZZLE_BANK.random(difficulty) if PUZZLE_BANK else None
+		if puzzle is None and PUZZLE_POOL:
+			puzzle = PUZZLE_POOL.get(difficulty)
+	if puzzle is None and (difficulty, size) in SEED_PUZZLES:
+		puzzle = sudoku_generator.transform_puzzle(*SEED_PUZZLES[(difficulty, size)])
+	set_board_size(size)
+	new = Sudoku(difficulty=difficulty, puzzle=puzzle, size=size)
+	SEED_PUZZLES[(difficulty, size)] = (new.board, new.solution)
+	return new
+
 # Game states
 MENU = 0
 GAME = 1
 SCORES = 2
 
-# Initial state
-current_state = MENU
+# Current game, read by the draw functions; set up by main()
 game = None
-menu_buttons = None
-back_button = None
-note_mode = False
-confirming_quit = False
-yes_rect, no_rect = None, None
-control_rects = None
-number_rects = None
-
-# Game loop
-running = True
-while running:
-	for event in pygame.event.get():
-		if event.type == pygame.QUIT:
-			running = False
+PUZZLE_BANK = None
+PUZZLE_POOL = None
+AUTOSAVER = None
+# Last puzzle per (difficulty, size), as flat board and solution; restart and
+# the menu transform it into a new-looking one when nothing else is ready
+SEED_PUZZLES = {}
+
+def cell_rect(row, col):
+	# Cell area plus the half of the thick grid lines that overlaps it
+	return pygame.Rect(col * CELL_SIZE + GRID_OFFSET - 2, row * CELL_SIZE - 2, CELL_SIZE + 4, CELL_SIZE + 4)
+
+def cell_keys(game, note_mode):
+	# What every cell shows; a cell is sent to the display only when its key changes
+	keys = []
+	highlighted = game.highlighted_cells()
+	for row in range(GRID_SIZE):
+		for col in range(GRID_SIZE):
+			i = row * GRID_SIZE + col
+			selected = game.selected == (row, col)
+			keys.append((
+				game.board[i],
+				game.user_input[i],
+				game.notes[i],
+				(row, col) in highlighted,
+				selected,
+				selected and note_mode
+			))
+	return keys
+
+def autosave_key(game):
+	# Every change to what a snapshot stores is a journaled move, except the
+	# selection and the end of the game; a change queues an autosave
+	return (id(game), game.game_over, len(game.journal), game.selected)
+
+def main():
+	global game, PUZZLE_BANK, PUZZLE_POOL, AUTOSAVER
+	
+	init_display()
+	
+	# Initial state
+	current_state = MENU
+	game = None
+	menu_buttons = None
+	back_button = None
+	note_mode = False
+	board_size = 9 # Cỡ bảng chọn ở menu
+	confirming_quit = False
+	yes_rect, no_rect = None, None
+	control_rects = None
+	number_rects = None
+	solving = None # Sudoku.solve_steps generator while Solve mode runs
+	
+	# Open the puzzle bank and start filling the puzzle pool in the background
+	PUZZLE_BANK = puzzle_bank.open_bank(PUZZLE_BANK_FILE)
+	PUZZLE_POOL = puzzle_pool.PuzzlePool(depth=PREFETCH_DEPTH).start()
+	# Unfinished games are saved in the background and resumed from the menu
+	AUTOSAVER = snapshot.Autosaver().start()
+	saved_key = None
+	
+	clock = pygame.time.Clock()
+	pygame.time.set_timer(TIMER_EVENT, 1000)
+	pygame.event.set_blocked(pygame.MOUSEMOTION)
+	
+	# What is on the display, to work out what needs repainting
+	shown_screen = None
+	shown_cells = None
+	shown_controls = None
+	shown_status = None
+	
+	# Game loop
+	running = True
+	while running:
+		if current_state == GAME and game:
+			game.update_time()
+			if solving and not next(solving, False):
+				solving = None
 		
-		if event.type == pygame.MOUSEBUTTONDOWN:
-			pos = pygame.mouse.get_pos()
-			
-			if current_state == MENU:
-				if menu_buttons:
-					easy_rect, medium_rect, hard_rect, scores_rect = menu_buttons
-					
-					if easy_rect.collidepoint(pos):
-						game = Sudoku(difficulty="easy")
-						current_state = GAME
-						note_mode = False
-					elif medium_rect.collidepoint(pos):
-						game = Sudoku(difficulty="medium")
-						current_state = GAME
-						note_mode = False
-					elif hard_rect.collidepoint(pos):
-						game = Sudoku(difficulty="hard")
-						current_state = GAME
-						note_mode = False
-					elif scores_rect.collidepoint(pos):
-						current_state = SCORES
-						back_button = draw_scores()
+		# Drawing: full repaint when the screen changes, otherwise only the parts that changed
+		screen_key = (current_state, id(game), confirming_quit, game.game_over if game else False, board_size)
+		full = screen_key != shown_screen
+		shown_screen = screen_key
+		
+		if current_state == MENU:
+			if full:
+				menu_buttons = draw_menu(board_size)
+				pygame.display.flip()
+		elif current_state == SCORES:
+			if full:
+				back_button = draw_scores(board_size)
+				pygame.display.flip()
+		elif current_state == GAME and game:
+			cells = cell_keys(game, note_mode)
+			controls = note_mode
+			status = (int(game.elapsed_time), game.mistakes)
+			if full:
+				draw_grid()
+				draw_numbers(game.board, game.user_input, game.notes, game.highlighted_cells(), game.selected, note_mode)
+				control_rects = draw_controls(note_mode)
+				if control_rects:
+					_, _, _, _, number_rects = control_rects
+				
+				if confirming_quit:
+					yes_rect, no_rect = draw_confirmation()
+				
+				if game.game_over:
+					draw_game_over()
+				
+				pygame.display.flip()
+			elif not confirming_quit and not game.game_over:
+				dirty = [cell_rect(i // GRID_SIZE, i % GRID_SIZE) for i in range(len(cells)) if cells[i] != shown_cells[i]]
+				if dirty:
+					# draw_grid also paints the left panel background, so the controls go back on top
+					draw_grid()
+					draw_numbers(game.board, game.user_input, game.notes, game.highlighted_cells(), game.selected, note_mode)
+					draw_controls(note_mode)
+				elif controls != shown_controls:
+					draw_controls(note_mode)
+				elif status != shown_status:
+					# Once a second only the clock changes
+					draw_status()
+				if controls != shown_controls:
+					dirty.append(CONTROLS_RECT)
+				if status != shown_status:
+					dirty.append(STATUS_RECT)
+				if dirty:
+					pygame.display.update(dirty)
+			shown_cells, shown_controls, shown_status = cells, controls, status
+		
+		clock.tick(FPS)
+		
+		# Sleep until something happens, then handle everything that is queued;
+		# Solve mode only takes what is queued, so the next frame comes on time
+		for event in pygame.event.get() if solving else [pygame.event.wait()] + pygame.event.get():
+			if solving and (event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.KEYDOWN):
+				# S or ESC cancels Solve mode and gives back the player's entries; nothing else works meanwhile
+				if event.type == pygame.KEYDOWN and event.key in (pygame.K_s, pygame.K_ESCAPE):
+					solving.close()
+					solving = None
+				continue
 			
-			elif current_state == SCORES:
-				if back_button and back_button.collidepoint(pos):
-					current_state = MENU
+			if event.type == pygame.QUIT:
+				running = False
+				if solving:
+					solving.close()
+					solving = None
+				if current_state == GAME and not game.game_over:
+					AUTOSAVER.save(game) # Keep the time played up to now
 			
-			elif current_state == GAME:
-				if not game.game_over:
-					if not confirming_quit:
-						cell = get_cell_from_pos(pos)
-						if cell:
-							if game.board[cell[0]][cell[1]] == 0:
-								game.selected = cell
+			if event.type == pygame.MOUSEBUTTONDOWN:
+				pos = pygame.mouse.get_pos()
+				
+				if current_state == MENU:
+					if menu_buttons:
+						easy_rect, medium_rect, hard_rect, scores_rect, size_rect = menu_buttons
+						
+						if easy_rect.collidepoint(pos):
+							game = new_game("easy", board_size, resume=True)
+							current_state = GAME
+							note_mode = False
+						elif medium_rect.collidepoint(pos):
+							game = new_game("medium", board_size, resume=True)
+							current_state = GAME
+							note_mode = False
+						elif hard_rect.collidepoint(pos):
+							game = new_game("hard", board_size, resume=True)
+							current_state = GAME
+							note_mode = False
+						elif scores_rect.collidepoint(pos):
+							current_state = SCORES
+						elif size_rect.collidepoint(pos):
+							board_size = BOARD_SIZES[(BOARD_SIZES.index(board_size) + 1) % len(BOARD_SIZES)]
+				
+				elif current_state == SCORES:
+					if back_button and back_button.collidepoint(pos):
+						current_state = MENU
+				
+				elif current_state == GAME:
+					if not game.game_over:
+						if not confirming_quit:
+							cell = get_cell_from_pos(pos)
+							if cell:
+								if game.board[cell[0] * GRID_SIZE + cell[1]] == 0:
+									game.selected = cell
 						
-						if number_rects:
-							num = get_number_from_pos(pos, number_rects)
-							if num is not None and game.selected:
-								if note_mode:
-									game.toggle_note(game.selected[0], game.selected[1], num)
-								else:
-									game.place_number(game.selected[0], game.selected[1], num)
-									game.is_complete()
+							if number_rects:
+								num = get_number_from_pos(pos, number_rects)
+								if num is not None and game.selected:
+									if note_mode:
+										game.toggle_note(game.selected[0], game.selected[1], num)
+									else:
+										game.place_number(game.selected[0], game.selected[1], num)
+										game.is_complete()
 						
-						if control_rects:
-							clear_rect, note_rect, undo_rect, menu_rect, _ = control_rects
+							if control_rects:
+								clear_rect, note_rect, undo_rect, menu_rect, _ = control_rects
 							
-							if clear_rect.collidepoint(pos) and game.selected:
-								game.place_number(game.selected[0], game.selected[1], 0)
-							elif note_rect.collidepoint(pos):
-								note_mode = not note_mode
-							elif undo_rect.collidepoint(pos):
-								game.undo()
-							elif menu_rect.collidepoint(pos):
-								confirming_quit = True
-					else:
-						if yes_rect and yes_rect.collidepoint(pos):
-							current_state = MENU
-							confirming_quit = False
+								if clear_rect.collidepoint(pos) and game.selected:
+									game.place_number(game.selected[0], game.selected[1], 0)
+								elif note_rect.collidepoint(pos):
+									note_mode = not note_mode
+								elif undo_rect.collidepoint(pos):
+									game.undo()
+								elif menu_rect.collidepoint(pos):
+									confirming_quit = True
+						else:
+							if yes_rect and yes_rect.collidepoint(pos):
+								AUTOSAVER.save(game) # Resumed next time this difficulty is picked
+								current_state = MENU
+								confirming_quit = False
+								note_mode = False
+							elif no_rect and no_rect.collidepoint(pos):
+								confirming_quit = False
+					else:  # Game over screen
+						if event.key == pygame.K_r:
+							game = new_game(game.difficulty, game.size)
 							note_mode = False
-						elif no_rect and no_rect.collidepoint(pos):
-							confirming_quit = False
-				else:  # Game over screen
-					if event.key == pygame.K_r:
-						game = Sudoku(difficulty=game.difficulty)
+						elif event.key == pygame.K_ESCAPE:
+							current_state = MENU
+		
+			if event.type == pygame.KEYDOWN:
+				if current_state == GAME:
+					num = get_number_from_key(event)
+					if num is not None:
+						if game.selected and game.board[game.selected[0] * GRID_SIZE + game.selected[1]] == 0:
+							if note_mode:
+								game.toggle_note(game.selected[0], game.selected[1], num)
+							else:
+								game.place_number(game.selected[0], game.selected[1], num)
+								game.is_complete()
+					elif event.key == pygame.K_r:
+						game = new_game(game.difficulty, game.size)
 						note_mode = False
 					elif event.key == pygame.K_ESCAPE:
-						current_state = MENU
-		
-		if event.type == pygame.KEYDOWN:
-			if current_state == GAME:
-				if event.key == pygame.K_r:
-					game = Sudoku(difficulty=game.difficulty)
-					note_mode = False
-				elif event.key == pygame.K_ESCAPE:
-					if game.game_over:
-						current_state = MENU
-					else:
-						confirming_quit = not confirming_quit
-				elif event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE:
-					if game.selected and game.board[game.selected[0]][game.selected[1]] == 0:
-						game.place_number(game.selected[0], game.selected[1], 0)
-				elif event.key == pygame.K_n:
-					note_mode = not note_mode
-				elif event.key == pygame.K_u:
-					game.undo()
-				elif event.key == pygame.K_m:
-					confirming_quit = True
-				elif event.key in range(pygame.K_1, pygame.K_9 + 1):
-					if game.selected and game.board[game.selected[0]][game.selected[1]] == 0:
-						num = event.key - pygame.K_0
-						if note_mode:
-							game.toggle_note(game.selected[0], game.selected[1], num)
+						if game.game_over:
+							current_state = MENU
 						else:
-							game.place_number(game.selected[0], game.selected[1], num)
-							game.is_complete()
-				elif event.key == pygame.K_UP and game.selected:
-					game.selected = (max(0, game.selected[0]-1), game.selected[1])
-				elif event.key == pygame.K_DOWN and game.selected:
-					game.selected = (min(8, game.selected[0]+1), game.selected[1])
-				elif event.key == pygame.K_LEFT and game.selected:
-					game.selected = (game.selected[0], max(0, game.selected[1]-1))
-				elif event.key == pygame.K_RIGHT and game.selected:
-					game.selected = (game.selected[0], min(8, game.selected[1]+1))
-			elif current_state in [MENU, SCORES]:
-				if event.key == pygame.K_ESCAPE:
-					if current_state == SCORES:
-						current_state = MENU
-					else:
-						running = False
-	
-	if current_state == GAME and game:
-		game.update_time()
-	
-	# Drawing
-	if current_state == MENU:
-		menu_buttons = draw_menu()
-	elif current_state == SCORES:
-		back_button = draw_scores()
-	elif current_state == GAME and game:
-		draw_grid()
-		draw_numbers(game.board, game.user_input, game.notes, game.incorrect_cells, game.selected, note_mode)
-		control_rects = draw_controls(note_mode)
-		if control_rects:
-			_, _, _, _, number_rects = control_rects
-		
-		if confirming_quit:
-			yes_rect, no_rect = draw_confirmation()
+							confirming_quit = not confirming_quit
+					elif event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE:
+						if game.selected and game.board[game.selected[0] * GRID_SIZE + game.selected[1]] == 0:
+							game.place_number(game.selected[0], game.selected[1], 0)
+					elif event.key == pygame.K_n:
+						note_mode = not note_mode
+					elif event.key == pygame.K_u:
+						game.undo()
+					elif event.key == pygame.K_y:
+						game.redo()
+					elif event.key == pygame.K_m:
+						confirming_quit = True
+					elif event.key == pygame.K_a:
+						game.toggle_auto_notes()
+					elif event.key == pygame.K_h:
+						game.use_hint()
+						game.is_complete()
+					elif event.key == pygame.K_s and not game.game_over and not confirming_quit:
+						solving = game.solve_steps(1 if GRID_SIZE == 9 else GRID_SIZE, SOLVE_SECONDS)
+					elif event.key == pygame.K_UP and game.selected:
+						game.selected = (max(0, game.selected[0]-1), game.selected[1])
+					elif event.key == pygame.K_DOWN and game.selected:
+						game.selected = (min(GRID_SIZE - 1, game.selected[0]+1), game.selected[1])
+					elif event.key == pygame.K_LEFT and game.selected:
+						game.selected = (game.selected[0], max(0, game.selected[1]-1))
+					elif event.key == pygame.K_RIGHT and game.selected:
+						game.selected = (game.selected[0], min(GRID_SIZE - 1, game.selected[1]+1))
+				elif current_state in [MENU, SCORES]:
+					if event.key == pygame.K_ESCAPE:
+						if current_state == SCORES:
+							current_state = MENU
+						else:
+							running = False
 		
-		if game.game_over:
-			draw_game_over()
-	
-	pygame.display.flip()
+		# Queue a snapshot after every change; the saver's thread writes it
+		if game is not None:
+			key = autosave_key(game)
+			if key != saved_key:
+				saved_key = key
+				if game.game_over:
+					AUTOSAVER.discard(game)
+				else:
+					AUTOSAVER.save(game)
+	
+	PUZZLE_POOL.stop()
+	AUTOSAVER.stop()
+	pygame.quit()
+	sys.exit()
 
-pygame.quit()
-sys.exit()
\ No newline at end of file
+if __name__ == "__main__":
+	main()
\ No newline at end of file
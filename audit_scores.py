@@ -0,0 +1,121 @@
+"""Check every score in the high scores database against its move journal.
+
+	python audit_scores.py
+	python audit_scores.py --db sudoku_scores.db --difficulty hard --workers 4
+
+Each result's journal (see journal.py) is replayed on its puzzle and the
+time, mistakes, hints and completion it works out are compared with what
+was saved. Results that do not check out are printed one per line,
+
+	<id> <difficulty> <time>s <mistakes> mistakes: <problems>
+
+followed by a summary with journals/sec on stderr. Results saved before
+journals existed (such as those imported from the old JSON file) are listed
+as having no journal; --quiet leaves them out of the listing.
+
+--check-seeds also regenerates every puzzle that has a seed and checks the
+journal's puzzle is that one. This runs the generator once per result, so it
+is thousands of times slower than the replay.
+"""
+import argparse
+import functools
+import multiprocessing
+import os
+import sys
+import time
+
+import journal
+import score_store
+import sudoku_core
+
+BATCH_SIZE = 2000
+
+
+def check_seed(data):
+	"""Problem with a journal's puzzle and seed, or None"""
+	import sudoku_generator
+	size, difficulty, seed, solution, board, _ = journal.loads(data)
+	if not seed:
+		return None
+	expected, _, _ = sudoku_generator.generate_seeded(difficulty, int(size ** 0.5), seed)
+	if [v for row in expected for v in row] != board:
+		return f"the puzzle is not the one seed {seed} generates"
+	return None
+
+
+def audit_batch(entries, check_seeds=False):
+	"""[(entry, problems)] for a list of score entries, without their journals"""
+	results = []
+	for entry in entries:
+		problems = journal.verify(entry)
+		if check_seeds and entry.get('journal') and not problems:
+			problem = check_seed(entry['journal'])
+			if problem:
+				problems.append(problem)
+		data = entry.pop('journal', None)
+		entry['journaled'] = bool(data)
+		results.append((entry, problems))
+	return results
+
+
+def read_batches(entries, batch_size):
+	batch = []
+	for entry in entries:
+		batch.append(entry)
+		if len(batch) == batch_size:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
+def audit(store, difficulty=None, workers=None, check_seeds=False, batch_size=BATCH_SIZE):
+	"""Yield (entry, problems) for every result in store; workers=0 replays in this process"""
+	batches = read_batches(store.results(difficulty), batch_size)
+	if workers == 0:
+		for batch in batches:
+			yield from audit_batch(batch, check_seeds)
+		return
+	with multiprocessing.Pool(workers or os.cpu_count()) as pool:
+		for results in pool.imap(functools.partial(audit_batch, check_seeds=check_seeds), batches):
+			yield from results
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Verify high scores by replaying their move journals")
+	parser.add_argument("--db", default=sudoku_core.SCORES_DB_FILE, help="scores database")
+	parser.add_argument("--difficulty", help="only this leaderboard, e.g. hard or \"hard 16x16\"")
+	parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes, 0 to replay in this process")
+	parser.add_argument("--check-seeds", action="store_true", help="also regenerate seeded puzzles (slow)")
+	parser.add_argument("--quiet", action="store_true", help="do not list results that have no journal")
+	args = parser.parse_args(argv)
+
+	if not os.path.exists(args.db):
+		parser.error(f"{args.db} does not exist")
+	store = score_store.ScoreStore(args.db)
+	verified = failed = missing = 0
+	start = time.perf_counter()
+	try:
+		for entry, problems in audit(store, args.difficulty, args.workers, args.check_seeds):
+			if not problems:
+				verified += 1
+				continue
+			if entry['journaled']:
+				failed += 1
+			else:
+				missing += 1
+				if args.quiet:
+					continue
+			print(f"{entry['id']} {entry['difficulty']} {entry['time']}s {entry['mistakes']} mistakes: {'; '.join(problems)}")
+	finally:
+		store.close()
+	elapsed = time.perf_counter() - start
+	total = verified + failed + missing
+	rate = total / elapsed if elapsed else 0.0
+	print(f"Checked {total} results in {elapsed:.2f}s ({rate:.0f} journals/sec): "
+		f"{verified} verified, {failed} failed, {missing} without a journal", file=sys.stderr)
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
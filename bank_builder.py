@@ -0,0 +1,115 @@
+"""Headless puzzle-bank generation.
+
+Generates puzzles with sudoku_generator across a process pool and streams
+them to disk in chunk files:
+
+	python bank_builder.py --count 100000 --difficulty hard --out puzzle_bank
+
+Every chunk has its own seed derived from --seed, the difficulty and the
+chunk number, so the output does not depend on the number of workers.
+Chunk files are written atomically and existing ones are skipped, so an
+interrupted run can be restarted with the same arguments without
+regenerating or duplicating anything.
+
+Each line of a chunk file is "<puzzle> <solution>", 81 digits each, with 0
+for a blank cell. A chunk never holds the same puzzle twice, even in
+disguise (see canonical.py); duplicates across chunks are dropped when the
+bank is packed by puzzle_bank.py.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import canonical
+import sudoku_generator
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def chunk_seed(seed, difficulty, chunk):
+	return f"{seed}:{difficulty}:{chunk}"
+
+
+def chunk_path(out_dir, difficulty, chunk):
+	return os.path.join(out_dir, difficulty, f"chunk-{chunk:06d}.txt")
+
+
+def format_puzzle(board, solution):
+	puzzle = "".join(str(v) for row in board for v in row)
+	return puzzle + " " + "".join(str(v) for row in solution for v in row)
+
+
+def build_chunk(task):
+	"""Generate one chunk and write it atomically; returns (task, puzzles written)"""
+	out_dir, difficulty, chunk, size, seed, unique = task
+	rng = random.Random(chunk_seed(seed, difficulty, chunk))
+	index = canonical.DedupIndex()
+	lines = []
+	while len(lines) < size:
+		board, solution = sudoku_generator.generate_puzzle(difficulty, unique, rng)
+		if index.add([v for row in board for v in row]):
+			lines.append(format_puzzle(board, solution))
+	path = chunk_path(out_dir, difficulty, chunk)
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "w") as f:
+		f.write("\n".join(lines) + "\n")
+	os.replace(tmp_path, path)
+	return task, size
+
+
+def plan_chunks(out_dir, difficulties, count, chunk_size, seed, unique):
+	"""List the chunk tasks that still have to be generated"""
+	tasks = []
+	done = 0
+	for difficulty in difficulties:
+		os.makedirs(os.path.join(out_dir, difficulty), exist_ok=True)
+		for chunk in range((count + chunk_size - 1) // chunk_size):
+			size = min(chunk_size, count - chunk * chunk_size)
+			if os.path.exists(chunk_path(out_dir, difficulty, chunk)):
+				done += size
+				continue
+			tasks.append((out_dir, difficulty, chunk, size, seed, unique))
+	return tasks, done
+
+
+def build_bank(out_dir, difficulties, count, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, seed=0, unique=True, log=sys.stderr):
+	"""Generate count puzzles per difficulty into out_dir; returns puzzles generated"""
+	tasks, done = plan_chunks(out_dir, difficulties, count, chunk_size, seed, unique)
+	if done:
+		print(f"Resuming: {done} puzzles already on disk, {len(tasks)} chunks left", file=log)
+	if not tasks:
+		return 0
+
+	generated = 0
+	start = time.perf_counter()
+	with multiprocessing.Pool(workers) as pool:
+		for task, size in pool.imap_unordered(build_chunk, tasks):
+			generated += size
+			rate = generated / (time.perf_counter() - start)
+			print(f"{task[1]} chunk {task[2]}: {generated} puzzles, {rate:.1f} puzzles/sec", file=log)
+	elapsed = time.perf_counter() - start
+	print(f"Generated {generated} puzzles in {elapsed:.1f}s ({generated / elapsed:.1f} puzzles/sec)", file=log)
+	return generated
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Generate a Sudoku puzzle bank")
+	parser.add_argument("--count", type=int, required=True, help="puzzles per difficulty")
+	parser.add_argument("--difficulty", action="append", choices=sorted(sudoku_generator.DIFFICULTY_LEVELS),
+		help="difficulty to generate (repeatable, default: all)")
+	parser.add_argument("--out", default="puzzle_bank", help="output directory")
+	parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+	parser.add_argument("--workers", type=int, default=os.cpu_count())
+	parser.add_argument("--seed", type=int, default=0, help="base seed; chunk seeds derive from it")
+	parser.add_argument("--non-unique", action="store_true", help="allow puzzles with several solutions")
+	args = parser.parse_args(argv)
+
+	difficulties = args.difficulty or list(sudoku_generator.DIFFICULTY_LEVELS)
+	build_bank(args.out, difficulties, args.count, args.chunk_size, args.workers, args.seed, not args.non_unique)
+
+
+if __name__ == "__main__":
+	main()
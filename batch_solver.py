@@ -0,0 +1,232 @@
+"""Batched Sudoku solving with NumPy.
+
+Holds B boards as a (B, 81) array of cell values and runs naked and hidden
+singles on all of them at once: the per-unit masks, candidate masks and the
+hidden-single scan are whole-array operations, so the Python-level loop runs
+once per propagation round, not once per cell per board. Generated "easy"
+puzzles are solved by singles alone; the boards that get stuck are searched a level at a time for the whole batch, and only puzzles
+that need a deep search are handed, already reduced, to sudoku_solver's
+bitmask backtracker.
+
+	values = batch_solver.parse_puzzles(lines)
+	solutions, counts = batch_solver.solve_many(values)
+
+Masks follow sudoku_solver: bit d-1 set for digit d, packed in uint16.
+Requires numpy; bulk_solve.py falls back to per-board solving without it.
+"""
+import numpy as np
+
+import sudoku_solver
+
+ALL_DIGITS = sudoku_solver.ALL_DIGITS
+
+# (27, 9) cells of every unit, (81, 3) units of every cell
+UNITS = np.array(sudoku_solver.UNITS, dtype=np.intp)
+CELL_UNITS = np.array(sudoku_solver.CELL_UNITS, dtype=np.intp)
+
+BIT = np.array(sudoku_solver.BIT, dtype=np.uint16)
+POPCOUNT = np.array(sudoku_solver.POPCOUNT, dtype=np.uint8)
+# Lowest digit of every 9-bit mask (0 for an empty mask)
+LOWEST_DIGIT = np.array([d[0] if d else 0 for d in sudoku_solver.DIGITS_OF], dtype=np.uint8)
+
+# propagate() status per board
+STUCK, SOLVED, DEAD = 0, 1, -1
+
+# Boards solved together by solve_many; larger batches fall out of cache
+# (4096 ran about 1.6x faster than 100k at once)
+CHUNK_SIZE = 4096
+
+_DOT, _ZERO = ord("."), ord("0")
+
+
+def parse_puzzles(lines):
+	"""(B, 81) uint8 values from 81-character puzzle strings (0 or . for blanks).
+
+	Raises ValueError if a line is not a puzzle.
+	"""
+	data = "".join(lines).encode("ascii")
+	if len(data) != 81 * len(lines):
+		raise ValueError("every puzzle must be 81 characters")
+	values = np.frombuffer(data, dtype=np.uint8).reshape(-1, 81).copy()
+	values[values == _DOT] = _ZERO
+	values -= _ZERO
+	if (values > 9).any():
+		raise ValueError("puzzles may only contain digits and .")
+	return values
+
+
+def _bits(grid):
+	# Digit d as bit d-1 and 0 as no bit, with shifts rather than a table lookup
+	return (np.uint16(1) << grid.astype(np.uint16)) >> 1
+
+
+def _unit_used(bits):
+	# (27, n) digits placed in every unit
+	unit_used = bits[UNITS[:, 0]]
+	for k in range(1, 9):
+		unit_used |= bits[UNITS[:, k]]
+	return unit_used
+
+
+def _round(grid):
+	# One propagation round on an (81, n) cell-major grid, in place; returns
+	# (dead, changed) as per-board bool arrays. Boards run along the last
+	# axis, so every step below is a handful of whole-row operations
+	bits = _bits(grid)
+	unit_used = bits[UNITS[:, 0]]
+	clash = np.zeros_like(unit_used)
+	for k in range(1, 9):
+		b = bits[UNITS[:, k]]
+		clash |= unit_used & b # A digit twice in a unit
+		unit_used |= b
+	dead = clash.any(axis=0)
+
+	used = unit_used[CELL_UNITS[:, 0]] | unit_used[CELL_UNITS[:, 1]] | unit_used[CELL_UNITS[:, 2]]
+	empty = grid == 0
+	cands = ~used & ALL_DIGITS
+	cands *= empty
+	dead |= (empty & (cands == 0)).any(axis=0)
+
+	# Hidden singles with the once/twice trick of sudoku_solver
+	once = cands[UNITS[:, 0]]
+	twice = np.zeros_like(once)
+	for k in range(1, 9):
+		c = cands[UNITS[:, k]]
+		twice |= once & c
+		once |= c
+	dead |= ((once | unit_used) != ALL_DIGITS).any(axis=0)
+	hidden = once & ~twice
+	# Back to cells: the digits that have no other place in one of the cell's units
+	hidden = (hidden[CELL_UNITS[:, 0]] | hidden[CELL_UNITS[:, 1]] | hidden[CELL_UNITS[:, 2]]) & cands
+	dead |= (hidden & (hidden - 1)).any(axis=0)
+
+	# A naked single's only candidate is also its hidden digit, if it has one
+	assign = cands * ((cands & (cands - 1)) == 0)
+	assign |= hidden
+	changed = assign.max(axis=0) > 0
+	grid |= LOWEST_DIGIT[assign]
+	return dead, changed
+
+
+def _propagate(grid, max_rounds=81):
+	# propagate() on a cell-major grid
+	status = np.full(grid.shape[1], STUCK, dtype=np.int8)
+	active = np.arange(grid.shape[1])
+	work = grid
+	for _ in range(max_rounds):
+		if not len(active):
+			break
+		dead, changed = _round(work)
+		# Assignments made in this round are checked in the next one, so a
+		# board only counts as solved once a round finds it full and clean
+		full = ~dead & ~changed & (work != 0).all(axis=0)
+		status[active[dead]] = DEAD
+		status[active[full]] = SOLVED
+		keep = changed & ~dead
+		if not keep.all():
+			# Boards leave the working set, so write them back
+			grid[:, active[~keep]] = work[:, ~keep]
+			active = active[keep]
+			work = work[:, keep]
+	grid[:, active] = work
+	return status
+
+
+def propagate(values, max_rounds=81):
+	"""Apply naked and hidden singles to every board until none changes.
+
+	values is a (B, 81) uint8 array, updated in place. Returns a (B,) int8
+	status: SOLVED, DEAD (the givens or a forced digit clash) or STUCK
+	(needs a search). Boards drop out of the working set as soon as they
+	settle, so late rounds only touch the few boards still changing.
+	"""
+	grid = np.ascontiguousarray(values.T)
+	status = _propagate(grid, max_rounds)
+	values[:] = grid.T
+	return status
+
+
+def _branch(grid):
+	# Split every board of a cell-major grid on its most constrained empty
+	# cell: one child per candidate. Returns (children, parent board of each)
+	unit_used = _unit_used(_bits(grid))
+	used = unit_used[CELL_UNITS[:, 0]] | unit_used[CELL_UNITS[:, 1]] | unit_used[CELL_UNITS[:, 2]]
+	cands = ~used & ALL_DIGITS
+	counts = np.where(grid == 0, POPCOUNT[cands], 10)
+	cell = counts.argmin(axis=0)
+	choices = cands[cell, np.arange(grid.shape[1])]
+	children = []
+	parents = []
+	for d in range(1, 10):
+		boards = np.flatnonzero(choices & BIT[d])
+		child = grid[:, boards]
+		child[cell[boards], np.arange(len(boards))] = d
+		children.append(child)
+		parents.append(boards)
+	return np.concatenate(children, axis=1), np.concatenate(parents)
+
+
+def solve_many(values, unique=True, max_levels=30, max_frontier=8):
+	"""Solve a (B, 81) batch; returns (solutions, counts).
+
+	solutions is a (B, 81) uint8 array, all zeros where there is no
+	solution; counts holds 0, 1 or (with unique=True) 2 for several
+	solutions, matching sudoku_solver.solve_unique.
+
+	Boards left stuck by singles are searched breadth first, a level at a
+	time for the whole batch: each open board is split on its most
+	constrained cell and the children are propagated together. Singles are
+	forced, so counting the solved leaves of a puzzle counts its solutions.
+	Puzzles still open after max_levels, or once open boards outnumber open
+	puzzles max_frontier to one, finish in sudoku_solver from their
+	propagated grid. Large batches are worked through CHUNK_SIZE boards at
+	a time.
+	"""
+	values = np.array(values, dtype=np.uint8).reshape(-1, 81)
+	solutions = np.empty_like(values)
+	counts = np.empty(len(values), dtype=np.uint8)
+	for i in range(0, len(values), CHUNK_SIZE):
+		grid, chunk_counts = _solve_chunk(np.ascontiguousarray(values[i:i + CHUNK_SIZE].T), unique, max_levels, max_frontier)
+		solutions[i:i + CHUNK_SIZE] = grid.T
+		counts[i:i + CHUNK_SIZE] = chunk_counts
+	return solutions, counts
+
+
+def _solve_chunk(grid, unique, max_levels, max_frontier):
+	# solve_many() on one cell-major chunk, solved in place
+	status = _propagate(grid)
+	counts = (status == SOLVED).astype(np.uint8)
+	limit = 2 if unique else 1
+	stuck = np.flatnonzero(status == STUCK)
+	reduced = grid[:, stuck] # Propagated grids, for the scalar fallback
+	frontier, origin = reduced, stuck
+	for _ in range(max_levels):
+		if not len(origin) or len(origin) > max_frontier * len(np.unique(origin)):
+			break
+		frontier, parent = _branch(frontier)
+		origin = origin[parent]
+		status = _propagate(frontier)
+		solved = np.flatnonzero(status == SOLVED)
+		if len(solved):
+			# Keep one solution per puzzle, the first one found
+			first = solved[counts[origin[solved]] == 0]
+			grid[:, origin[first]] = frontier[:, first]
+			np.add.at(counts, origin[solved], 1)
+		open_ = (status == STUCK) & (counts[origin] < limit)
+		frontier, origin = frontier[:, open_], origin[open_]
+
+	np.minimum(counts, limit, out=counts)
+	for b in np.unique(origin):
+		if counts[b] >= limit:
+			continue
+		cells = reduced[:, np.searchsorted(stuck, b)].tolist()
+		if unique:
+			solution, count = sudoku_solver.solve_unique(cells)
+		else:
+			solution = sudoku_solver.solve_cells(cells)
+			count = int(solution is not None)
+		counts[b] = count
+		if solution is not None:
+			grid[:, b] = solution
+	grid[:, counts == 0] = 0
+	return grid, counts
@@ -0,0 +1,316 @@
+"""Benchmarks for the game's hot paths.
+
+Runs headless (SDL dummy video driver) with fixed seeds and prints one line
+per metric. Metric names end in their unit: *_ms and *_us are times (lower
+is better), *_per_s are rates (higher is better).
+
+	python benchmarks/bench.py                       # run everything
+	python benchmarks/bench.py --only solve,rate     # some groups only
+	python benchmarks/bench.py --out baseline.json   # save results
+	python benchmarks/bench.py --compare baseline.json
+
+--compare prints each metric next to the baseline and exits with status 1
+if any of them got worse by more than --threshold percent.
+
+hard_puzzles.txt is the fixed solve corpus: Arto Inkala's puzzle followed
+by 49 puzzles the generator made from seed 2024 that the rater grades hard
+or expert.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import difficulty_rater
+import dlx_solver
+import sudoku_core
+import sudoku_solver
+
+CORPUS_FILE = os.path.join(HERE, "hard_puzzles.txt")
+SEED = 1234
+GROUPS = ("import", "generate", "solve", "rate", "moves", "render")
+
+
+def percentile(samples, p):
+	"""p-th percentile (0-100) of samples, nearest rank"""
+	ordered = sorted(samples)
+	k = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+	return ordered[k]
+
+
+def timings(name, samples, unit="ms"):
+	# p50/p99/mean of a list of seconds
+	scale = 1000 if unit == "ms" else 1000000
+	return {
+		f"{name}.p50_{unit}": percentile(samples, 50) * scale,
+		f"{name}.p99_{unit}": percentile(samples, 99) * scale,
+		f"{name}.mean_{unit}": statistics.fmean(samples) * scale,
+	}
+
+
+def load_game():
+	# Imported here so groups that don't need pygame run without it
+	import Sudoku_game
+	Sudoku_game.init_display()
+	return Sudoku_game
+
+
+def load_corpus():
+	with open(CORPUS_FILE) as f:
+		return [[0 if ch == "." else int(ch) for ch in line.strip()] for line in f if line.strip()]
+
+
+def bench_import(quick):
+	# Cold import of the core in a fresh interpreter, as a worker process pays it
+	samples = []
+	for _ in range(5 if quick else 20):
+		out = subprocess.run(
+			[sys.executable, "-X", "importtime", "-c", "import sudoku_core"],
+			capture_output=True, text=True, cwd=os.path.dirname(HERE), check=True
+		).stderr
+		line = [l for l in out.splitlines() if l.endswith("| sudoku_core")][-1]
+		samples.append(int(line.split("|")[1]) / 1000000)
+	return timings("import.sudoku_core", samples)
+
+
+def bench_generate(quick):
+	# Sudoku.generate_board draws from the global random module, so it is reseeded per board
+	game = sudoku_core.Sudoku("easy")
+	results = {}
+	for difficulty in ("easy", "medium", "hard"):
+		samples = []
+		for k in range(10 if quick else 50):
+			random.seed(SEED + k)
+			start = time.perf_counter()
+			game.generate_board(difficulty)
+			samples.append(time.perf_counter() - start)
+		results.update(timings(f"generate.{difficulty}", samples))
+	return results
+
+
+def _solve_in_steps(cells):
+	# Yielding after every node, the most a time-sliced caller can pay
+	steps = sudoku_solver.solve_steps(cells, max_nodes=1)
+	while True:
+		try:
+			next(steps)
+		except StopIteration as done:
+			return done.value
+
+
+def bench_solve(quick):
+	corpus = load_corpus()
+	if quick:
+		corpus = corpus[:10]
+	results = {}
+	for name, solve in (
+		("bitmask", sudoku_solver.solve_cells), ("steps", _solve_in_steps), ("exact_cover", dlx_solver.ExactCover(3).solve)
+	):
+		samples = []
+		for cells in corpus:
+			start = time.perf_counter()
+			solved = solve(cells)
+			samples.append(time.perf_counter() - start)
+			if solved is None:
+				raise RuntimeError(f"{name} failed to solve a corpus puzzle")
+		results[f"solve.{name}.puzzles_per_s"] = len(samples) / sum(samples)
+		results.update(timings(f"solve.{name}", samples))
+	try:
+		import batch_solver
+	except ImportError: # numpy is optional
+		return results
+	# The corpus repeated to one full chunk, solved as a single batch
+	batch = [corpus[k % len(corpus)] for k in range(batch_solver.CHUNK_SIZE // (8 if quick else 1))]
+	start = time.perf_counter()
+	batch_solver.solve_many(batch)
+	results["solve.batch.puzzles_per_s"] = len(batch) / (time.perf_counter() - start)
+	return results
+
+
+def bench_rate(quick):
+	# The corpus is all hard and expert boards, the rater's slowest
+	corpus = load_corpus()
+	samples = []
+	for _ in range(2 if quick else 10):
+		for cells in corpus:
+			start = time.perf_counter()
+			difficulty_rater.rate(cells)
+			samples.append(time.perf_counter() - start)
+	results = timings("rate", samples, "us")
+	results["rate.puzzles_per_s"] = len(samples) / sum(samples)
+	return results
+
+
+def bench_moves(quick):
+	# A long scripted session: right and wrong entries, clears and notes,
+	# then everything undone and redone
+	random.seed(SEED)
+	game = sudoku_core.Sudoku("hard")
+	rng = random.Random(SEED)
+	empty = [(i // 9, i % 9) for i in range(81) if game.board[i] == 0]
+	n = 2000 if quick else 20000
+	# Every scripted move changes the board: entries are wrong digits (a right
+	# one locks the cell, turning later moves on it into no-ops), clears hit
+	# filled cells and notes empty ones
+	filled = set()
+	moves = []
+	for _ in range(n):
+		row, col = cell = rng.choice(empty)
+		kind = rng.random()
+		if kind < 0.4:
+			wrong = [d for d in range(1, 10) if d != game.solution[row * 9 + col]]
+			moves.append((game.place_number, row, col, rng.choice(wrong)))
+			filled.add(cell)
+		elif kind < 0.5 and filled:
+			row, col = cell = rng.choice(sorted(filled))
+			moves.append((game.place_number, row, col, 0))
+			filled.discard(cell)
+		elif len(filled) < len(empty):
+			while cell in filled:
+				row, col = cell = rng.choice(empty)
+			moves.append((game.toggle_note, row, col, rng.randint(1, 9)))
+		else:
+			moves.append((game.place_number, row, col, 0))
+			filled.discard(cell)
+
+	results = {}
+	start = time.perf_counter()
+	for move, row, col, num in moves:
+		move(row, col, num)
+	results["moves.place_or_note_us"] = (time.perf_counter() - start) / len(moves) * 1000000
+
+	undone = 0
+	start = time.perf_counter()
+	while game.history.done:
+		game.undo()
+		undone += 1
+	elapsed = time.perf_counter() - start
+	results["moves.undo_us"] = elapsed / max(1, undone) * 1000000
+
+	start = time.perf_counter()
+	for _ in range(undone):
+		game.redo()
+	results["moves.redo_us"] = (time.perf_counter() - start) / max(1, undone) * 1000000
+	return results
+
+
+def bench_render(quick):
+	# One full frame as main() paints it, with every empty cell full of notes
+	G = load_game()
+	random.seed(SEED)
+	game = G.game = G.Sudoku("hard")
+	for i in range(81):
+		if game.board[i] == 0:
+			if i % 3 == 0:
+				game.user_input[i] = game.solution[i]
+			else:
+				game.notes[i] = 0x1FF
+	game.selected = (4, 4)
+
+	def frame():
+		G.draw_grid()
+		G.draw_numbers(game.board, game.user_input, game.notes, game.highlighted_cells(), game.selected, False)
+		G.draw_controls(False)
+
+	for _ in range(20):
+		frame()
+	samples = []
+	for _ in range(100 if quick else 500):
+		start = time.perf_counter()
+		frame()
+		samples.append(time.perf_counter() - start)
+	return timings("render.frame", samples)
+
+
+def run(groups, quick):
+	results = {}
+	for group in groups:
+		results.update(globals()[f"bench_{group}"](quick))
+	return results
+
+
+def metadata(quick):
+	meta = {
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"seed": SEED,
+		"quick": quick,
+		"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+	}
+	try:
+		import pygame
+		meta["pygame"] = pygame.version.ver
+	except ImportError:
+		pass
+	return meta
+
+
+def compare(results, baseline, threshold):
+	"""Print results against a baseline; returns the names of regressed metrics"""
+	regressed = []
+	print(f"{'metric':40s} {'current':>12s} {'baseline':>12s}   change")
+	for name in sorted(results):
+		value = results[name]
+		old = baseline.get(name)
+		if old is None:
+			print(f"{name:40s} {value:12.3f}   (new)")
+			continue
+		change = (value - old) / old * 100 if old else 0.0
+		# Rates regress when they drop, times when they grow
+		worse = -change if name.endswith("_per_s") else change
+		flag = ""
+		if worse > threshold:
+			flag = "  REGRESSION"
+			regressed.append(name)
+		elif worse < -threshold:
+			flag = "  improved"
+		print(f"{name:40s} {value:12.3f} {old:12.3f} {change:+8.1f}%{flag}")
+	return regressed
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark import, generation, solving, rating, moves and rendering")
+	parser.add_argument("--only", help="comma-separated groups: " + ",".join(GROUPS))
+	parser.add_argument("--quick", action="store_true", help="fewer repetitions, for a smoke run")
+	parser.add_argument("--out", help="write results as JSON to this file")
+	parser.add_argument("--compare", help="baseline JSON written by --out")
+	parser.add_argument("--threshold", type=float, default=10.0, help="percent change that counts as a regression")
+	args = parser.parse_args(argv)
+
+	groups = args.only.split(",") if args.only else list(GROUPS)
+	for group in groups:
+		if group not in GROUPS:
+			parser.error(f"unknown group {group!r}")
+
+	results = run(groups, args.quick)
+	report = {"meta": metadata(args.quick), "results": results}
+	if args.out:
+		with open(args.out, "w") as f:
+			json.dump(report, f, indent=2, sort_keys=True)
+
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)["results"]
+		regressed = compare(results, baseline, args.threshold)
+		if regressed:
+			print(f"{len(regressed)} metric(s) regressed by more than {args.threshold:.0f}%")
+			return 1
+	else:
+		for name in sorted(results):
+			print(f"{name:40s} {results[name]:12.3f}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,197 @@
+"""Streaming bulk solver for puzzle files.
+
+Reads one 81-character puzzle per line (digits, with 0 or . for a blank;
+anything after the first whitespace is ignored, so bank_builder chunk files
+work as input), solves them in batches across a process pool and writes
+
+	<puzzle> <solution> <status>
+
+per line as results come in. status is solved, unsolvable, multiple (more
+than one solution) or invalid (not a puzzle line); the solution is "-"
+unless the puzzle is solved.
+
+	python bulk_solve.py puzzles.txt --out solutions.txt
+	cat puzzles.txt | python bulk_solve.py - --unordered > solutions.txt
+
+Input is read lazily and at most --window batches are in flight at a time,
+so memory stays flat however large the file is. By default output follows
+the input order; --unordered writes each batch as soon as it is done, which
+keeps all workers busy when some batches are slower than others. Progress
+and puzzles/sec go to stderr.
+
+With numpy installed each batch is solved by batch_solver, which runs the
+whole batch through vectorized propagation at once; --scalar solves one
+puzzle at a time with sudoku_solver instead.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import deque
+
+import sudoku_solver
+
+try:
+	import batch_solver
+except ImportError: # numpy is optional
+	batch_solver = None
+
+DEFAULT_BATCH_SIZE = 4096 # batch_solver.CHUNK_SIZE
+STATUSES = ("solved", "unsolvable", "multiple", "invalid")
+
+_BLANKS = {".": 0, "0": 0}
+_CELL_VALUES = dict(_BLANKS, **{str(d): d for d in range(1, 10)})
+_CELL_CHARS = set(_CELL_VALUES)
+_COUNT_STATUS = ("unsolvable", "solved", "multiple")
+
+
+def parse_puzzle(text):
+	"""81 flat cells from a puzzle string, or None if it is not one"""
+	if len(text) != 81:
+		return None
+	try:
+		return [_CELL_VALUES[ch] for ch in text]
+	except KeyError:
+		return None
+
+
+def solve_puzzle(text):
+	"""(status, solution string or "-") for one puzzle string"""
+	cells = parse_puzzle(text)
+	if cells is None:
+		return "invalid", "-"
+	solution, count = sudoku_solver.solve_unique(cells)
+	if count == 0:
+		return "unsolvable", "-"
+	if count > 1:
+		return "multiple", "-"
+	return "solved", "".join(map(str, solution))
+
+
+def solve_batch(batch, scalar=False):
+	"""Solve a list of puzzle strings; returns [(puzzle, status, solution)]"""
+	if scalar or batch_solver is None:
+		return [(text,) + solve_puzzle(text) for text in batch]
+	valid = [text for text in batch if len(text) == 81 and _CELL_CHARS.issuperset(text)]
+	results = {}
+	if valid:
+		solutions, counts = batch_solver.solve_many(batch_solver.parse_puzzles(valid))
+		digits = (solutions + ord("0")).tobytes().decode("ascii")
+		for k, text in enumerate(valid):
+			status = _COUNT_STATUS[counts[k]]
+			results[text] = status, digits[k * 81:k * 81 + 81] if status == "solved" else "-"
+	return [(text,) + results.get(text, ("invalid", "-")) for text in batch]
+
+
+def read_batches(lines, batch_size):
+	"""Group non-empty input lines into lists of puzzle strings, lazily"""
+	batch = []
+	for line in lines:
+		fields = line.split(None, 1)
+		if not fields:
+			continue
+		batch.append(fields[0])
+		if len(batch) == batch_size:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
+def solve_stream(lines, workers=None, batch_size=DEFAULT_BATCH_SIZE, ordered=True, window=None, scalar=False):
+	"""Yield (puzzle, status, solution) for every puzzle line, solving in batches.
+
+	workers=0 solves in this process. Otherwise batches go to a pool of
+	workers processes with at most window batches (default 2 per worker)
+	submitted and not yet yielded, so lines are only read as fast as they
+	are solved. scalar=True skips batch_solver even when numpy is there.
+	"""
+	batches = read_batches(lines, batch_size)
+	if workers == 0:
+		for batch in batches:
+			yield from solve_batch(batch, scalar)
+		return
+
+	workers = workers or os.cpu_count()
+	window = window or 2 * workers
+	with multiprocessing.Pool(workers) as pool:
+		if ordered:
+			# Oldest batch first; waiting on it also throttles reading
+			pending = deque()
+			for batch in batches:
+				pending.append(pool.apply_async(solve_batch, (batch, scalar)))
+				if len(pending) >= window:
+					yield from pending.popleft().get()
+			while pending:
+				yield from pending.popleft().get()
+		else:
+			# Whichever batch finishes first; callbacks run on the pool's result thread
+			done = queue.SimpleQueue()
+			in_flight = 0
+			for batch in batches:
+				pool.apply_async(solve_batch, (batch, scalar), callback=done.put, error_callback=done.put)
+				in_flight += 1
+				if in_flight >= window:
+					yield from _result(done.get())
+					in_flight -= 1
+			while in_flight:
+				yield from _result(done.get())
+				in_flight -= 1
+
+
+def _result(result):
+	# A worker exception comes back through error_callback
+	if isinstance(result, BaseException):
+		raise result
+	return result
+
+
+def solve_file(infile, outfile, workers=None, batch_size=DEFAULT_BATCH_SIZE, ordered=True, window=None, scalar=False, log=sys.stderr, every=5.0):
+	"""Solve every puzzle in infile into outfile; returns the count per status"""
+	counts = dict.fromkeys(STATUSES, 0)
+	total = 0
+	start = last_report = time.perf_counter()
+	for text, status, solution in solve_stream(infile, workers, batch_size, ordered, window, scalar):
+		outfile.write(f"{text} {solution} {status}\n")
+		counts[status] += 1
+		total += 1
+		if log is not None and total % batch_size == 0:
+			now = time.perf_counter()
+			if now - last_report >= every:
+				last_report = now
+				print(f"{total} puzzles, {total / (now - start):.1f} puzzles/sec", file=log)
+	elapsed = time.perf_counter() - start
+	if log is not None:
+		rate = total / elapsed if elapsed else 0.0
+		summary = ", ".join(f"{counts[s]} {s}" for s in STATUSES)
+		print(f"Solved {total} puzzles in {elapsed:.1f}s ({rate:.1f} puzzles/sec): {summary}", file=log)
+	return counts
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Solve a file of 81-character Sudoku puzzles")
+	parser.add_argument("input", help="puzzle file, or - for stdin")
+	parser.add_argument("--out", help="output file (default: stdout)")
+	parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes, 0 to solve in this process")
+	parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="puzzles per batch sent to a worker")
+	parser.add_argument("--window", type=int, help="batches in flight at once (default: 2 per worker)")
+	parser.add_argument("--unordered", action="store_true", help="write results as batches finish, not in input order")
+	parser.add_argument("--scalar", action="store_true", help="solve puzzles one at a time even when numpy is installed")
+	args = parser.parse_args(argv)
+
+	infile = sys.stdin if args.input == "-" else open(args.input)
+	outfile = open(args.out, "w") if args.out else sys.stdout
+	try:
+		counts = solve_file(infile, outfile, args.workers, args.batch_size, not args.unordered, args.window, args.scalar)
+	finally:
+		if infile is not sys.stdin:
+			infile.close()
+		if outfile is not sys.stdout:
+			outfile.close()
+	return 1 if counts["invalid"] else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,96 @@
+import sudoku_solver
+
+
+class CandidateEngine:
+	"""Live candidate masks for every cell of a game.
+
+	Tracks how often each digit appears in each of the 27 units, so changing
+	one cell only recomputes the candidates of that cell and its 20 peers
+	instead of re-checking the whole board. Works on any box size: cells has
+	81 entries for 9x9, 256 for 16x16 and so on; bit d-1 of a mask is digit d.
+	"""
+	__slots__ = ('size', 'all_digits', 'units', 'cell_units', 'peers', 'values', 'counts', 'unit_masks', 'cands')
+
+	def __init__(self, cells, box=3):
+		self.size = box * box
+		self.all_digits = (1 << self.size) - 1
+		self.units, self.cell_units, self.peers = sudoku_solver.geometry(box)
+		self.values = bytearray(len(cells))
+		self.counts = bytearray(len(self.units) * (self.size + 1)) # counts[unit * (size + 1) + digit]
+		self.unit_masks = [0] * len(self.units) # Digits present in each unit
+		self.cands = [self.all_digits] * len(cells)
+		for i, v in enumerate(cells):
+			if v:
+				self._add(i, v)
+		for i in range(len(cells)):
+			self._refresh(i)
+
+	def _add(self, i, digit):
+		self.values[i] = digit
+		for u in self.cell_units[i]:
+			k = u * (self.size + 1) + digit
+			self.counts[k] += 1
+			self.unit_masks[u] |= 1 << (digit - 1)
+
+	def _remove(self, i):
+		digit = self.values[i]
+		self.values[i] = 0
+		for u in self.cell_units[i]:
+			k = u * (self.size + 1) + digit
+			self.counts[k] -= 1
+			if not self.counts[k]:
+				self.unit_masks[u] &= ~(1 << (digit - 1))
+
+	def _refresh(self, i):
+		if self.values[i]:
+			self.cands[i] = 0
+		else:
+			r, c, b = self.cell_units[i]
+			masks = self.unit_masks
+			self.cands[i] = self.all_digits & ~(masks[r] | masks[c] | masks[b])
+
+	def set(self, i, value):
+		"""Change cell i (0 clears it) and update it and its peers"""
+		if self.values[i] == value:
+			return
+		if self.values[i]:
+			self._remove(i)
+		if value:
+			self._add(i, value)
+		self._refresh(i)
+		for p in self.peers[i]:
+			self._refresh(p)
+
+	def in_conflict(self, i):
+		"""True if the digit in cell i also appears elsewhere in one of its units"""
+		digit = self.values[i]
+		return bool(digit) and any(self.counts[u * (self.size + 1) + digit] > 1 for u in self.cell_units[i])
+
+	def conflicts(self):
+		return [i for i in range(len(self.values)) if self.in_conflict(i)]
+
+	def hint(self):
+		"""Next logical deduction as (cell, digit, technique), or None.
+
+		Looks for a naked single (a cell with one candidate), then a hidden
+		single (a digit with one place left in a unit).
+		"""
+		values = self.values
+		cands = self.cands
+		for i in range(len(values)):
+			c = cands[i]
+			if not values[i] and c and not c & (c - 1):
+				return i, c.bit_length(), "naked single"
+		for unit in self.units:
+			once = twice = 0
+			for i in unit:
+				c = cands[i]
+				twice |= once & c
+				once |= c
+			hidden = once & ~twice
+			if hidden:
+				bit = hidden & -hidden
+				for i in unit:
+					if cands[i] & bit:
+						return i, bit.bit_length(), "hidden single"
+		return None
@@ -0,0 +1,231 @@
+"""Canonical forms of 9x9 puzzles, for spotting the same puzzle in disguise.
+
+Relabelling the digits, permuting rows within a band or columns within a
+stack, permuting bands or stacks, and transposing all give a puzzle that
+plays exactly the same. canonical() maps every puzzle of such a class to one
+representative: the lexicographically smallest 81-digit string (0 for a
+blank) over all 2 * 1296 * 1296 row/column transforms, with digits numbered
+in order of first appearance.
+
+canonical() is exact but costs milliseconds, so DedupIndex keys puzzles by
+fingerprint(), a cheap hash of symmetry-invariant counts, and only computes
+canonical forms when two puzzles share a fingerprint.
+"""
+from itertools import permutations
+
+from sudoku_solver import BOX_OF, COL_OF, ROW_OF
+
+# Cell i of the transposed board is cell TRANSPOSE[i] of the original
+TRANSPOSE = [COL_OF[i] * 9 + ROW_OF[i] for i in range(81)]
+
+_PERMS = list(permutations(range(3)))
+
+# The 1296 orders of 9 rows (or columns) that keep bands (stacks) together
+LINE_ORDERS = [
+	tuple(band * 3 + k for band, inner in zip(bands, (p0, p1, p2)) for k in inner)
+	for bands in _PERMS for p0 in _PERMS for p1 in _PERMS for p2 in _PERMS
+]
+
+# The 72 ways band/stack permutations and transposition move the 3x3 grid of boxes
+_BOX_ORDERS = [
+	tuple((bands[j] * 3 + stacks[i]) if flip else (bands[i] * 3 + stacks[j]) for i in range(3) for j in range(3))
+	for bands in _PERMS for stacks in _PERMS for flip in (False, True)
+]
+
+_BEST_ORDERS = {} # clue mask of a row -> column orders putting its blanks first
+
+
+def transform(cells, transpose=False, row_order=LINE_ORDERS[0], col_order=LINE_ORDERS[0], relabel=None):
+	"""81 flat cells after a symmetry: optional transpose, then row and
+	column orders from LINE_ORDERS, then relabel[d] for every digit d"""
+	if transpose:
+		cells = [cells[i] for i in TRANSPOSE]
+	out = [cells[r * 9 + c] for r in row_order for c in col_order]
+	if relabel is not None:
+		out = [relabel[v] if v else 0 for v in out]
+	return out
+
+
+def random_transform(cells, rng):
+	"""cells under a random symmetry; plays exactly like the original"""
+	digits = list(range(1, 10))
+	rng.shuffle(digits)
+	return transform(
+		cells, rng.random() < 0.5, rng.choice(LINE_ORDERS), rng.choice(LINE_ORDERS), [0] + digits
+	)
+
+
+def _best_orders(mask):
+	# Column orders giving the smallest blank/clue pattern for a row; after
+	# relabelling, the first row only differs in where its blanks are
+	if mask not in _BEST_ORDERS:
+		keyed = [(tuple(mask >> c & 1 for c in order), order) for order in LINE_ORDERS]
+		best = min(keyed)[0]
+		_BEST_ORDERS[mask] = [order for key, order in keyed if key == best]
+	return _BEST_ORDERS[mask]
+
+
+def _next_rows(rows):
+	# Rows that can come next: the rest of the current band, or any row of a band not used yet
+	if len(rows) % 3:
+		band = rows[-1] // 3 * 3
+		return [r for r in range(band, band + 3) if r not in rows]
+	used = {r // 3 for r in rows}
+	return [r for r in range(9) if r // 3 not in used]
+
+
+def _merge(candidates):
+	# Drop candidates whose remaining rows would come out exactly like an
+	# earlier one's; without this a board with few clues keeps thousands of
+	# tied transforms alive (an empty board took half a minute)
+	seen = set()
+	kept = []
+	for candidate in candidates:
+		grid, rows, order, labels, _ = candidate
+		left = [r for r in range(9) if r not in rows]
+		key = (
+			len(rows) % 3 and rows[-1] // 3, tuple(labels),
+			tuple(tuple(grid[r * 9 + c] for c in order) for r in left), tuple(r // 3 for r in left)
+		)
+		if key not in seen:
+			seen.add(key)
+			kept.append(candidate)
+	return kept
+
+
+def canonical(cells):
+	"""Smallest equivalent of 81 flat cells under all Sudoku symmetries, as an 81-digit string.
+
+	Builds the answer a row at a time, keeping every partial transform that
+	ties for the smallest prefix so far; the column order is chosen with the
+	first row, and digits get labels 1, 2, 3... as they first appear.
+	"""
+	cells = list(cells)
+	grids = (cells, [cells[i] for i in TRANSPOSE])
+
+	# First row: the row whose clue pattern sorts lowest, blanks first
+	starts = []
+	for grid in grids:
+		for r in range(9):
+			mask = sum(1 << c for c in range(9) if grid[r * 9 + c])
+			orders = _best_orders(mask)
+			starts.append((tuple(mask >> c & 1 for c in orders[0]), grid, r, orders))
+	first = min(start[0] for start in starts)
+	candidates = []
+	for key, grid, r, orders in starts:
+		if key != first:
+			continue
+		for order in orders:
+			labels = [0] * 10
+			label = 0
+			for c in order:
+				v = grid[r * 9 + c]
+				if v and not labels[v]:
+					label += 1
+					labels[v] = label
+			candidates.append((grid, (r,), order, labels, label))
+	grid, rows, order, labels, _ = candidates[0]
+	result = [tuple(labels[grid[rows[0] * 9 + c]] for c in order)]
+
+	for _ in range(8):
+		if len(candidates) > 16:
+			candidates = _merge(candidates)
+		best = None
+		next_candidates = []
+		for grid, rows, order, labels, label in candidates:
+			for r in _next_rows(rows):
+				row_labels = labels
+				row_label = label
+				row = []
+				for c in order:
+					v = grid[r * 9 + c]
+					if v and not row_labels[v]:
+						if row_labels is labels:
+							row_labels = labels[:]
+						row_label += 1
+						row_labels[v] = row_label
+					row.append(row_labels[v])
+				row = tuple(row)
+				if best is None or row < best:
+					best = row
+					next_candidates = []
+				if row == best:
+					next_candidates.append((grid, rows + (r,), order, row_labels, row_label))
+		result.append(best)
+		candidates = next_candidates
+	return "".join(str(v) for row in result for v in row)
+
+
+def fingerprint(cells):
+	"""Hash of counts that no symmetry changes; equal for equivalent puzzles.
+
+	Combines the clue counts of the boxes (up to band/stack moves and
+	transposition), of the rows and columns per band and stack, of each digit,
+	and for every clue the counts of its row, column, box and digit.
+	"""
+	rows = [0] * 9
+	cols = [0] * 9
+	boxes = [0] * 9
+	digits = [0] * 10
+	clues = []
+	for i, v in enumerate(cells):
+		if v:
+			rows[ROW_OF[i]] += 1
+			cols[COL_OF[i]] += 1
+			boxes[BOX_OF[i]] += 1
+			digits[v] += 1
+			clues.append(i)
+	box_key = min(tuple(boxes[b] for b in order) for order in _BOX_ORDERS)
+	bands = tuple(sorted(tuple(sorted(rows[k:k + 3])) for k in (0, 3, 6)))
+	stacks = tuple(sorted(tuple(sorted(cols[k:k + 3])) for k in (0, 3, 6)))
+	clue_key = sorted(
+		(min(rows[ROW_OF[i]], cols[COL_OF[i]]), max(rows[ROW_OF[i]], cols[COL_OF[i]]), boxes[BOX_OF[i]], digits[cells[i]])
+		for i in clues
+	)
+	return hash((box_key, min(bands, stacks), max(bands, stacks), tuple(sorted(digits)), tuple(clue_key)))
+
+
+class DedupIndex:
+	"""Set of puzzles up to symmetry.
+
+	add() is O(1) for a puzzle whose fingerprint is new, which is nearly
+	every puzzle that is not a duplicate; canonical forms are only worked
+	out (and then kept) for puzzles that share a fingerprint.
+	"""
+
+	def __init__(self):
+		# fingerprint -> the first puzzle as bytes, or the set of canonical
+		# forms once a second puzzle arrives with the same fingerprint
+		self._buckets = {}
+		self.size = 0
+		self.duplicates = 0
+		self.canonicalized = 0
+
+	def __len__(self):
+		return self.size
+
+	def _canonical(self, cells):
+		self.canonicalized += 1
+		return canonical(cells)
+
+	def add(self, cells):
+		"""Add a puzzle (81 flat cells); returns False if an equivalent one is already in"""
+		key = fingerprint(cells)
+		bucket = self._buckets.get(key)
+		if bucket is None:
+			self._buckets[key] = bytes(cells)
+			self.size += 1
+			return True
+		if isinstance(bucket, bytes):
+			if bucket == bytes(cells):
+				# The same puzzle again, no need for canonical forms
+				self.duplicates += 1
+				return False
+			bucket = self._buckets[key] = {self._canonical(bucket)}
+		form = self._canonical(cells)
+		if form in bucket:
+			self.duplicates += 1
+			return False
+		bucket.add(form)
+		self.size += 1
+		return True
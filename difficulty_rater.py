@@ -0,0 +1,371 @@
+"""Grade puzzles by the hardest human technique needed to solve them.
+
+The rater solves on 9-bit candidate masks, always using the easiest
+technique that makes progress, and records the hardest one it had to use:
+
+	naked/hidden single       -> easy
+	locked candidates, pairs  -> medium
+	triples, X-Wing           -> hard
+	none of these is enough   -> expert
+"""
+from itertools import combinations
+from operator import itemgetter
+
+from sudoku_solver import ALL_DIGITS, BIT, CELL_UNITS, DIGIT_OF, DIGITS_OF, PEERS, POPCOUNT, UNITS
+
+TECHNIQUES = (
+	"naked single",
+	"hidden single",
+	"locked candidates",
+	"naked pair",
+	"hidden pair",
+	"naked triple",
+	"hidden triple",
+	"x-wing",
+)
+
+GRADE_OF = {
+	"naked single": "easy",
+	"hidden single": "easy",
+	"locked candidates": "medium",
+	"naked pair": "medium",
+	"hidden pair": "medium",
+	"naked triple": "hard",
+	"hidden triple": "hard",
+	"x-wing": "hard",
+	None: "expert",
+}
+
+GRADES = ("easy", "medium", "hard", "expert")
+
+ROWS = UNITS[:9]
+COLS = UNITS[9:18]
+BOXES = UNITS[18:]
+
+# Row and column segments, the three cells a line shares with a box: segment
+# 3 * n + j is where line n (rows are units 0-8, columns 9-17) crosses its
+# j-th box. For each, the other segments of its line, the other segments of
+# its box along the same direction, and the rest of the line and of the box
+_SEGMENTS = [line[3 * j:3 * j + 3] for line in UNITS[:18] for j in range(3)]
+_BOX_LINES = []
+for _n, _segment in enumerate(_SEGMENTS):
+	_line, _j = divmod(_n, 3)
+	_box = next(box for box in BOXES if _segment[0] in box)
+	_BOX_LINES.append((
+		[3 * _line + j for j in range(3) if j != _j],
+		[3 * line + _j for line in range(_line // 3 * 3, _line // 3 * 3 + 3) if line != _line],
+		[i for i in UNITS[_line] if i not in _segment],
+		[i for i in _box if i not in _segment],
+	))
+# Segments of each box, and the rows and columns through it
+_BOX_SEGMENTS = [[n for n, segment in enumerate(_SEGMENTS) if segment[0] in box] for box in BOXES]
+_BOX_CROSS = [[n // 3 for n in segments] for segments in _BOX_SEGMENTS]
+
+# Candidates of a unit's cells as a tuple, from the candidate list
+_UNIT_CANDS = [itemgetter(*unit) for unit in UNITS]
+
+
+class Contradiction(Exception):
+	pass
+
+
+class LogicalSolver:
+	"""Candidate-mask solver that applies techniques in order of difficulty.
+
+	The techniques assume the ones before them in step() have just found
+	nothing: subsets in particular skip the units where the complementary
+	subset (the rest of the unit's empty cells, with the rest of its missing
+	digits) is smaller, as it makes the same eliminations and was already
+	looked for.
+
+	Singles and locked candidates only go over the rows, units and boxes
+	that changed since they last did: clock counts the changes to the
+	candidates, changed holds the clock of the last change to each unit, and
+	naked_checked, hidden_checked and locked_checked the clock at which each
+	row, unit or box was last gone over.
+	"""
+
+	def __init__(self, cells):
+		self.values = list(cells)
+		self.hardest = -1
+		used = [0] * 27
+		for i, v in enumerate(cells):
+			if v:
+				bit = BIT[v]
+				for u in CELL_UNITS[i]:
+					if used[u] & bit:
+						raise Contradiction()
+					used[u] |= bit
+		self.missing = [ALL_DIGITS & ~bits for bits in used] # Digits not yet placed in each unit
+		self.clock = 0
+		self.changed = [0] * 27
+		self.naked_checked = [-1] * 9
+		self.hidden_checked = [-1] * 27
+		self.locked_checked = [-1] * 9
+		self.cands = [
+			0 if v else self.missing[r] & self.missing[c] & self.missing[b]
+			for v, (r, c, b) in zip(cells, CELL_UNITS)
+		]
+
+	def place(self, i, digit):
+		bit = BIT[digit]
+		self.values[i] = digit
+		self.cands[i] = 0
+		cands = self.cands
+		self.clock += 1
+		now = self.clock
+		changed = self.changed
+		for p in PEERS[i]:
+			if cands[p] & bit:
+				cands[p] &= ~bit
+				r, c, b = CELL_UNITS[p]
+				changed[r] = changed[c] = changed[b] = now
+		missing = self.missing
+		for u in CELL_UNITS[i]:
+			missing[u] &= ~bit
+			changed[u] = now
+
+	def eliminate(self, cells, mask):
+		"""Remove mask from the candidates of cells; True if anything changed"""
+		found = False
+		cands = self.cands
+		self.clock += 1
+		now = self.clock
+		changed = self.changed
+		for i in cells:
+			if cands[i] & mask:
+				cands[i] &= ~mask
+				r, c, b = CELL_UNITS[i]
+				changed[r] = changed[c] = changed[b] = now
+				found = True
+		return found
+
+	# Techniques: each returns True when it made progress
+
+	def naked_singles(self):
+		found = False
+		values = self.values
+		cands = self.cands
+		changed = self.changed
+		checked = self.naked_checked
+		for r, row in enumerate(ROWS):
+			if changed[r] <= checked[r]:
+				continue
+			checked[r] = self.clock
+			for i in row:
+				if not values[i]:
+					c = cands[i]
+					if not c:
+						raise Contradiction()
+					if not c & (c - 1):
+						self.place(i, DIGIT_OF[c])
+						found = True
+		return found
+
+	def hidden_singles(self):
+		found = False
+		cands = self.cands
+		missing = self.missing
+		changed = self.changed
+		checked = self.hidden_checked
+		for u, unit in enumerate(UNITS):
+			if changed[u] <= checked[u]:
+				continue
+			checked[u] = self.clock
+			once = twice = 0
+			for i in unit:
+				c = cands[i]
+				twice |= once & c
+				once |= c
+			if once != missing[u]:
+				raise Contradiction()
+			hidden = once & ~twice
+			while hidden:
+				bit = hidden & -hidden
+				hidden ^= bit
+				for i in unit:
+					if cands[i] & bit:
+						self.place(i, DIGIT_OF[bit])
+						found = True
+						break
+		return found
+
+	def locked_candidates(self):
+		# Pointing (box -> line) and claiming (line -> box), box by box. The
+		# rest of a line or box is the other two segments of it along the
+		# same direction
+		cands = self.cands
+		changed = self.changed
+		checked = self.locked_checked
+		seen = None
+		for box, segments in enumerate(_BOX_SEGMENTS):
+			# Skip the box if none of the rows and columns through it changed
+			for u in _BOX_CROSS[box]:
+				if changed[u] > checked[box]:
+					break
+			else:
+				continue
+			checked[box] = self.clock
+			if seen is None:
+				seen = [cands[a] | cands[b] | cands[c] for a, b, c in _SEGMENTS]
+			for n in segments:
+				(line_a, line_b), (box_a, box_b), line_rest, box_rest = _BOX_LINES[n]
+				inside = seen[n]
+				if not inside:
+					continue
+				line_other = seen[line_a] | seen[line_b]
+				box_other = seen[box_a] | seen[box_b]
+				pointing = inside & ~box_other
+				if pointing and self.eliminate(line_rest, pointing):
+					return True
+				claiming = inside & ~line_other
+				if claiming and self.eliminate(box_rest, claiming):
+					return True
+		return False
+
+	def naked_subsets(self, size):
+		cands = self.cands
+		missing = self.missing
+		for u, unit in enumerate(UNITS):
+			# Fewer empty cells: the hidden subset of the rest, looked for already
+			if POPCOUNT[missing[u]] < 2 * size:
+				continue
+			cells = [i for i in unit if 2 <= POPCOUNT[cands[i]] <= size]
+			if len(cells) < size:
+				continue
+			for group in combinations(cells, size):
+				union = 0
+				for i in group:
+					union |= cands[i]
+				if POPCOUNT[union] == size:
+					others = [i for i in unit if i not in group]
+					if self.eliminate(others, union):
+						return True
+		return False
+
+	def hidden_subsets(self, size):
+		cands = self.cands
+		missing = self.missing
+		for u, unit in enumerate(UNITS):
+			# As many empty cells or fewer: the naked subset of the rest, looked for already
+			if POPCOUNT[missing[u]] <= 2 * size:
+				continue
+			# Digits that fit in at least 1, 2, 3 and 4 of the unit's cells
+			seen = _UNIT_CANDS[u](cands)
+			once = twice = thrice = more = 0
+			for c in seen:
+				more |= thrice & c
+				thrice |= twice & c
+				twice |= once & c
+				once |= c
+			fits = ~(thrice if size == 2 else more) & once
+			if POPCOUNT[fits] < size:
+				continue
+			# Cells of the unit where each of those digits can go, as a bitmask over positions
+			where = {}
+			for d in DIGITS_OF[fits]:
+				bit = BIT[d]
+				spots = 0
+				for k, c in enumerate(seen):
+					if c & bit:
+						spots |= 1 << k
+				where[d] = spots
+			for group in combinations(where, size):
+				spots = 0
+				keep = 0
+				for d in group:
+					spots |= where[d]
+					keep |= BIT[d]
+				if POPCOUNT[spots] == size:
+					cells = [unit[k] for k in range(9) if spots >> k & 1]
+					if self.eliminate(cells, ALL_DIGITS & ~keep):
+						return True
+		return False
+
+	def x_wing(self):
+		cands = self.cands
+		# Digits that fit in two or more, and three or more places of each
+		# row and column (units 0-8 and 9-17)
+		twice = []
+		thrice = []
+		for unit in UNITS[:18]:
+			once = two = three = 0
+			for i in unit:
+				c = cands[i]
+				three |= two & c
+				two |= once & c
+				once |= c
+			twice.append(two)
+			thrice.append(three)
+		for first, across in ((0, 9), (9, 0)):
+			# Lines where each digit fits in exactly two places, by those places
+			# as a bitmask
+			pairs = [{} for _ in range(10)]
+			for n in range(first, first + 9):
+				fits = twice[n] & ~thrice[n]
+				if not fits:
+					continue
+				where = {}
+				for k, i in enumerate(UNITS[n]):
+					for d in DIGITS_OF[cands[i] & fits]:
+						where[d] = where.get(d, 0) | 1 << k
+				for d, spots in where.items():
+					pairs[d].setdefault(spots, []).append(n - first)
+			for d in range(1, 10):
+				bit = BIT[d]
+				for spots, found in pairs[d].items():
+					if len(found) < 2:
+						continue
+					# The two crossing lines (DIGITS_OF numbers the places from
+					# 1); the X-Wing only removes something if one of them has
+					# the digit in a third place
+					crossing = [across + k - 1 for k in DIGITS_OF[spots]]
+					if not (thrice[crossing[0]] | thrice[crossing[1]]) & bit:
+						continue
+					a, b = found[:2]
+					others = [i for u in crossing for n, i in enumerate(UNITS[u]) if n not in (a, b)]
+					if self.eliminate(others, bit):
+						return True
+		return False
+
+	def step(self):
+		"""Apply the easiest technique that makes progress; returns its index or None"""
+		techniques = (
+			self.naked_singles,
+			self.hidden_singles,
+			self.locked_candidates,
+			lambda: self.naked_subsets(2),
+			lambda: self.hidden_subsets(2),
+			lambda: self.naked_subsets(3),
+			lambda: self.hidden_subsets(3),
+			self.x_wing,
+		)
+		for level, technique in enumerate(techniques):
+			if technique():
+				return level
+		return None
+
+	def solve(self):
+		"""Solve as far as logic goes; returns True if the grid was completed"""
+		while 0 in self.values:
+			level = self.step()
+			if level is None:
+				return False
+			self.hardest = max(self.hardest, level)
+		return True
+
+
+def rate(cells):
+	"""Rate 81 flat cells; returns (grade, hardest technique or None).
+
+	grade is one of GRADES, or None if the puzzle contradicts itself.
+	"""
+	try:
+		solver = LogicalSolver(cells)
+		solved = solver.solve()
+	except Contradiction:
+		return None, None
+	if not solved:
+		return "expert", None
+	technique = TECHNIQUES[solver.hardest] if solver.hardest >= 0 else "naked single"
+	return GRADE_OF[technique], technique
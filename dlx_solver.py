@@ -0,0 +1,230 @@
+# Exact-cover Sudoku solver for any box size (9x9, 16x16, 25x25, ...).
+# Sudoku is written as exact cover (Knuth's Algorithm X): every (cell, digit)
+# choice is a row covering four constraints (the cell is filled, and the digit
+# appears once in its row, column and box). Columns are kept as sets of rows,
+# the dict-of-sets form of dancing links: select() unlinks a row's columns and
+# every row that clashes with them, deselect() puts them back in reverse order.
+#
+# The search uses an explicit stack rather than recursion, so a 25x25 board
+# (625 levels deep) stays clear of the recursion limit.
+
+_ROWS = {} # box -> rows, built on first use
+
+
+def _rows(box):
+	"""Constraint columns of every (cell, digit) row, indexed cell * size + digit - 1"""
+	if box in _ROWS:
+		return _ROWS[box]
+	size = box * box
+	cells = size * size
+	rows = []
+	for i in range(cells):
+		r, c = divmod(i, size)
+		b = (r // box) * box + c // box
+		for d in range(size):
+			rows.append((
+				i,
+				cells + r * size + d,
+				2 * cells + c * size + d,
+				3 * cells + b * size + d,
+			))
+	_ROWS[box] = tuple(rows)
+	return _ROWS[box]
+
+
+def _select(X, Y, r):
+	cols = []
+	for j in Y[r]:
+		for i in X[j]:
+			for k in Y[i]:
+				if k != j:
+					X[k].remove(i)
+		cols.append(X.pop(j))
+	return cols
+
+
+def _deselect(X, Y, r, cols):
+	for j in reversed(Y[r]):
+		X[j] = cols.pop()
+		for i in X[j]:
+			for k in Y[i]:
+				if k != j:
+					X[k].add(i)
+
+
+def _count(stats, levels, backtracks, depth, placed):
+	# Search levels are nodes; every row placed is a candidate tried
+	if stats is not None:
+		stats.nodes += levels
+		stats.backtracks += backtracks
+		stats.max_depth = max(stats.max_depth, depth)
+		stats.candidates += placed
+
+
+class SearchLimit(Exception):
+	"""Raised when a search runs past its node budget"""
+
+
+class ExactCover:
+	"""Reusable solver for one board size.
+
+	The column sets are built once; every solve() or count() leaves them as
+	it found them, so a generator can run many uniqueness checks on the same
+	instance. Not thread-safe: use one instance per thread.
+	"""
+
+	def __init__(self, box=3):
+		self.box = box
+		self.size = box * box
+		self.Y = _rows(box)
+		self.X = {j: set() for j in range(4 * self.size * self.size)}
+		for r, cols in enumerate(self.Y):
+			for j in cols:
+				self.X[j].add(r)
+
+	def _run(self, cells, limit, rng, max_nodes=None, stats=None):
+		"""Returns (first solution as flat cells or None, number of solutions found up to limit)"""
+		try:
+			next(self._steps(cells, limit, rng, max_nodes, stats))
+		except StopIteration as done:
+			return done.value
+
+	def _steps(self, cells, limit, rng, max_nodes=None, stats=None, slice_nodes=None, slice_seconds=None):
+		# _run as a generator: yields the cells placed so far after every
+		# slice_nodes placements or slice_seconds seconds, and returns _run's
+		# result. Closing it part way puts the column sets back
+		X, Y, size = self.X, self.Y, self.size
+		chosen = [] # (row, removed columns), undone in reverse order at the end
+		for i, v in enumerate(cells):
+			if v:
+				r = i * size + v - 1
+				if any(j not in X for j in Y[r]):
+					break # The givens clash
+				chosen.append((r, _select(X, Y, r)))
+		else:
+			try:
+				return (yield from self._search(chosen, limit, rng, max_nodes, stats, slice_nodes, slice_seconds))
+			except GeneratorExit:
+				self._undo(chosen)
+				raise
+		self._undo(chosen)
+		return None, 0
+
+	def _search(self, chosen, limit, rng, max_nodes, stats=None, slice_nodes=None, slice_seconds=None):
+		X, Y = self.X, self.Y
+		givens = len(chosen)
+		if slice_seconds is not None:
+			from time import perf_counter
+			deadline = perf_counter() + slice_seconds
+		left = slice_nodes
+		stack = [] # [rows to try, next index] per level
+		first = None
+		found = 0
+		nodes = 0 # Rows placed, for max_nodes
+		levels = backtracks = depth = 0 # For stats
+		while True:
+			if X:
+				# Column with the fewest rows left
+				col = min(X, key=lambda j: len(X[j]))
+				rows = list(X[col])
+				if rng is not None:
+					rng.shuffle(rows)
+				stack.append([rows, 0])
+				levels += 1
+				if len(stack) > depth:
+					depth = len(stack)
+			else:
+				found += 1
+				if first is None:
+					first = self._cells(chosen)
+				if found >= limit:
+					break
+				stack.append([(), 0])
+			# Backtrack to the next untried row
+			while stack:
+				frame = stack[-1]
+				if len(chosen) > givens + len(stack) - 1:
+					r, cols = chosen.pop()
+					_deselect(X, Y, r, cols)
+					backtracks += 1
+				rows, k = frame
+				if k < len(rows):
+					frame[1] = k + 1
+					chosen.append((rows[k], _select(X, Y, rows[k])))
+					nodes += 1
+					break
+				stack.pop()
+			else:
+				break
+			if max_nodes is not None and nodes > max_nodes:
+				self._undo(chosen)
+				_count(stats, levels, backtracks, depth, nodes)
+				raise SearchLimit()
+			if left is not None:
+				left -= 1
+				if not left:
+					yield self._cells(chosen)
+					left = slice_nodes
+					if slice_seconds is not None:
+						deadline = perf_counter() + slice_seconds
+			if slice_seconds is not None and perf_counter() >= deadline:
+				yield self._cells(chosen)
+				left = slice_nodes
+				deadline = perf_counter() + slice_seconds
+		self._undo(chosen)
+		_count(stats, levels, backtracks, depth, nodes)
+		return first, found
+
+	def _undo(self, chosen):
+		while chosen:
+			r, cols = chosen.pop()
+			_deselect(self.X, self.Y, r, cols)
+
+	def _cells(self, chosen):
+		cells = [0] * (self.size * self.size)
+		for r, _ in chosen:
+			i, d = divmod(r, self.size)
+			cells[i] = d + 1
+		return cells
+
+	def solve(self, cells, rng=None, max_nodes=None, stats=None):
+		"""Solve size*size flat cells; returns a new solved list or None.
+
+		Pass an rng (e.g. the random module) to randomize the search order.
+		With max_nodes, gives up with SearchLimit after that many placements.
+		stats, if given, is an instrumentation.Record whose search counters
+		are updated.
+		"""
+		return self._run(cells, 1, rng, max_nodes, stats)[0]
+
+	def solve_steps(self, cells, rng=None, max_nodes=None, max_seconds=None, stats=None):
+		"""solve() as a generator, like sudoku_solver.solve_steps.
+
+		Yields the cells placed so far after every max_nodes placements or
+		max_seconds seconds, and returns the solved cells or None. The search
+		holds the column sets until it ends or the generator is closed, so
+		no other search can run on this instance meanwhile.
+		"""
+		return (yield from self._steps(cells, 1, rng, None, stats, max_nodes, max_seconds))[0]
+
+	def count(self, cells, limit=2, max_nodes=None, stats=None):
+		"""Count solutions, stopping early at limit"""
+		return self._run(cells, limit, None, max_nodes, stats)[1]
+
+
+def box_size(cells):
+	"""Box size of a flat board: 3 for 81 cells, 4 for 256, 5 for 625"""
+	box = round(len(cells) ** 0.25)
+	if box ** 4 != len(cells):
+		raise ValueError(f"{len(cells)} cells is not a square Sudoku board")
+	return box
+
+
+def solve_cells(cells, rng=None, stats=None):
+	"""Solve flat cells of any board size; returns a new solved list or None"""
+	return ExactCover(box_size(cells)).solve(cells, rng, stats=stats)
+
+
+def count_solutions(cells, limit=2):
+	"""Count the solutions of flat cells of any board size, stopping early at limit"""
+	return ExactCover(box_size(cells)).count(cells, limit)
@@ -0,0 +1,510 @@
+"""Headless game server: Sudoku sessions for many remote players over asyncio.
+
+	python game_server.py serve --port 8765 --bank puzzles.bank
+	python game_server.py serve --unix /tmp/sudoku.sock --db sudoku_scores.db
+	python game_server.py load --port 8765 --sessions 5000 --duration 60
+
+Requests and responses are JSON objects, one per line. A request names an op
+and may carry an id, which its response echoes:
+
+	{"id": 1, "op": "new", "difficulty": "easy", "size": 9}
+	{"id": 1, "ok": true, "session": "kX3...", "size": 9, "board": [...], ...}
+	{"id": 2, "op": "place", "session": "kX3...", "row": 0, "col": 4, "num": 7}
+	{"id": 2, "ok": true, "correct": false, "mistakes": 1, "complete": false}
+
+Ops are new, place (num 0 clears the cell), note, undo, redo, state, close,
+and stats for the server's counters and per-op latencies. A request that
+fails gets {"ok": false, "error": "..."}. A new game may have to wait for a
+puzzle, so its response can overtake those of later requests on the same
+connection; match responses up by id.
+
+A session is a Sudoku and the time it was last used, about 5 KB for a 9x9
+game; one left alone for --idle seconds is evicted. Puzzles come from --bank when there is one (9x9
+only), otherwise from a few kept ready per difficulty and size and refilled
+by a process pool, so generation never holds the event loop or its GIL.
+Finished games are saved to the scores database given by --db, on a thread.
+
+The load subcommand plays --sessions simulated players over --connections
+sockets, each making a random move every --think seconds on average, and
+prints round-trip latency percentiles per op.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import sudoku_core
+import sudoku_generator
+from sudoku_core import Sudoku
+
+BOARD_SIZES = (9, 16, 25)
+DEFAULT_PORT = 8765
+# Puzzles kept ready per (difficulty, size) once that kind has been asked for
+STOCK_DEPTH = 4
+# Seconds between scans for idle sessions
+EVICT_INTERVAL = 1.0
+# Latencies kept per op for the percentiles in stats
+LATENCY_SAMPLES = 10000
+
+
+def _generate(difficulty, size):
+	# Runs in a pool process
+	return sudoku_generator.generate_seeded(difficulty, box=int(size ** 0.5))
+
+
+def percentile(ordered, p):
+	"""The p-th percentile of an already sorted list, 0 for an empty one"""
+	if not ordered:
+		return 0.0
+	return ordered[min(len(ordered) - 1, len(ordered) * p // 100)]
+
+
+class LatencyStats:
+	"""Count, mean and max per op since the start, p50 and p99 over its last LATENCY_SAMPLES calls"""
+
+	def __init__(self):
+		self.ops = {} # op -> [count, total, max, recent samples]
+
+	def add(self, op, seconds):
+		entry = self.ops.get(op)
+		if entry is None:
+			entry = self.ops[op] = [0, 0.0, 0.0, deque(maxlen=LATENCY_SAMPLES)]
+		entry[0] += 1
+		entry[1] += seconds
+		if seconds > entry[2]:
+			entry[2] = seconds
+		entry[3].append(seconds)
+
+	def summary(self):
+		result = {}
+		for op, (count, total, largest, samples) in self.ops.items():
+			ordered = sorted(samples)
+			result[op] = {
+				'count': count, 'mean': total / count, 'max': largest,
+				'p50': percentile(ordered, 50), 'p99': percentile(ordered, 99),
+			}
+		return result
+
+
+class Session:
+	__slots__ = ('game', 'last_seen')
+
+	def __init__(self, game):
+		self.game = game
+		self.last_seen = time.monotonic()
+
+
+class GameServer:
+	"""Sessions, puzzle supply and metrics; serve() runs it on a socket"""
+
+	def __init__(self, idle_timeout=600.0, max_sessions=100000, workers=None, bank=None, save_scores=False):
+		self.idle_timeout = idle_timeout
+		self.max_sessions = max_sessions
+		self.workers = workers or os.cpu_count()
+		self.bank = bank
+		self.save_scores = save_scores
+		self.sessions = OrderedDict() # Least recently used first, so eviction stops at the first live one
+		self.created = 0
+		self.evicted = 0
+		self.latency = LatencyStats()
+		self.ready = {} # (difficulty, size) -> deque of (board, solution, seed)
+		self.pending = {} # (difficulty, size) -> puzzles being generated for ready
+		self.executor = None
+		self._evictor = None
+
+	def start(self):
+		self.executor = ProcessPoolExecutor(self.workers)
+		self._evictor = asyncio.create_task(self._evict_idle())
+		if self.bank is None:
+			for difficulty in sudoku_generator.DIFFICULTY_LEVELS:
+				self._refill((difficulty, 9))
+
+	def stop(self):
+		if self._evictor is not None:
+			self._evictor.cancel()
+		if self.executor is not None:
+			self.executor.shutdown(wait=False, cancel_futures=True)
+
+	async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unix=None):
+		"""Accept connections until cancelled"""
+		self.start()
+		try:
+			if unix:
+				server = await asyncio.start_unix_server(self._serve_client, unix)
+			else:
+				server = await asyncio.start_server(self._serve_client, host, port)
+			async with server:
+				await server.serve_forever()
+		finally:
+			self.stop()
+
+	# Puzzle supply
+
+	def _refill(self, key):
+		ready = self.ready.setdefault(key, deque())
+		loop = asyncio.get_running_loop()
+		while len(ready) + self.pending.get(key, 0) < STOCK_DEPTH:
+			self.pending[key] = self.pending.get(key, 0) + 1
+			future = loop.run_in_executor(self.executor, _generate, *key)
+			future.add_done_callback(lambda f, key=key: self._stocked(key, f))
+
+	def _stocked(self, key, future):
+		self.pending[key] -= 1
+		if not future.cancelled() and future.exception() is None:
+			self.ready[key].append(future.result())
+
+	async def _puzzle(self, difficulty, size):
+		if size == 9 and self.bank is not None:
+			puzzle = self.bank.random(difficulty)
+			if puzzle is not None:
+				return puzzle
+		key = (difficulty, size)
+		ready = self.ready.get(key)
+		puzzle = ready.popleft() if ready else None
+		self._refill(key)
+		if puzzle is None:
+			puzzle = await asyncio.get_running_loop().run_in_executor(self.executor, _generate, difficulty, size)
+		return puzzle
+
+	# Sessions
+
+	async def _evict_idle(self):
+		sessions = self.sessions
+		while True:
+			await asyncio.sleep(EVICT_INTERVAL)
+			cutoff = time.monotonic() - self.idle_timeout
+			while sessions:
+				sid = next(iter(sessions))
+				if sessions[sid].last_seen > cutoff:
+					break
+				del sessions[sid]
+				self.evicted += 1
+
+	def _session(self, request):
+		sid = request.get('session')
+		session = self.sessions.get(sid) if isinstance(sid, str) else None
+		if session is None:
+			raise ValueError("unknown session")
+		self.sessions.move_to_end(sid)
+		session.last_seen = time.monotonic()
+		return session
+
+	# Ops
+
+	async def new_game(self, request):
+		difficulty = request.get('difficulty', "medium")
+		size = request.get('size', 9)
+		if not isinstance(difficulty, str) or difficulty not in sudoku_generator.DIFFICULTY_LEVELS:
+			raise ValueError(f"unknown difficulty {difficulty!r}")
+		if type(size) is not int or size not in BOARD_SIZES:
+			raise ValueError(f"size must be one of {BOARD_SIZES}")
+		if len(self.sessions) >= self.max_sessions:
+			raise ValueError("server is full")
+		puzzle = await self._puzzle(difficulty, size)
+		game = Sudoku(difficulty=difficulty, puzzle=puzzle, size=size)
+		sid = secrets.token_urlsafe(12)
+		self.sessions[sid] = Session(game)
+		self.created += 1
+		return {'session': sid, 'size': size, 'difficulty': difficulty, 'board': list(game.board)}
+
+	def handle(self, request):
+		"""Response fields for any op but new; raises ValueError for a bad request"""
+		op = request.get('op')
+		if op == "stats":
+			return self.stats()
+		session = self._session(request)
+		game = session.game
+		if op == "state":
+			return self.state(game)
+		if op == "close":
+			del self.sessions[request['session']]
+			return {}
+		if game.game_over:
+			raise ValueError("game is over")
+		if op == "place":
+			row, col, num = self._move(request, game, 0)
+			correct = game.place_number(row, col, num)
+			return {'correct': correct, 'mistakes': game.mistakes, 'complete': self._check_complete(game)}
+		if op == "note":
+			row, col, num = self._move(request, game, 1)
+			game.toggle_note(row, col, num)
+			return {'notes': game.notes[row * game.size + col]}
+		if op == "undo" or op == "redo":
+			game.undo() if op == "undo" else game.redo()
+			return self.state(game)
+		raise ValueError(f"unknown op {op!r}")
+
+	def _move(self, request, game, lowest):
+		row, col, num = request.get('row'), request.get('col'), request.get('num')
+		size = game.size
+		if not all(type(v) is int for v in (row, col, num)):
+			raise ValueError("row, col and num must be integers")
+		if not (0 <= row < size and 0 <= col < size and lowest <= num <= size):
+			raise ValueError("move off the board")
+		i = row * size + col
+		if game.board[i]:
+			raise ValueError("cell is a given")
+		if game.locked[i]:
+			raise ValueError("cell is already solved")
+		return row, col, num
+
+	def _check_complete(self, game):
+		# Sudoku.is_complete, with the score saved on a thread instead of here
+		if game.remaining:
+			return False
+		game.update_time()
+		game.game_over = True
+		if self.save_scores:
+			future = asyncio.get_running_loop().run_in_executor(None, game.save_score)
+			future.add_done_callback(_report_error)
+		return True
+
+	def state(self, game):
+		game.update_time()
+		return {
+			'size': game.size, 'difficulty': game.difficulty, 'board': list(game.board),
+			'entries': list(game.user_input), 'notes': list(game.notes), 'mistakes': game.mistakes,
+			'elapsed': round(game.elapsed_time, 2), 'complete': game.game_over,
+		}
+
+	def stats(self):
+		return {
+			'sessions': len(self.sessions), 'created': self.created, 'evicted': self.evicted,
+			'ready': {f"{d} {s}x{s}": len(ready) for (d, s), ready in self.ready.items()},
+			'latency': self.latency.summary(),
+		}
+
+	# Connections
+
+	async def _serve_client(self, reader, writer):
+		tasks = set()
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				start = time.perf_counter()
+				try:
+					request = json.loads(line)
+					if not isinstance(request, dict):
+						raise ValueError
+				except ValueError:
+					self._send(writer, {'ok': False, 'error': "not a JSON object"})
+					continue
+				if request.get('op') == "new":
+					# Answered when its puzzle is ready; other requests go on meanwhile
+					task = asyncio.create_task(self._answer_new(request, writer, start))
+					tasks.add(task)
+					task.add_done_callback(tasks.discard)
+				else:
+					try:
+						response = self.handle(request)
+					except (ValueError, KeyError) as e:
+						response = {'ok': False, 'error': str(e)}
+					self._reply(writer, request, response, start)
+				await writer.drain()
+		except (ConnectionError, ValueError): # ValueError: a line over the reader's limit
+			pass
+		finally:
+			for task in tasks:
+				task.cancel()
+			writer.close()
+
+	async def _answer_new(self, request, writer, start):
+		try:
+			response = await self.new_game(request)
+		except ValueError as e:
+			response = {'ok': False, 'error': str(e)}
+		if not writer.is_closing():
+			self._reply(writer, request, response, start)
+
+	def _reply(self, writer, request, response, start):
+		response.setdefault('ok', True)
+		if 'id' in request:
+			response['id'] = request['id']
+		self._send(writer, response)
+		self.latency.add(str(request.get('op')), time.perf_counter() - start)
+
+	def _send(self, writer, response):
+		writer.write(json.dumps(response, separators=(',', ':')).encode() + b"\n")
+
+
+def _report_error(future):
+	if future.exception() is not None:
+		print(f"saving a score failed: {future.exception()!r}", file=sys.stderr)
+
+
+# Load generator
+
+class Client:
+	"""One connection shared by many players; responses are matched to requests by id"""
+
+	def __init__(self, reader, writer):
+		self.reader = reader
+		self.writer = writer
+		self.waiting = {}
+		self.next_id = 0
+		self._reading = asyncio.create_task(self._read())
+
+	@classmethod
+	async def connect(cls, host, port, unix=None):
+		if unix:
+			reader, writer = await asyncio.open_unix_connection(unix)
+		else:
+			reader, writer = await asyncio.open_connection(host, port)
+		return cls(reader, writer)
+
+	async def call(self, op, **params):
+		self.next_id += 1
+		request_id = params['id'] = self.next_id
+		params['op'] = op
+		future = self.waiting[request_id] = asyncio.get_running_loop().create_future()
+		self.writer.write(json.dumps(params, separators=(',', ':')).encode() + b"\n")
+		await self.writer.drain()
+		return await future
+
+	async def _read(self):
+		try:
+			async for line in self.reader:
+				response = json.loads(line)
+				future = self.waiting.pop(response.get('id'), None)
+				if future is not None and not future.done():
+					future.set_result(response)
+		finally:
+			for future in self.waiting.values():
+				if not future.done():
+					future.set_exception(ConnectionError("connection closed"))
+
+	def close(self):
+		self._reading.cancel()
+		self.writer.close()
+
+
+async def play(client, difficulty, size, until, think, rng, latencies, errors):
+	"""One simulated player: a game of random moves until the time is up, then a new one"""
+	session = None
+	empty = [] # Cells still open in the current game
+	while time.perf_counter() < until:
+		if session is None:
+			op, params = "new", {'difficulty': difficulty, 'size': size}
+		else:
+			await asyncio.sleep(rng.expovariate(1 / think))
+			op = rng.choices(("place", "note", "undo", "state"), (6, 2, 1, 1))[0]
+			params = {'session': session}
+			if op == "place" or op == "note":
+				if not empty:
+					continue
+				i = rng.choice(empty)
+				params.update(row=i // size, col=i % size, num=rng.randint(1, size))
+		start = time.perf_counter()
+		response = await client.call(op, **params)
+		latencies.setdefault(op, []).append(time.perf_counter() - start)
+		if not response['ok']:
+			errors.append(response['error'])
+			if session is None:
+				await asyncio.sleep(think) # The server is full
+			elif response['error'] in ("unknown session", "game is over"):
+				session = None
+			continue
+		if op == "new":
+			session = response['session']
+			empty = [i for i, v in enumerate(response['board']) if not v]
+		elif op == "place":
+			if response['correct']:
+				empty.remove(i)
+			if response['complete']:
+				session = None
+	if session is not None:
+		await client.call("close", session=session)
+
+
+async def run_load(host, port, unix, sessions, connections, duration, think, ramp, difficulty, size, seed):
+	"""Play sessions at once for duration seconds; returns (latencies by op, errors, elapsed)"""
+	clients = [await Client.connect(host, port, unix) for _ in range(min(connections, sessions))]
+	latencies = {}
+	errors = []
+	rng = random.Random(seed)
+	start = time.perf_counter()
+	until = start + ramp + duration
+
+	async def player(n):
+		await asyncio.sleep(ramp * n / sessions)
+		await play(clients[n % len(clients)], difficulty, size, until, think,
+			random.Random(rng.random()), latencies, errors)
+
+	try:
+		await asyncio.gather(*(player(n) for n in range(sessions)))
+		server = await clients[0].call("stats")
+	finally:
+		for client in clients:
+			client.close()
+	return latencies, errors, time.perf_counter() - start, server
+
+
+def print_report(latencies, errors, elapsed, server, out=sys.stdout):
+	total = sum(len(samples) for samples in latencies.values())
+	print(f"{'op':<8}{'count':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}", file=out)
+	for op in sorted(latencies):
+		ordered = sorted(latencies[op])
+		print(f"{op:<8}{len(ordered):>9}{percentile(ordered, 50) * 1000:>10.2f}"
+			f"{percentile(ordered, 99) * 1000:>10.2f}{ordered[-1] * 1000:>10.2f}", file=out)
+	print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.0f}/sec), {len(errors)} errors; "
+		f"server: {server['sessions']} sessions, {server['created']} created, {server['evicted']} evicted", file=out)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Sudoku game server and load generator")
+	commands = parser.add_subparsers(dest="command", required=True)
+	for name, help in (("serve", "run the server"), ("load", "load a running server")):
+		command = commands.add_parser(name, help=help)
+		command.add_argument("--host", default="127.0.0.1")
+		command.add_argument("--port", type=int, default=DEFAULT_PORT)
+		command.add_argument("--unix", help="Unix socket path instead of TCP")
+	serve = commands.choices["serve"]
+	serve.add_argument("--idle", type=float, default=600.0, help="seconds before an unused session is evicted")
+	serve.add_argument("--max-sessions", type=int, default=100000)
+	serve.add_argument("--workers", type=int, default=os.cpu_count(), help="puzzle generation processes")
+	serve.add_argument("--bank", help="puzzle bank file to deal 9x9 puzzles from")
+	serve.add_argument("--db", help="save finished games to this scores database")
+	load = commands.choices["load"]
+	load.add_argument("--sessions", type=int, default=1000)
+	load.add_argument("--connections", type=int, default=50)
+	load.add_argument("--duration", type=float, default=30.0, help="seconds of play once every session has started")
+	load.add_argument("--think", type=float, default=1.0, help="mean seconds between a player's moves")
+	load.add_argument("--ramp", type=float, default=10.0, help="seconds over which sessions are started")
+	load.add_argument("--difficulty", default="easy", choices=sorted(sudoku_generator.DIFFICULTY_LEVELS))
+	load.add_argument("--size", type=int, default=9, choices=BOARD_SIZES)
+	load.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args(argv)
+
+	if args.command == "load":
+		report = asyncio.run(run_load(args.host, args.port, args.unix, args.sessions, args.connections,
+			args.duration, args.think, args.ramp, args.difficulty, args.size, args.seed))
+		print_report(*report)
+		return 0
+
+	bank = None
+	if args.bank:
+		import puzzle_bank
+		bank = puzzle_bank.PuzzleBank(args.bank)
+	if args.db:
+		sudoku_core.SCORES_DB_FILE = args.db
+	server = GameServer(args.idle, args.max_sessions, args.workers, bank, save_scores=bool(args.db))
+	try:
+		asyncio.run(server.serve(args.host, args.port, args.unix))
+	except KeyboardInterrupt:
+		pass
+	finally:
+		json.dump(server.stats(), sys.stderr, indent=1)
+		print(file=sys.stderr)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,198 @@
+"""Optional counters and timings for the solver and generator.
+
+Off by default. set_sink() turns it on: from then on every generate_puzzle
+and Sudoku.solve_board call builds a Record and hands it to the sink as a
+dict like
+
+	{"kind": "generate", "difficulty": "hard", "box": 3, "wall": 0.021,
+	 "phases": {"diagonal fill": 0.00002, "full solve": 0.0004, "clue removal": 0.0206},
+	 "nodes": 1480, "backtracks": 311, "max_depth": 9, "candidates": 1791}
+
+nodes are search nodes visited, backtracks branches that failed, max_depth
+the deepest search level and candidates the digits (or exact-cover rows)
+tried. Uniqueness checks during clue removal count towards the same totals.
+
+A sink is any callable taking that dict: HistogramSink keeps summaries in
+memory, JsonLinesSink appends to a file, and a plain function works as a
+callback. Calls are synchronous, so a caller that seeds the generator knows
+which seed produced the record it just received.
+
+When no sink is set, start() returns None and the solvers skip all counting
+behind a single `is not None` test per search node.
+"""
+import time
+
+SINK = None
+
+
+def set_sink(sink):
+	"""Send records to sink (None turns instrumentation off); returns the previous sink"""
+	global SINK
+	previous, SINK = SINK, sink
+	return previous
+
+
+class Record:
+	"""Counters and phase timings of one call, sent to the sink by finish()"""
+	__slots__ = (
+		'kind', 'context', 'phases', 'start', 'nodes', 'backtracks', 'max_depth', 'candidates',
+		'_phase', '_phase_start'
+	)
+
+	def __init__(self, kind, **context):
+		self.kind = kind
+		self.context = context
+		self.phases = {}
+		self.start = time.perf_counter()
+		self.nodes = 0
+		self.backtracks = 0
+		self.max_depth = 0
+		self.candidates = 0
+
+	def phase(self, name):
+		# Used as `with record.phase("clue removal"):`; time adds up over repeated phases
+		self._phase = name
+		return self
+
+	def __enter__(self):
+		self._phase_start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		elapsed = time.perf_counter() - self._phase_start
+		self.phases[self._phase] = self.phases.get(self._phase, 0.0) + elapsed
+		return False
+
+	def as_dict(self):
+		data = {'kind': self.kind}
+		data.update(self.context)
+		data.update(
+			wall=time.perf_counter() - self.start,
+			phases=dict(self.phases),
+			nodes=self.nodes,
+			backtracks=self.backtracks,
+			max_depth=self.max_depth,
+			candidates=self.candidates,
+		)
+		return data
+
+
+class _NoPhase:
+	# Stand-in context manager when instrumentation is off
+	def __enter__(self):
+		return None
+
+	def __exit__(self, *exc):
+		return False
+
+
+NO_PHASE = _NoPhase()
+
+
+def start(kind, **context):
+	"""A new Record if a sink is set, else None"""
+	if SINK is None:
+		return None
+	return Record(kind, **context)
+
+
+def phase(record, name):
+	"""Context manager timing a phase of record; does nothing when record is None"""
+	return NO_PHASE if record is None else record.phase(name)
+
+
+def finish(record):
+	"""Send a record to the sink"""
+	sink = SINK
+	if record is not None and sink is not None:
+		sink(record.as_dict())
+
+
+class HistogramSink:
+	"""In-memory summaries: power-of-two histograms per kind and metric, and the slowest calls.
+
+	summary() gives count, mean, max and bucket-resolution p50/p99 per
+	"kind.metric" (metrics are wall, the phases, and the search counters).
+	"""
+
+	COUNTERS = ('wall', 'nodes', 'backtracks', 'max_depth', 'candidates')
+
+	def __init__(self, keep_slowest=10):
+		self.keep_slowest = keep_slowest
+		self.histograms = {} # "kind.metric" -> {bucket upper bound: count}
+		self.totals = {} # "kind.metric" -> [count, sum, max]
+		self.slowest = [] # Records with the largest wall time, slowest first
+		# threading only when a sink is made, so importing the core stays cheap
+		import threading
+		self._lock = threading.Lock()
+
+	def __call__(self, data):
+		values = {name: data[name] for name in self.COUNTERS}
+		for name, seconds in data['phases'].items():
+			values['phase.' + name] = seconds
+		with self._lock:
+			for name, value in values.items():
+				key = f"{data['kind']}.{name}"
+				bucket = _bucket(value)
+				histogram = self.histograms.setdefault(key, {})
+				histogram[bucket] = histogram.get(bucket, 0) + 1
+				totals = self.totals.setdefault(key, [0, 0, 0])
+				totals[0] += 1
+				totals[1] += value
+				totals[2] = max(totals[2], value)
+			self.slowest.append(data)
+			self.slowest.sort(key=lambda d: d['wall'], reverse=True)
+			del self.slowest[self.keep_slowest:]
+
+	def summary(self):
+		with self._lock:
+			result = {}
+			for key, (count, total, largest) in self.totals.items():
+				buckets = sorted(self.histograms[key].items())
+				result[key] = {
+					'count': count,
+					'mean': total / count,
+					'max': largest,
+					'p50': _bucket_percentile(buckets, count, 50),
+					'p99': _bucket_percentile(buckets, count, 99),
+				}
+			return result
+
+
+def _bucket(value):
+	# Smallest power of two (2**-20 for tiny times, up from there) at or above value; 0 stays 0
+	if value <= 0:
+		return 0
+	bound = 2.0 ** -20
+	while bound < value:
+		bound *= 2
+	return bound
+
+
+def _bucket_percentile(buckets, count, p):
+	seen = 0
+	for bound, n in buckets:
+		seen += n
+		if seen * 100 >= count * p:
+			return bound
+	return buckets[-1][0]
+
+
+class JsonLinesSink:
+	"""Appends each record to a file as one JSON object per line"""
+
+	def __init__(self, path):
+		import json
+		import threading
+		self._dumps = json.dumps
+		self._file = open(path, 'a')
+		self._lock = threading.Lock()
+
+	def __call__(self, data):
+		line = self._dumps(data) + "\n"
+		with self._lock:
+			self._file.write(line)
+			self._file.flush()
+
+	def close(self):
+		self._file.close()
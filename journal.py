@@ -0,0 +1,285 @@
+"""Move journals: every move of a game, timestamped and compactly encoded,
+and a headless replayer that checks a score against its journal.
+
+A move is 5 bytes, struct "<BHH": op << 5 | digit, cell, and the time since
+the previous move in hundredths of a second. Pauses too long for 16 bits get
+a WAIT move first. A journal as saved with a score (dumps) is
+
+	header    "SDKJ", version u8, size u8, difficulty u8, ratio f64, seed u64
+	solution  every cell, bit-packed as in snapshot.py
+	givens    one bit per cell
+	moves     to the end of the data
+
+The seed is the one sudoku_generator.generate_seeded made the puzzle from,
+or 0 for puzzles from the bank; the puzzle itself is always included, so a
+journal replays without regenerating anything.
+"""
+import struct
+
+import undo_log
+
+MAGIC = b"SDKJ"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBdQ")
+MOVE = struct.Struct("<BHH")
+
+# Ops; PLACE with digit 0 is a clear
+PLACE, NOTE, CLEAR_NOTES, UNDO, REDO, HINT, AUTO_NOTES, MARK = range(8)
+# MARK digits: a long pause (cell holds the high 16 bits of the gap), and a
+# game resumed from a snapshot, which starts with an empty undo history
+WAIT, RESUME = 0, 1
+
+# Seconds a score's time may be off from its last move; the score is taken
+# just after the move and rounded down
+TIME_SLACK = 1.0
+
+# Op of every first move byte, to spot journals that use undo without a replay
+_OPS = bytes(code >> 5 for code in range(256))
+
+
+class Journal:
+	"""Moves of one game as they are made, encoded in moves.
+
+	whole is False when the moves from before some point are missing (a game
+	resumed without its journal); such a journal is not saved with a score.
+	"""
+	__slots__ = ('moves', 'clock', 'whole')
+
+	def __init__(self, moves=b"", whole=True):
+		self.moves = bytearray(moves)
+		self.whole = whole
+		self.clock = 0 # Hundredths of a second, at the last move
+		for code, cell, gap in MOVE.iter_unpack(self.moves):
+			self.clock += gap + (cell << 16 if code == MARK << 5 | WAIT else 0)
+
+	def __len__(self):
+		return len(self.moves) // MOVE.size
+
+	def record(self, op, cell=0, digit=0, seconds=0.0):
+		"""Append a move made seconds into the game"""
+		now = int(seconds * 100)
+		gap = max(0, now - self.clock)
+		self.clock += gap
+		if gap > 0xFFFF:
+			self.moves += MOVE.pack(MARK << 5 | WAIT, gap >> 16 & 0xFFFF, gap & 0xFFFF)
+			gap = 0
+		self.moves += MOVE.pack(op << 5 | digit, cell, gap)
+
+
+def dumps(game):
+	"""The game's journal with its puzzle, as bytes; None if the journal is not whole"""
+	import snapshot
+	if not game.journal.whole:
+		return None
+	if isinstance(game.difficulty, str):
+		difficulty, ratio = snapshot.DIFFICULTY_CODES[game.difficulty], 0.0
+	else:
+		difficulty, ratio = snapshot.CUSTOM, game.difficulty
+	return b"".join((
+		HEADER.pack(MAGIC, VERSION, game.size, difficulty, ratio, game.seed),
+		snapshot.pack_values(game.solution, 4 if game.size == 9 else 5),
+		snapshot.pack_values([1 if v else 0 for v in game.board], 1),
+		game.journal.moves,
+	))
+
+
+def loads(data):
+	"""(size, difficulty, seed, solution, board, moves) from dumps() output.
+
+	Raises ValueError if data is not a journal.
+	"""
+	import snapshot
+	if len(data) < HEADER.size:
+		raise ValueError("journal is truncated")
+	magic, version, size, difficulty, ratio, seed = HEADER.unpack_from(data)
+	if magic != MAGIC or version != VERSION or size not in (9, 16, 25):
+		raise ValueError(f"not a version {VERSION} journal")
+	cells = size * size
+	solution, offset = snapshot.unpack_values(data, HEADER.size, cells, 4 if size == 9 else 5)
+	givens, offset = snapshot.unpack_values(data, offset, cells, 1)
+	moves = data[offset:]
+	if offset > len(data) or len(moves) % MOVE.size:
+		raise ValueError("journal is truncated")
+	board = [v if given else 0 for v, given in zip(solution, givens)]
+	difficulty = snapshot.DIFFICULTY_NAMES.get(difficulty, ratio)
+	return size, difficulty, seed, solution, board, moves
+
+
+def replay(data):
+	"""Re-run the moves of a journal on its puzzle with the rules of sudoku_core.
+
+	Returns a dict with the size, difficulty and seed of the puzzle, and the
+	time (seconds at the last move), mistakes, hints_used, moves and entries
+	(user_input as bytes) of the game, and complete, True if the last move
+	finished it. Raises ValueError if data is not a journal or holds a move
+	the game cannot make.
+
+	This is Sudoku.place_number, undo and the rest cut down to what a score
+	depends on, so a journal replays in tens of microseconds; keep the two
+	in step. Notes only matter through the undo history (an entry is only
+	recorded when a move changes its cell), so journals without undo or
+	redo skip notes and history altogether.
+	"""
+	size, difficulty, seed, solution, board, moves = loads(data)
+	cells = size * size
+	ops = moves[::MOVE.size].translate(_OPS)
+	track = bytes((UNDO,)) in ops or bytes((REDO,)) in ops
+
+	user_input = bytearray(cells)
+	locked = bytearray(cells)
+	incorrect = bytearray(cells)
+	remaining = board.count(0)
+	mistakes = hints_used = 0
+	clock = 0
+	complete = False
+	if track:
+		import candidate_engine
+		import sudoku_core
+		values = bytearray(board) # What Sudoku.candidates holds
+		notes = [0] * cells
+		history = undo_log.UndoLog(sudoku_core.HISTORY_LIMIT)
+		engine = None # CandidateEngine while auto notes are on
+		box = int(size ** 0.5)
+
+	def set_input(i, value):
+		# Sudoku.set_input, for the undo path
+		nonlocal remaining
+		if user_input[i] and not value:
+			remaining += 1
+		elif value and not user_input[i]:
+			remaining -= 1
+		user_input[i] = value
+		values[i] = value
+		if engine is not None:
+			engine.set(i, value)
+			for p in engine.peers[i]:
+				if board[p] == 0 and user_input[p] == 0:
+					notes[p] = engine.cands[p]
+
+	for code, cell, gap in MOVE.iter_unpack(moves):
+		if complete:
+			raise ValueError("moves after the game was over")
+		op = code >> 5
+		digit = code & 31
+		clock += gap
+		if op == MARK:
+			if digit == WAIT:
+				clock += cell << 16
+			elif digit == RESUME:
+				if track:
+					history.clear()
+			else:
+				raise ValueError(f"unknown mark {digit}")
+			continue
+		if cell >= cells or digit > size or (op == NOTE and not digit):
+			raise ValueError(f"move off the board: cell {cell}, digit {digit}")
+
+		if op == PLACE or op == HINT:
+			if op == HINT:
+				if digit != solution[cell]:
+					raise ValueError(f"hint of {digit} at cell {cell} is not the solution")
+				hints_used += 1
+			if not locked[cell]:
+				if track:
+					before = (user_input[cell], notes[cell], incorrect[cell], locked[cell], mistakes)
+					notes[cell] = 0
+					set_input(cell, digit)
+				else:
+					if user_input[cell] and not digit:
+						remaining += 1
+					elif digit and not user_input[cell]:
+						remaining -= 1
+					user_input[cell] = digit
+				if digit == 0 or solution[cell] == digit:
+					incorrect[cell] = 0
+					locked[cell] = digit != 0
+				else:
+					incorrect[cell] = 1
+					mistakes += 1
+				if track:
+					after = (user_input[cell], notes[cell], incorrect[cell], locked[cell], mistakes)
+					history.record(cell // size, cell % size, before, after)
+			# The game checks for completion after every entry and hint
+			complete = remaining == 0 and (digit != 0 or op == HINT)
+		elif not track:
+			continue
+		elif op == NOTE:
+			if not locked[cell] and board[cell] == 0 and user_input[cell] == 0:
+				before = (user_input[cell], notes[cell], incorrect[cell], locked[cell], mistakes)
+				notes[cell] ^= 1 << (digit - 1)
+				history.record(cell // size, cell % size, before, before[:1] + (notes[cell],) + before[2:])
+		elif op == CLEAR_NOTES:
+			if notes[cell]:
+				before = (user_input[cell], notes[cell], incorrect[cell], locked[cell], mistakes)
+				notes[cell] = 0
+				history.record(cell // size, cell % size, before, before[:1] + (0,) + before[2:])
+		elif op == UNDO or op == REDO:
+			entry = history.undo() if op == UNDO else history.redo()
+			if entry:
+				row, col, before, after = entry
+				i = row * size + col
+				state = before if op == UNDO else after
+				set_input(i, state[0])
+				_, notes[i], incorrect[i], locked[i], mistakes = state
+		elif op == AUTO_NOTES:
+			if engine is None:
+				engine = candidate_engine.CandidateEngine(values, box)
+				for i in range(cells):
+					if board[i] == 0 and user_input[i] == 0:
+						notes[i] = engine.cands[i]
+			else:
+				engine = None
+
+	return {
+		'size': size, 'difficulty': difficulty, 'seed': seed,
+		'time': clock / 100, 'mistakes': mistakes, 'hints_used': hints_used,
+		'moves': len(moves) // MOVE.size, 'entries': bytes(user_input), 'complete': complete,
+	}
+
+
+def resume(game, data):
+	"""Give a game rebuilt from a snapshot the journal saved with it.
+
+	data is dumps() output or None. The saved moves are kept only if they
+	are for the same puzzle and replay to the game's entries, mistakes and
+	hints; otherwise the game starts a journal that is not whole, and its
+	score is saved as unverifiable rather than failing an audit.
+	"""
+	moves = None
+	if data:
+		try:
+			size, _, _, solution, board, saved = loads(data)
+			result = replay(data)
+		except ValueError:
+			pass
+		else:
+			if (size == game.size and solution == list(game.solution) and board == list(game.board)
+					and result['entries'] == bytes(game.user_input) and not result['complete']
+					and (result['mistakes'], result['hints_used']) == (game.mistakes, game.hints_used)):
+				moves = saved
+	game.journal = Journal(moves or b"", whole=moves is not None)
+
+
+def verify(entry):
+	"""Problems found replaying a score entry's journal, as strings; [] if it checks out.
+
+	entry is a score as stored (time, mistakes, hints_used, journal). A
+	missing journal is a problem: the score cannot be backed up.
+	"""
+	data = entry.get('journal')
+	if not data:
+		return ["no journal"]
+	try:
+		result = replay(data)
+	except ValueError as e:
+		return [f"bad journal: {e}"]
+	problems = []
+	if not result['complete']:
+		problems.append("the journal does not finish the game")
+	if abs(entry['time'] - result['time']) > TIME_SLACK:
+		problems.append(f"time is {entry['time']}s, the last move was at {result['time']:.1f}s")
+	if entry['mistakes'] != result['mistakes']:
+		problems.append(f"{entry['mistakes']} mistakes, the journal makes {result['mistakes']}")
+	if entry.get('hints_used', 0) != result['hints_used']:
+		problems.append(f"{entry.get('hints_used', 0)} hints, the journal uses {result['hints_used']}")
+	return problems
@@ -0,0 +1,274 @@
+"""Portfolio solving: several search strategies race on a puzzle in separate
+processes and the first answer wins.
+
+	python portfolio_solver.py benchmarks/hard_puzzles.txt
+	python portfolio_solver.py --grids 5 --count 20 --baseline
+
+A randomized search has a long tail: the exact-cover search that fills a
+25x25 grid from its diagonal boxes (as the generator does) takes about 0.1s
+for most random orders and several seconds for one in ten. Racing
+differently seeded and ordered searches cuts that tail down to the luckiest
+of them. The strategies are
+
+	bitmask             sudoku_solver, digits in order (9x9 only)
+	bitmask-random      sudoku_solver, digits in random order (9x9 only)
+	exact-cover         dlx_solver, rows in set order
+	exact-cover-random  dlx_solver, rows shuffled
+
+and random ones get a fresh seed for every run. A puzzle first gets a short
+run in this process (INLINE_BUDGET nodes per cell), which is all most 9x9
+puzzles need. Otherwise one strategy per worker races on it: each searches
+in slices of SLICE_NODES nodes (see sudoku_solver.solve_steps) and checks a
+shared multiprocessing.Event between slices, so the others stop at their
+next slice once one has an answer. Every search is complete, so the
+first to finish without a solution proves there is none.
+
+stats() gives runs, wins and mean winning time per strategy, and how long
+cancelled runs took to stop, to help choose the lineup. The command line
+prints them after solving a puzzle file (one 81-character 9x9 puzzle per
+line, as for bulk_solve.py) or --count grids of a box size to fill; with
+--baseline it also times one seeded random search per puzzle for comparison.
+"""
+import argparse
+import multiprocessing
+import queue
+import random
+import sys
+import time
+
+import dlx_solver
+import sudoku_solver
+
+STRATEGIES = ("bitmask", "exact-cover", "bitmask-random", "exact-cover-random")
+# Nodes a strategy searches between looks at the cancel flag
+SLICE_NODES = 32
+# Nodes per cell searched in this process before a puzzle goes to the portfolio
+INLINE_BUDGET = 2
+
+_CANCEL = None # The portfolio's Event, in a worker
+_SOLVERS = {} # box -> dlx_solver.ExactCover, reused across searches in a process
+
+
+def _init_worker(cancel):
+	global _CANCEL
+	_CANCEL = cancel
+
+
+def strategy_steps(name, cells, seed=None, max_nodes=SLICE_NODES, max_seconds=None):
+	"""The solve_steps generator of a strategy on flat cells; seed is for the random ones"""
+	rng = random.Random(seed) if name.endswith("-random") else None
+	if name.startswith("bitmask"):
+		return sudoku_solver.solve_steps(cells, rng, max_nodes, max_seconds)
+	box = dlx_solver.box_size(cells)
+	solver = _SOLVERS.get(box)
+	if solver is None:
+		solver = _SOLVERS[box] = dlx_solver.ExactCover(box)
+	return solver.solve_steps(cells, rng, max_nodes, max_seconds)
+
+
+def _run(name, cells, seed):
+	# In a worker: (name, answer, cancelled, seconds) of one strategy, run
+	# until it finishes or the portfolio is cancelled
+	start = time.perf_counter()
+	steps = strategy_steps(name, cells, seed)
+	while True:
+		try:
+			next(steps)
+		except StopIteration as done:
+			return name, done.value, False, time.perf_counter() - start
+		if _CANCEL.is_set():
+			steps.close()
+			return name, None, True, time.perf_counter() - start
+
+
+class PortfolioSolver:
+	"""Worker processes that race strategies on one puzzle at a time.
+
+	Use it as a context manager, or call close() when done. Not thread-safe.
+	"""
+
+	def __init__(self, workers=4, strategies=STRATEGIES, seed=None):
+		self.workers = workers
+		self.strategies = tuple(strategies)
+		self.rng = random.Random(seed)
+		self._cancel = multiprocessing.Event()
+		self._pool = multiprocessing.Pool(workers, _init_worker, (self._cancel,))
+		# strategy -> [runs, wins, seconds to win, cancelled, seconds to stop]
+		self._stats = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+		return False
+
+	def close(self):
+		self._pool.close()
+		self._pool.join()
+
+	def lineup(self, cells):
+		"""Strategies raced on cells: those that fit the board, random ones repeated to one per worker"""
+		names = [name for name in self.strategies if len(cells) == 81 or not name.startswith("bitmask")]
+		randomized = [name for name in names if name.endswith("-random")]
+		lineup = names[:self.workers]
+		while randomized and len(lineup) < self.workers:
+			lineup.append(randomized[len(lineup) % len(randomized)])
+		return lineup
+
+	def _count(self, name, won=False, seconds=0.0, cancelled=False, stopping=0.0):
+		entry = self._stats.setdefault(name, [0, 0, 0.0, 0, 0.0])
+		entry[0] += 1
+		if won:
+			entry[1] += 1
+			entry[2] += seconds
+		if cancelled:
+			entry[3] += 1
+			entry[4] += stopping
+
+	def solve(self, cells, timeout=None):
+		"""Solved flat cells of any board size, or None if there is no solution.
+
+		Raises TimeoutError if every strategy was stopped by the timeout
+		before it could answer.
+		"""
+		cells = list(cells)
+		start = time.perf_counter()
+		steps = strategy_steps("bitmask" if len(cells) == 81 else "exact-cover", cells,
+			max_nodes=INLINE_BUDGET * len(cells), max_seconds=timeout)
+		try:
+			next(steps)
+		except StopIteration as done:
+			self._count("inline", True, time.perf_counter() - start)
+			return done.value
+		steps.close()
+		self._count("inline")
+
+		self._cancel.clear()
+		results = queue.SimpleQueue()
+		lineup = self.lineup(cells)
+		raced = time.perf_counter()
+		for name in lineup:
+			self._pool.apply_async(_run, (name, cells, self.rng.randrange(1 << 63)),
+				callback=results.put, error_callback=results.put)
+		deadline = None if timeout is None else start + timeout
+		answer = winner = error = None
+		cancelled_at = None
+		for _ in lineup:
+			try:
+				wait = None if deadline is None or cancelled_at else max(0.0, deadline - time.perf_counter())
+				result = results.get(timeout=wait)
+			except queue.Empty:
+				self._cancel.set()
+				cancelled_at = time.perf_counter()
+				result = results.get()
+			if isinstance(result, BaseException): # Raised in a worker
+				error = error or result
+				continue
+			name, solved, cancelled, seconds = result
+			if cancelled:
+				self._count(name, cancelled=True, stopping=time.perf_counter() - cancelled_at)
+			elif winner is None: # Even past the deadline, a finished search is an answer
+				winner, answer = name, solved
+				self._count(name, True, time.perf_counter() - raced)
+				if cancelled_at is None:
+					self._cancel.set() # The rest stop at their next slice
+					cancelled_at = time.perf_counter()
+			else:
+				self._count(name) # Finished too late to win
+		if winner is None:
+			if error is not None:
+				raise error
+			raise TimeoutError(f"no strategy answered within {timeout}s")
+		return answer
+
+	def stats(self):
+		"""Per strategy ("inline" for the first run in this process): runs, wins,
+		mean seconds to win, and runs cancelled with their mean seconds to stop"""
+		return {
+			name: {
+				'runs': runs, 'wins': wins, 'win_time': won / wins if wins else 0.0,
+				'cancelled': cancelled, 'stop_time': stopping / cancelled if cancelled else 0.0,
+			}
+			for name, (runs, wins, won, cancelled, stopping) in sorted(self._stats.items())
+		}
+
+
+def random_grids(box, count, rng):
+	"""count boards with random diagonal boxes, as the generator starts from"""
+	import sudoku_generator
+	size = box * box
+	for _ in range(count):
+		board = [[0] * size for _ in range(size)]
+		sudoku_generator.fill_diagonal(board, rng, box)
+		yield [v for row in board for v in row]
+
+
+def read_puzzles(path):
+	from bulk_solve import parse_puzzle
+	with open(path) as f:
+		for line in f:
+			fields = line.split(None, 1)
+			cells = parse_puzzle(fields[0]) if fields else None
+			if cells is not None:
+				yield cells
+
+
+def summary(samples):
+	ordered = sorted(samples)
+	pick = lambda p: ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000
+	return f"p50 {pick(50):.1f} ms, p90 {pick(90):.1f} ms, max {ordered[-1] * 1000:.1f} ms"
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Solve puzzles with a portfolio of racing strategies")
+	parser.add_argument("input", nargs="?", help="file of 81-character puzzles")
+	parser.add_argument("--grids", type=int, metavar="BOX", help="fill random diagonal grids of this box size instead")
+	parser.add_argument("--count", type=int, default=20, help="grids to fill")
+	parser.add_argument("--workers", type=int, default=4, help="strategies raced at once")
+	parser.add_argument("--strategy", action="append", choices=STRATEGIES, help="strategy to race (repeatable, default: all)")
+	parser.add_argument("--timeout", type=float, help="seconds to give each puzzle")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--baseline", action="store_true", help="also time one seeded random search per puzzle")
+	args = parser.parse_args(argv)
+	if (args.input is None) == (args.grids is None):
+		parser.error("give a puzzle file or --grids")
+
+	rng = random.Random(args.seed)
+	puzzles = list(read_puzzles(args.input) if args.input else random_grids(args.grids, args.count, rng))
+	if not puzzles:
+		parser.error("no puzzles to solve")
+	times = []
+	unsolved = 0
+	with PortfolioSolver(args.workers, args.strategy or STRATEGIES, args.seed) as solver:
+		for cells in puzzles:
+			start = time.perf_counter()
+			try:
+				if solver.solve(cells, args.timeout) is None:
+					unsolved += 1
+			except TimeoutError:
+				unsolved += 1
+			times.append(time.perf_counter() - start)
+		stats = solver.stats()
+	print(f"portfolio: {len(puzzles)} puzzles, {unsolved} unsolved, {summary(times)}")
+	if args.baseline:
+		baseline = []
+		for cells in puzzles:
+			start = time.perf_counter()
+			steps = strategy_steps("bitmask-random" if len(cells) == 81 else "exact-cover-random",
+				cells, rng.randrange(1 << 63), max_nodes=None)
+			try:
+				next(steps)
+			except StopIteration:
+				pass
+			baseline.append(time.perf_counter() - start)
+		print(f"baseline:  {len(puzzles)} puzzles, {summary(baseline)}")
+	print(f"{'strategy':<20}{'runs':>6}{'wins':>6}{'win ms':>9}{'stopped':>9}{'stop ms':>9}")
+	for name, entry in stats.items():
+		print(f"{name:<20}{entry['runs']:>6}{entry['wins']:>6}{entry['win_time'] * 1000:>9.1f}"
+			f"{entry['cancelled']:>9}{entry['stop_time'] * 1000:>9.1f}")
+	return 1 if unsolved else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
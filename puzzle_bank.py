@@ -0,0 +1,181 @@
+"""Packed binary puzzle bank, read through mmap.
+
+File layout (little endian):
+
+	header   "SDKB", version u16, record size u16, group count u32
+	groups   difficulty u8, clue count u8, pad u16, first record u32, count u32
+	records  solution as 81 nibbles (41 bytes) + 81-bit givens mask (11 bytes)
+
+Records are sorted by (difficulty, clue count), so every group and every
+difficulty is a contiguous run of fixed-size records and puzzle N is found
+with one multiplication. Nothing is parsed up front besides the group table.
+
+Build a bank from bank_builder output with:
+
+	python puzzle_bank.py pack puzzle_bank puzzles.bank
+
+Packing drops puzzles that are another one in disguise (relabelled, rows or
+columns permuted, transposed), as found by canonical.DedupIndex.
+"""
+import glob
+import mmap
+import os
+import random
+import struct
+import sys
+
+MAGIC = b"SDKB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+GROUP = struct.Struct("<BBHII")
+SOLUTION_BYTES = 41
+MASK_BYTES = 11
+RECORD_SIZE = SOLUTION_BYTES + MASK_BYTES
+
+DIFFICULTY_CODES = {"easy": 0, "medium": 1, "hard": 2}
+DIFFICULTY_NAMES = {code: name for name, code in DIFFICULTY_CODES.items()}
+
+# Byte value -> its two cell values (high nibble first)
+_NIBBLES = [(b >> 4, b & 0xF) for b in range(256)]
+
+
+def pack_record(puzzle, solution):
+	"""Pack 81 puzzle cells and 81 solution cells into RECORD_SIZE bytes"""
+	solution = list(solution) + [0]
+	packed = bytearray(RECORD_SIZE)
+	for k in range(SOLUTION_BYTES):
+		packed[k] = solution[2 * k] << 4 | solution[2 * k + 1]
+	mask = 0
+	for i, v in enumerate(puzzle):
+		if v:
+			mask |= 1 << i
+	packed[SOLUTION_BYTES:] = mask.to_bytes(MASK_BYTES, "little")
+	return bytes(packed)
+
+
+def unpack_record(record):
+	"""Unpack a record into (puzzle, solution) as flat lists of 81 ints"""
+	solution = []
+	for b in record[:SOLUTION_BYTES]:
+		solution.extend(_NIBBLES[b])
+	del solution[81:]
+	mask = int.from_bytes(record[SOLUTION_BYTES:RECORD_SIZE], "little")
+	puzzle = [v if mask >> i & 1 else 0 for i, v in enumerate(solution)]
+	return puzzle, solution
+
+
+def to_board(cells):
+	return [list(cells[r * 9:r * 9 + 9]) for r in range(9)]
+
+
+def write_bank(path, entries, index=None):
+	"""Write (difficulty, puzzle, solution) entries to a bank file atomically.
+
+	puzzle and solution are 81 cells each, as lists or digit strings. With a
+	canonical.DedupIndex, puzzles equivalent to one already in it are skipped
+	(index.duplicates counts them).
+	"""
+	groups = {}
+	for difficulty, puzzle, solution in entries:
+		puzzle = [int(v) for v in puzzle]
+		if index is not None and not index.add(puzzle):
+			continue
+		solution = [int(v) for v in solution]
+		key = (DIFFICULTY_CODES[difficulty], 81 - puzzle.count(0))
+		groups.setdefault(key, bytearray()).extend(pack_record(puzzle, solution))
+
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "wb") as f:
+		f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, len(groups)))
+		first = 0
+		for key in sorted(groups):
+			count = len(groups[key]) // RECORD_SIZE
+			f.write(GROUP.pack(key[0], key[1], 0, first, count))
+			first += count
+		for key in sorted(groups):
+			f.write(groups[key])
+	os.replace(tmp_path, path)
+	return first
+
+
+class PuzzleBank:
+	"""Read-only, memory-mapped view of a bank file"""
+
+	def __init__(self, path):
+		with open(path, "rb") as f:
+			self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		self._view = memoryview(self._mmap)
+		magic, version, record_size, n_groups = HEADER.unpack_from(self._mmap, 0)
+		if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+			self.close()
+			raise ValueError(f"{path} is not a version {VERSION} puzzle bank")
+		self._records_offset = HEADER.size + n_groups * GROUP.size
+		self.groups = {} # (difficulty, clues) -> (first record, count)
+		self.difficulties = {} # difficulty -> (first record, count)
+		self.size = 0
+		for g in range(n_groups):
+			code, clues, _, first, count = GROUP.unpack_from(self._mmap, HEADER.size + g * GROUP.size)
+			difficulty = DIFFICULTY_NAMES[code]
+			self.groups[(difficulty, clues)] = (first, count)
+			start, total = self.difficulties.get(difficulty, (first, 0))
+			self.difficulties[difficulty] = (start, total + count)
+			self.size += count
+
+	def __len__(self):
+		return self.size
+
+	def close(self):
+		self._view.release()
+		self._mmap.close()
+
+	def count(self, difficulty, clues=None):
+		if clues is None:
+			return self.difficulties.get(difficulty, (0, 0))[1]
+		return self.groups.get((difficulty, clues), (0, 0))[1]
+
+	def record(self, index):
+		"""Zero-copy view of the packed record at a global index"""
+		offset = self._records_offset + index * RECORD_SIZE
+		return self._view[offset:offset + RECORD_SIZE]
+
+	def load(self, difficulty, n, clues=None):
+		"""The n-th puzzle of a difficulty (and clue count) as (board, solution)"""
+		key = difficulty if clues is None else (difficulty, clues)
+		first, count = (self.difficulties if clues is None else self.groups)[key]
+		if not 0 <= n < count:
+			raise IndexError(f"puzzle {n} out of range for {key} ({count} puzzles)")
+		puzzle, solution = unpack_record(self.record(first + n))
+		return to_board(puzzle), to_board(solution)
+
+	def random(self, difficulty, rng=random):
+		"""A random puzzle of a difficulty, or None if the bank has none"""
+		count = self.count(difficulty)
+		if not count:
+			return None
+		return self.load(difficulty, rng.randrange(count))
+
+
+def open_bank(path):
+	"""Open a bank file, or return None if it does not exist"""
+	if not os.path.exists(path):
+		return None
+	return PuzzleBank(path)
+
+
+def read_builder_output(bank_dir):
+	"""Yield (difficulty, puzzle, solution) from bank_builder chunk files"""
+	for difficulty in DIFFICULTY_CODES:
+		for path in sorted(glob.glob(os.path.join(bank_dir, difficulty, "chunk-*.txt"))):
+			with open(path) as f:
+				for line in f:
+					puzzle, solution = line.split()
+					yield difficulty, puzzle, solution
+
+
+if __name__ == "__main__":
+	if len(sys.argv) != 4 or sys.argv[1] != "pack":
+		sys.exit("usage: python puzzle_bank.py pack <bank_builder dir> <output file>")
+	import canonical
+	index = canonical.DedupIndex()
+	written = write_bank(sys.argv[3], read_builder_output(sys.argv[2]), index)
+	print(f"Packed {written} puzzles into {sys.argv[3]} ({index.duplicates} duplicates dropped)")
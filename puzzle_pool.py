@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+
+import sudoku_generator
+
+
+class PuzzlePool:
+	"""Keeps a few ready puzzles per difficulty, generated on background threads.
+
+	get() pops a ready (board, solution, seed) puzzle in O(1) or returns None when the
+	pool for that difficulty is empty, so the caller can fall back to
+	generating on demand. Hits and misses are counted per difficulty to help
+	size the depth.
+	"""
+
+	def __init__(self, depth=2, difficulties=("easy", "medium", "hard"), workers=1, unique=True):
+		self.depth = depth
+		self.workers = workers
+		self.unique = unique
+		self.ready = {d: deque() for d in difficulties}
+		self.pending = {d: 0 for d in difficulties}
+		self.hits = {d: 0 for d in difficulties}
+		self.misses = {d: 0 for d in difficulties}
+		self._cond = threading.Condition()
+		self._threads = []
+		self._stopped = False
+
+	def start(self):
+		for i in range(self.workers):
+			thread = threading.Thread(target=self._work, name=f"puzzle-pool-{i}", daemon=True)
+			thread.start()
+			self._threads.append(thread)
+		return self
+
+	def stop(self):
+		with self._cond:
+			self._stopped = True
+			self._cond.notify_all()
+		for thread in self._threads:
+			thread.join()
+		self._threads = []
+
+	def get(self, difficulty):
+		"""Pop a ready puzzle, or None if none is ready for this difficulty"""
+		with self._cond:
+			ready = self.ready.get(difficulty)
+			if not ready:
+				if difficulty in self.misses:
+					self.misses[difficulty] += 1
+				return None
+			self.hits[difficulty] += 1
+			puzzle = ready.popleft()
+			self._cond.notify()
+			return puzzle
+
+	def stats(self):
+		with self._cond:
+			return {
+				d: {"ready": len(self.ready[d]), "hits": self.hits[d], "misses": self.misses[d]}
+				for d in self.ready
+			}
+
+	def _most_needed(self):
+		# Refill the emptiest difficulty first
+		best = None
+		best_missing = 0
+		for d, ready in self.ready.items():
+			missing = self.depth - len(ready) - self.pending[d]
+			if missing > best_missing:
+				best, best_missing = d, missing
+		return best
+
+	def _work(self):
+		while True:
+			with self._cond:
+				difficulty = self._most_needed()
+				while difficulty is None and not self._stopped:
+					self._cond.wait()
+					difficulty = self._most_needed()
+				if self._stopped:
+					return
+				self.pending[difficulty] += 1
+			try:
+				if self.unique:
+					puzzle = sudoku_generator.generate_seeded(difficulty)
+				else:
+					puzzle = sudoku_generator.generate_puzzle(difficulty, False) + (0,)
+			finally:
+				with self._cond:
+					self.pending[difficulty] -= 1
+			with self._cond:
+				self.ready[difficulty].append(puzzle)
@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+	id INTEGER PRIMARY KEY,
+	difficulty TEXT NOT NULL,
+	time INTEGER NOT NULL,
+	mistakes INTEGER NOT NULL,
+	hints_used INTEGER NOT NULL DEFAULT 0,
+	date TEXT NOT NULL,
+	journal BLOB
+);
+CREATE INDEX IF NOT EXISTS scores_by_rank ON scores (difficulty, time, mistakes);
+CREATE INDEX IF NOT EXISTS scores_by_mistakes ON scores (difficulty, mistakes);
+"""
+
+# Leaderboard order, same as the old JSON file: fastest first, then fewest mistakes
+ORDER = "ORDER BY time, mistakes, id"
+
+
+class ScoreStore:
+	"""Full score history in SQLite with a cached leaderboard.
+
+	Every result is kept (the old JSON file only kept the top 10). Each write
+	is a single transaction, so a crash never leaves a half-written file, and
+	it drops the cached leaderboards so reads between writes never touch the
+	database.
+	"""
+
+	def __init__(self, path, legacy_json=None):
+		self.path = path
+		self._lock = threading.Lock()
+		self._cache = {}
+		self._conn = sqlite3.connect(path, check_same_thread=False)
+		self._conn.row_factory = sqlite3.Row
+		with self._conn:
+			self._conn.execute("PRAGMA journal_mode=WAL")
+			version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+			if version < SCHEMA_VERSION:
+				self._conn.executescript(SCHEMA)
+				if version == 1:
+					# Version 2 keeps the move journal (see journal.py) of every new result
+					self._conn.execute("ALTER TABLE scores ADD COLUMN journal BLOB")
+				elif legacy_json:
+					self._import_json(legacy_json)
+				self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+	def close(self):
+		self._conn.close()
+
+	def _import_json(self, path):
+		# One-time import of the old {"easy": [...], ...} high scores file
+		if not os.path.exists(path):
+			return
+		try:
+			with open(path, 'r') as f:
+				scores = json.load(f)
+		except (OSError, ValueError):
+			return
+		for difficulty, entries in scores.items():
+			for entry in entries:
+				self._insert(difficulty, entry)
+
+	def _insert(self, difficulty, entry):
+		self._conn.execute(
+			"INSERT INTO scores (difficulty, time, mistakes, hints_used, date, journal) VALUES (?, ?, ?, ?, ?, ?)",
+			(difficulty, int(entry['time']), int(entry['mistakes']), int(entry.get('hints_used', 0)), entry['date'],
+			entry.get('journal'))
+		)
+
+	def add(self, difficulty, entry):
+		"""Record a result atomically; entry has time, mistakes, date and optionally hints_used and journal"""
+		with self._lock, self._conn:
+			self._insert(difficulty, entry)
+			self._cache.clear()
+
+	def leaderboard(self, difficulty, limit=10):
+		"""Best results for a difficulty as dicts, served from cache until the next write"""
+		key = (difficulty, limit)
+		with self._lock:
+			rows = self._cache.get(key)
+			if rows is None:
+				rows = self._cache[key] = [
+					{'time': row['time'], 'mistakes': row['mistakes'], 'difficulty': row['difficulty'],
+					'date': row['date'], 'hints_used': row['hints_used']}
+					for row in self._conn.execute(
+						f"SELECT * FROM scores WHERE difficulty = ? {ORDER} LIMIT ?", (difficulty, limit))
+				]
+			return rows
+
+	def load_scores(self, limit=10):
+		"""Leaderboards for every difficulty, shaped like the old JSON file"""
+		with self._lock:
+			difficulties = self._cache.get('difficulties')
+			if difficulties is None:
+				difficulties = self._cache['difficulties'] = [
+					row[0] for row in self._conn.execute("SELECT DISTINCT difficulty FROM scores")
+				]
+		return {difficulty: self.leaderboard(difficulty, limit) for difficulty in difficulties}
+
+	def results(self, difficulty=None, batch=10000):
+		"""Every stored result with its id and journal (None for results from
+		before journals), oldest first; read batch rows at a time, so the
+		lock is never held for the whole history"""
+		last = 0
+		while True:
+			with self._lock:
+				if difficulty is None:
+					rows = self._conn.execute(
+						"SELECT * FROM scores WHERE id > ? ORDER BY id LIMIT ?", (last, batch)).fetchall()
+				else:
+					rows = self._conn.execute(
+						"SELECT * FROM scores WHERE id > ? AND difficulty = ? ORDER BY id LIMIT ?",
+						(last, difficulty, batch)).fetchall()
+			if not rows:
+				return
+			for row in rows:
+				yield dict(row)
+			last = rows[-1]['id']
+
+	def rank(self, difficulty, time, mistakes):
+		"""Where a result places: (rank, total results, percent of results it equals or beats)"""
+		with self._lock:
+			# Two index range counts on (difficulty, time, mistakes)
+			faster = self._conn.execute(
+				"SELECT COUNT(*) FROM scores WHERE difficulty = ? AND time < ?", (difficulty, time)
+			).fetchone()[0]
+			tied = self._conn.execute(
+				"SELECT COUNT(*) FROM scores WHERE difficulty = ? AND time = ? AND mistakes < ?",
+				(difficulty, time, mistakes)
+			).fetchone()[0]
+			total = self._conn.execute(
+				"SELECT COUNT(*) FROM scores WHERE difficulty = ?", (difficulty,)
+			).fetchone()[0]
+		better = faster + tied
+		percentile = 100.0 * (total - better) / total if total else 100.0
+		return better + 1, total, percentile
@@ -0,0 +1,290 @@
+"""Compact binary snapshots of a game in progress, and autosave.
+
+Layout (little endian, values bit-packed in cell order):
+
+	header    "SDKS", version u8, size u8, flags u8, difficulty u8,
+	          ratio f32, elapsed seconds u32, mistakes u16, hints used u16,
+	          selected cell u16 (0xFFFF for none)
+	solution  every cell, 4 bits per value on 9x9 (5 on 16x16 and 25x25)
+	masks     one bit per cell each: givens, entered cells, cells with notes
+	entries   value of every entered cell
+	notes     note mask (size bits) of every cell with notes
+	seed      u64, the puzzle's generate_seeded seed or 0 (version 2)
+
+A 9x9 game comes to 100-250 bytes. Locked and wrong cells are not stored:
+an entry is locked when it matches the solution and wrong otherwise, as
+place_number leaves them. The undo history is not kept either. Version 1
+snapshots, without the seed, still load.
+
+The move journal (see journal.py) grows with every move, so it is not part
+of the snapshot: the Autosaver writes it to a file of its own next to the
+snapshot, and loads() takes it as a separate argument.
+"""
+import os
+import struct
+import threading
+import time
+
+import journal
+from sudoku_core import Sudoku
+
+MAGIC = b"SDKS"
+VERSION = 2
+HEADER = struct.Struct("<4sBBBBfIHHH")
+SEED = struct.Struct("<Q")
+
+DIFFICULTY_CODES = {"easy": 0, "medium": 1, "hard": 2}
+DIFFICULTY_NAMES = {code: name for name, code in DIFFICULTY_CODES.items()}
+CUSTOM = 255 # A removal ratio, kept in the ratio field
+
+FLAG_AUTO_NOTES = 1
+NO_CELL = 0xFFFF
+
+# Autosave: write this long after the last change, but at most MAX_DELAY after the first unsaved one
+SAVE_DIR = "sudoku_saves"
+SAVE_DELAY = 1.0
+MAX_DELAY = 5.0
+
+
+# bits -> a translate table per value packed in a byte, lowest first
+_SPLIT = {
+	bits: [bytes(b >> k & (1 << bits) - 1 for b in range(256)) for k in range(0, 8, bits)]
+	for bits in (1, 4)
+}
+
+
+def pack_values(values, bits):
+	packed = 0
+	for k, v in enumerate(values):
+		packed |= v << (k * bits)
+	return packed.to_bytes((len(values) * bits + 7) // 8, "little")
+
+
+def unpack_values(data, offset, count, bits):
+	# Returns (values, offset after them)
+	end = offset + (count * bits + 7) // 8
+	if bits in _SPLIT:
+		# Masks and 9x9 values: one byte.translate per value in a byte, which
+		# journal.replay leans on; the generic way is 4x slower
+		values = bytearray(len(data[offset:end]) * 8 // bits)
+		for k, table in enumerate(_SPLIT[bits]):
+			values[k::8 // bits] = data[offset:end].translate(table)
+		return list(values[:count]), end
+	packed = int.from_bytes(data[offset:end], "little")
+	mask = (1 << bits) - 1
+	return [packed >> (k * bits) & mask for k in range(count)], end
+
+
+def dumps(game):
+	"""Snapshot of a game as bytes"""
+	cells = len(game.board)
+	bits = 4 if game.size == 9 else 5
+	if isinstance(game.difficulty, str):
+		difficulty, ratio = DIFFICULTY_CODES[game.difficulty], 0.0
+	else:
+		difficulty, ratio = CUSTOM, game.difficulty
+	selected = NO_CELL if game.selected is None else game.selected[0] * game.size + game.selected[1]
+	entered = [i for i in range(cells) if game.user_input[i]]
+	noted = [i for i in range(cells) if game.notes[i]]
+	return b"".join((
+		HEADER.pack(
+			MAGIC, VERSION, game.size, FLAG_AUTO_NOTES if game.auto_notes else 0, difficulty, ratio,
+			int(game.elapsed_time), game.mistakes, game.hints_used, selected
+		),
+		pack_values(game.solution, bits),
+		pack_values([1 if v else 0 for v in game.board], 1),
+		pack_values([1 if v else 0 for v in game.user_input], 1),
+		pack_values([1 if v else 0 for v in game.notes], 1),
+		pack_values([game.user_input[i] for i in entered], bits),
+		pack_values([game.notes[i] for i in noted], game.size),
+		SEED.pack(game.seed),
+	))
+
+
+def loads(data, journal_data=None):
+	"""Rebuild a Sudoku from dumps() output; raises ValueError if it is not a snapshot.
+
+	journal_data is the game's journal.dumps() from when the snapshot was
+	taken, or None; see journal.resume.
+	"""
+	if len(data) < HEADER.size:
+		raise ValueError("snapshot is truncated")
+	magic, version, size, flags, difficulty, ratio, elapsed, mistakes, hints_used, selected = HEADER.unpack_from(data)
+	if magic != MAGIC or version not in (1, VERSION) or size not in (9, 16, 25):
+		raise ValueError(f"not a version 1 or {VERSION} snapshot")
+	cells = size * size
+	bits = 4 if size == 9 else 5
+	offset = HEADER.size
+	solution, offset = unpack_values(data, offset, cells, bits)
+	givens, offset = unpack_values(data, offset, cells, 1)
+	entered, offset = unpack_values(data, offset, cells, 1)
+	noted, offset = unpack_values(data, offset, cells, 1)
+	entered = [i for i in range(cells) if entered[i]]
+	noted = [i for i in range(cells) if noted[i]]
+	entries, offset = unpack_values(data, offset, len(entered), bits)
+	notes, offset = unpack_values(data, offset, len(noted), size)
+	seed = 0
+	if version > 1:
+		if offset + SEED.size <= len(data):
+			seed, = SEED.unpack_from(data, offset)
+		offset += SEED.size
+	if offset > len(data):
+		raise ValueError("snapshot is truncated")
+
+	board = [v if given else 0 for v, given in zip(solution, givens)]
+	game = Sudoku(
+		difficulty=DIFFICULTY_NAMES.get(difficulty, round(ratio, 4)),
+		puzzle=([board[r * size:r * size + size] for r in range(size)], [solution[r * size:r * size + size] for r in range(size)], seed),
+		size=size,
+	)
+	for i, value in zip(entered, entries):
+		game.set_input(i, value)
+		if value == solution[i]:
+			game.locked[i] = True
+		else:
+			game.incorrect_cells.add((i // size, i % size))
+	for i, mask in zip(noted, notes):
+		game.notes[i] = mask
+	game.auto_notes = bool(flags & FLAG_AUTO_NOTES)
+	game.mistakes = mistakes
+	game.hints_used = hints_used
+	journal.resume(game, journal_data)
+	# The journal keeps time to a hundredth of a second, finer than the header
+	elapsed = max(elapsed, game.journal.clock / 100)
+	game.elapsed_time = elapsed
+	game.start_time = time.time() - elapsed
+	game.journal.record(journal.MARK, 0, journal.RESUME, elapsed)
+	if selected != NO_CELL:
+		game.selected = (selected // size, selected % size)
+	return game
+
+
+def slot_name(difficulty, size=9):
+	# One save per leaderboard bucket, named like Sudoku.score_key
+	return difficulty if size == 9 else f"{difficulty} {size}x{size}"
+
+
+class Autosaver:
+	"""Writes game snapshots on a background thread.
+
+	save() takes the snapshot and the move journal on the caller's thread
+	(they are small and the game must not change under them) and queues
+	them; the thread writes them SAVE_DELAY after the last save() for that
+	slot, so a burst of moves is one write. Files are replaced atomically,
+	the journal (.jnl) before the snapshot (.sav). There is one slot per
+	difficulty and board size, and load() returns the queued game if it has
+	not reached the disk yet.
+	"""
+
+	def __init__(self, directory=SAVE_DIR, delay=SAVE_DELAY, max_delay=MAX_DELAY):
+		self.directory = directory
+		self.delay = delay
+		self.max_delay = max_delay
+		self.writes = 0
+		self._pending = {} # slot -> [first change, due time, (snapshot, journal) or None to delete]
+		self._writing = {} # slot -> (snapshot, journal) being written right now
+		self._cond = threading.Condition()
+		self._thread = None
+		self._stopped = False
+
+	def start(self):
+		self._thread = threading.Thread(target=self._work, name="autosave", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		"""Write everything still queued, then end the thread"""
+		with self._cond:
+			self._stopped = True
+			self._cond.notify()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	def path(self, slot, extension=".sav"):
+		return os.path.join(self.directory, slot.replace(" ", "-") + extension)
+
+	def save(self, game):
+		self._queue(game.score_key(), (dumps(game), journal.dumps(game)))
+
+	def discard(self, game):
+		# A finished game is not resumed
+		self._queue(game.score_key(), None)
+
+	def _queue(self, slot, data):
+		now = time.monotonic()
+		with self._cond:
+			first = self._pending[slot][0] if slot in self._pending else now
+			self._pending[slot] = [first, min(now + self.delay, first + self.max_delay), data]
+			self._cond.notify()
+
+	def load(self, difficulty, size=9):
+		"""The unfinished game saved for a difficulty and size, or None"""
+		slot = slot_name(difficulty, size)
+		with self._cond:
+			if slot in self._pending:
+				data = self._pending[slot][2]
+			else:
+				data = self._writing.get(slot, False)
+		try:
+			if data is False:
+				with open(self.path(slot), "rb") as f:
+					data = f.read(), self._read_journal(slot)
+			return None if data is None else loads(*data)
+		except (OSError, ValueError):
+			return None
+
+	def _read_journal(self, slot):
+		# A missing journal only makes the game's score unverifiable
+		try:
+			with open(self.path(slot, ".jnl"), "rb") as f:
+				return f.read()
+		except OSError:
+			return None
+
+	def _work(self):
+		while True:
+			with self._cond:
+				while True:
+					now = time.monotonic()
+					due = [slot for slot, (_, at, _) in self._pending.items() if self._stopped or at <= now]
+					if due or self._stopped:
+						break
+					wait = min(at for _, at, _ in self._pending.values()) - now if self._pending else None
+					self._cond.wait(wait)
+				for slot in due:
+					self._writing[slot] = self._pending.pop(slot)[2]
+				writes = list(self._writing.items())
+				stopped = self._stopped
+			for slot, data in writes:
+				self._write(slot, data)
+			with self._cond:
+				self._writing.clear()
+			if stopped:
+				return
+
+	def _write(self, slot, data):
+		try:
+			if data is None:
+				for extension in (".sav", ".jnl"):
+					if os.path.exists(self.path(slot, extension)):
+						os.remove(self.path(slot, extension))
+				return
+			os.makedirs(self.directory, exist_ok=True)
+			snapshot, moves = data
+			# journal.resume checks the two still agree, in case a crash falls between the writes
+			self._replace(self.path(slot, ".jnl"), moves)
+			self._replace(self.path(slot), snapshot)
+			self.writes += 1
+		except OSError:
+			pass # A failed autosave must not take the game down; the next change tries again
+
+	def _replace(self, path, data):
+		if data is None:
+			if os.path.exists(path):
+				os.remove(path)
+			return
+		tmp_path = path + ".tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(data)
+		os.replace(tmp_path, path)
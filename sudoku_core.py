@@ -0,0 +1,378 @@
+"""Game state and rules of Sudoku, without any pygame dependency.
+
+Sudoku_game.py is the pygame front-end on top of this module; workers,
+servers and scripts can import it without a display. Imports are kept to
+what playing a given puzzle needs: the generator (and random) are loaded on
+the first generate_board, sqlite3 (through score_store) when scores are
+first used, and notes are a memoryview rather than an array.array, which
+would pull in collections.
+"""
+import time
+
+import candidate_engine
+import difficulty_rater
+import instrumentation
+import journal
+import sudoku_solver
+import undo_log
+
+# High scores database; the old JSON file is imported into it the first time
+SCORES_DB_FILE = "sudoku_scores.db"
+HIGH_SCORES_FILE = "sudoku_scores.json"
+SCORE_STORE = None
+
+# Undo entries kept per game before old ones are compacted
+HISTORY_LIMIT = 500
+
+
+def get_score_store():
+	# Opened on first use so the menu and scores screen work before any game
+	global SCORE_STORE
+	if SCORE_STORE is None:
+		import score_store
+		SCORE_STORE = score_store.ScoreStore(SCORES_DB_FILE, legacy_json=HIGH_SCORES_FILE)
+	return SCORE_STORE
+
+
+class Sudoku:
+	# Fixed attribute set and flat storage keep a game small (one bytearray per
+	# grid, one bit per digit per cell for notes) when many sessions are hosted
+	__slots__ = (
+		'board', 'solution', 'user_input', 'notes', 'locked', 'incorrect_cells',
+		'selected', 'start_time', 'elapsed_time', 'mistakes', 'game_over',
+		'difficulty', 'history', 'remaining', 'rating', 'candidates', 'auto_notes',
+		'hints_used', 'size', 'box', 'journal', 'seed', 'revealed'
+	)
+	
+	def __init__(self, difficulty=0.5, unique=True, puzzle=None, size=9):
+		self.size = size # Cạnh bảng: 9, 16 hoặc 25
+		self.box = int(size ** 0.5) # Cạnh một khối: 3, 4 hoặc 5
+		# Các lưới lưu phẳng size * size ô, ô (row, col) ở vị trí row * size + col
+		cells = size * size
+		self.board = bytearray(cells) # Khởi tạo bảng chơi toàn số 0
+		self.solution = bytearray(cells) # Lưu lời giả hoàn chỉnh
+		self.user_input = bytearray(cells) # Ghi lại số người chơi đã nhập
+		note_bytes = 2 if size <= 16 else 4 # Mỗi ô một mặt nạ 16 hoặc 32 bit
+		self.notes = memoryview(bytearray(cells * note_bytes)).cast('H' if note_bytes == 2 else 'I') # Ghi chú: bit (num-1) bật khi có ghi chú num
+		self.locked = bytearray(cells) # Ô là số gốc thì không thể sửa
+		self.incorrect_cells = set() # Tập hợp chứa tọa độ các ô nhập sai
+		self.selected = None # Tọa độ của ô đang được chọn
+		self.start_time = time.time() # Thời gian bắt đầu chơi (để tính giờ)
+		self.elapsed_time = 0 # Thời gian đã chơi (tính đến hiện tại)
+		self.mistakes = 0 # Số lần nhập sai
+		self.game_over = False # Cờ báo hiệu trò chơi kết thúc hay chưa
+		self.difficulty = difficulty # Mức độ khó của trò chơi
+		self.history = undo_log.UndoLog(HISTORY_LIMIT) # Lưu lịch sử thao tác (để hoàn tác / làm lại)
+		self.auto_notes = False # Tự động điền ghi chú từ các số còn hợp lệ
+		self.hints_used = 0 # Số lần dùng gợi ý
+		self.journal = journal.Journal() # Nhật ký nước đi, để kiểm chứng điểm số
+		self.revealed = False # Lời giải do máy điền (solve_steps), không tính điểm
+		if puzzle is not None:
+			self.set_puzzle(*puzzle) # Dùng bảng đã sinh sẵn (board, solution[, seed])
+		else:
+			self.generate_board(difficulty, unique) # Sinh bảng theo độ khó
+	
+	def generate_board(self, difficulty, unique=True):
+		# Fill the diagonal boxes, solve, then remove numbers to create the puzzle.
+		# With unique=True each removal is checked so the puzzle keeps one solution
+		# and place_number never rejects a valid alternative answer; such puzzles
+		# get a seed that regenerates them.
+		import sudoku_generator
+		if unique:
+			self.set_puzzle(*sudoku_generator.generate_seeded(difficulty, box=self.box))
+		else:
+			self.set_puzzle(*sudoku_generator.generate_puzzle(difficulty, False, box=self.box))
+	
+	def set_puzzle(self, board, solution, seed=0):
+		# Accepts size x size lists (as generated) and stores them flat;
+		# seed is the generate_seeded seed, 0 when the puzzle has none
+		self.seed = seed
+		self.board = bytearray(v for row in board for v in row)
+		self.solution = bytearray(v for row in solution for v in row)
+		self.remaining = self.board.count(0) # Số ô trống chưa nhập, để kiểm tra hoàn thành O(1)
+		if self.size == 9:
+			self.rating = difficulty_rater.rate(self.board) # (độ khó, kỹ thuật khó nhất cần dùng)
+		else:
+			self.rating = (None, None) # Bộ chấm độ khó chỉ dùng cho bảng 9x9
+		self.candidates = candidate_engine.CandidateEngine(self.board, self.box) # Các số còn hợp lệ của từng ô
+	
+	def is_valid(self, board, row, col, num):
+		# Check row
+		if num in board[row]:
+			return False
+		
+		# Check column
+		for i in range(self.size):
+			if board[i][col] == num:
+				return False
+		
+		# Check box
+		start_row, start_col = self.box * (row // self.box), self.box * (col // self.box)
+		for i in range(self.box):
+			for j in range(self.box):
+				if board[start_row + i][start_col + j] == num:
+					return False
+		
+		return True
+	
+	def solve_board(self, board):
+		# Bitmask solver with singles propagation, values tried in random order;
+		# exact cover on larger boards
+		import random
+		record = instrumentation.start("solve", size=self.size)
+		with instrumentation.phase(record, "full solve"):
+			if self.size == 9:
+				solved = sudoku_solver.solve(board, random, record)
+			else:
+				import dlx_solver
+				solved = dlx_solver.solve_cells([v for row in board for v in row], random, record)
+				if solved is not None:
+					for r in range(self.size):
+						board[r][:] = solved[r * self.size:(r + 1) * self.size]
+				solved = solved is not None
+		instrumentation.finish(record)
+		return solved
+	
+	def solve_steps(self, max_nodes=None, max_seconds=None):
+		# Show the solution: search from the givens and the correct entries,
+		# putting the search's cells on the board after every slice of
+		# max_nodes nodes or max_seconds seconds and yielding True. Ends with
+		# the board solved and the game over without a score; closing the
+		# generator part way puts the player's entries back
+		cells = [v or (self.user_input[i] if self.locked[i] else 0) for i, v in enumerate(self.board)]
+		if self.size == 9:
+			steps = sudoku_solver.solve_steps(cells, None, max_nodes, max_seconds)
+		else:
+			import dlx_solver
+			steps = dlx_solver.ExactCover(self.box).solve_steps(cells, None, max_nodes, max_seconds)
+		saved = (bytes(self.user_input), self.notes.tolist(), set(self.incorrect_cells))
+		self.incorrect_cells.clear()
+		try:
+			while True:
+				try:
+					shown = next(steps)
+				except StopIteration as done:
+					solved = done.value
+					break
+				self.show_cells(shown)
+				yield True
+		except GeneratorExit:
+			steps.close()
+			entries, notes, incorrect = saved
+			self.show_cells(entries)
+			for i, mask in enumerate(notes):
+				self.notes[i] = mask
+			self.incorrect_cells = incorrect
+			raise
+		self.show_cells(solved or self.solution)
+		for i in range(len(self.board)):
+			self.locked[i] = True
+		self.update_time()
+		self.revealed = True
+		self.game_over = True
+	
+	def show_cells(self, cells):
+		# Put flat cells into the entries of the empty cells, clearing their notes
+		for i, v in enumerate(cells):
+			if not self.board[i] and self.user_input[i] != v:
+				self.notes[i] = 0
+				self.set_input(i, v)
+	
+	def set_input(self, i, value):
+		# Keep the count of empty cells in step with user_input
+		if self.user_input[i] and not value:
+			self.remaining += 1
+		elif value and not self.user_input[i]:
+			self.remaining -= 1
+		self.user_input[i] = value
+		# Only the cell and its peers (20 on a 9x9 board) change candidates
+		self.candidates.set(i, value)
+		if self.auto_notes:
+			self.fill_notes(self.candidates.peers[i])
+	
+	def log_move(self, op, row=0, col=0, num=0):
+		# Timestamped entry in the move journal
+		self.journal.record(op, row * self.size + col, num, time.time() - self.start_time)
+	
+	def place_number(self, row, col, num):
+		self.log_move(journal.PLACE, row, col, num)
+		return self._place(row, col, num)
+	
+	def _place(self, row, col, num):
+		i = row * self.size + col
+		if self.locked[i]:
+			return False  # Không cho sửa ô đã bị khóa
+		
+		before = self.cell_state(row, col)
+		
+		# Clear any notes for this cell
+		self.notes[i] = 0
+		
+		if num == 0:
+			self.set_input(i, 0)
+			self.incorrect_cells.discard((row, col))
+			correct = True
+		elif self.solution[i] == num:
+			self.set_input(i, num)
+			self.incorrect_cells.discard((row, col))
+			self.locked[i] = True
+			correct = True
+		else:
+			self.set_input(i, num)
+			self.incorrect_cells.add((row, col))
+			self.mistakes += 1
+			correct = False
+		
+		self.history.record(row, col, before, self.cell_state(row, col))
+		return correct
+	
+	def toggle_note(self, row, col, num):
+		self.log_move(journal.NOTE, row, col, num)
+		i = row * self.size + col
+		if self.locked[i]:
+			return
+		
+		if self.board[i] == 0 and self.user_input[i] == 0:
+			before = self.cell_state(row, col)
+			self.notes[i] ^= 1 << (num-1)
+			self.history.record(row, col, before, self.cell_state(row, col))
+	
+	def clear_notes(self, row, col):
+		self.log_move(journal.CLEAR_NOTES, row, col)
+		i = row * self.size + col
+		if self.notes[i]:
+			before = self.cell_state(row, col)
+			self.notes[i] = 0
+			self.history.record(row, col, before, self.cell_state(row, col))
+	
+	def has_note(self, row, col, num):
+		return self.notes[row * self.size + col] >> (num-1) & 1
+	
+	def fill_notes(self, cells=None):
+		# Auto-notes: empty cells show their live candidates
+		for i in cells if cells is not None else range(len(self.board)):
+			if self.board[i] == 0 and self.user_input[i] == 0:
+				self.notes[i] = self.candidates.cands[i]
+	
+	def toggle_auto_notes(self):
+		self.log_move(journal.AUTO_NOTES)
+		self.auto_notes = not self.auto_notes
+		if self.auto_notes:
+			self.fill_notes()
+	
+	def hint(self):
+		# Next step as (row, col, num, technique), or None when the board is full.
+		# A wrong entry is pointed out first, since deductions made around it are wrong too.
+		# Correct entries clashing with it are highlighted as well, so those come last.
+		wrong = [divmod(i, self.size) for i, v in enumerate(self.user_input) if v and v != self.solution[i]]
+		if not wrong:
+			wrong = [(row, col) for row, col in self.highlighted_cells() if self.board[row * self.size + col] == 0]
+		if wrong:
+			row, col = min(wrong)
+			return row, col, self.solution[row * self.size + col], "conflict"
+		found = self.candidates.hint()
+		if found:
+			i, num, technique = found
+			return i // self.size, i % self.size, num, technique
+		# Beyond singles: reveal the most constrained empty cell from the solution
+		empty = [i for i in range(len(self.board)) if self.board[i] == 0 and self.user_input[i] == 0]
+		if not empty:
+			return None
+		i = min(empty, key=lambda i: bin(self.candidates.cands[i]).count("1"))
+		return i // self.size, i % self.size, self.solution[i], "reveal"
+	
+	def use_hint(self):
+		# Select the hinted cell and fill it in, unless it is a mistake to fix first
+		hint = self.hint()
+		if hint:
+			row, col, num, technique = hint
+			self.selected = (row, col)
+			if technique != "conflict":
+				self.log_move(journal.HINT, row, col, num)
+				self.hints_used += 1
+				self._place(row, col, num)
+		return hint
+	
+	def highlighted_cells(self):
+		# Wrong entries plus every cell whose digit repeats in its row, column or box
+		cells = set(self.incorrect_cells)
+		for i in self.candidates.conflicts():
+			cells.add((i // self.size, i % self.size))
+		return cells
+	
+	def cell_state(self, row, col):
+		# Everything an operation on this cell can change, as stored in the undo log
+		i = row * self.size + col
+		return (
+			self.user_input[i],
+			self.notes[i],
+			(row, col) in self.incorrect_cells,
+			self.locked[i],
+			self.mistakes
+		)
+	
+	def restore_cell(self, row, col, state):
+		i = row * self.size + col
+		value, notes, incorrect, locked, mistakes = state
+		self.set_input(i, value)
+		self.notes[i] = notes
+		if incorrect:
+			self.incorrect_cells.add((row, col))
+		else:
+			self.incorrect_cells.discard((row, col))
+		self.locked[i] = locked
+		self.mistakes = mistakes
+	
+	def undo(self):
+		self.log_move(journal.UNDO)
+		entry = self.history.undo()
+		if entry:
+			row, col, before, _ = entry
+			self.restore_cell(row, col, before)
+	
+	def redo(self):
+		self.log_move(journal.REDO)
+		entry = self.history.redo()
+		if entry:
+			row, col, _, after = entry
+			self.restore_cell(row, col, after)
+	
+	def is_complete(self):
+		# Every empty cell has an entry once the remaining count reaches zero.
+		# The score is saved once, timed at the finishing move
+		if self.remaining:
+			return False
+		if self.game_over:
+			return True
+		self.update_time()
+		self.game_over = True
+		self.save_score()
+		return True
+	
+	def score_key(self):
+		# Leaderboard bucket: the chosen level, or the rated grade for custom removal ratios
+		if isinstance(self.difficulty, str):
+			key = self.difficulty
+		else:
+			grade = self.rating[0]
+			key = grade if grade in ("easy", "medium") else "hard"
+		# Larger boards get leaderboards of their own
+		return key if self.size == 9 else f"{key} {self.size}x{self.size}"
+	
+	def save_score(self):
+		score_entry = {
+			'time': int(self.elapsed_time),
+			'mistakes': self.mistakes,
+			'hints_used': self.hints_used,
+			'difficulty': self.difficulty,
+			'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+			'journal': journal.dumps(self)
+		}
+		get_score_store().add(self.score_key(), score_entry)
+	
+	def load_scores(self):
+		return get_score_store().load_scores()
+	
+	def update_time(self):
+		if not self.game_over:
+			self.elapsed_time = time.time() - self.start_time
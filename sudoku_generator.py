@@ -0,0 +1,367 @@
+import random
+
+import difficulty_rater
+import dlx_solver
+import instrumentation
+import sudoku_solver
+from instrumentation import phase
+from sudoku_solver import ROW_OF, COL_OF, BOX_OF
+
+# Set difficulty levels
+DIFFICULTY_LEVELS = {
+	"easy": 0.5,    # Remove ~50% of numbers
+	"medium": 0.6,   # Remove ~60% of numbers
+	"hard": 0.7      # Remove ~70% of numbers
+}
+
+# Fresh solutions tried before settling for the closest rated puzzle. Each
+# try rates every removal (about 30ms for hard), and the rater's hard band is
+# narrow enough that more tries rarely land in it, so this is kept small
+RATING_ATTEMPTS = 3
+
+# Boards above 9x9: search nodes per cell before restarting a solution from a
+# new random diagonal, and exact-cover uniqueness checks allowed per puzzle
+# (by box size) once removals that singles can undo run out
+SOLVE_BUDGET = 2
+LARGE_SEARCHES = {4: 16, 5: 6}
+
+# Boards above 9x9 are too big to rate, so their levels differ in what a
+# removal may leave for the player instead: (hidden singles, searches).
+# Easy puzzles fall to naked singles alone, medium ones need hidden singles,
+# hard ones also get cells only an exact-cover search shows are forced
+LARGE_LEVELS = {
+	"easy": (False, False),
+	"medium": (True, False),
+	"hard": (True, True),
+}
+
+
+def removal_ratio(difficulty):
+	"""Turn "easy"/"medium"/"hard" or a float into the fraction of cells to blank"""
+	if isinstance(difficulty, str):
+		return DIFFICULTY_LEVELS.get(difficulty, 0.6)
+	return difficulty
+
+
+def fill_diagonal(board, rng=random, box=3):
+	"""Fill the diagonal boxes (3x3 on a 9x9 board) with random numbers"""
+	size = box * box
+	for start in range(0, size, box):
+		nums = list(range(1, size + 1))
+		rng.shuffle(nums)
+		for i in range(box):
+			for j in range(box):
+				board[start + i][start + j] = nums.pop()
+
+
+def generate_solution(rng=random, box=3, stats=None):
+	"""Build a random complete grid as flat cells (81 for the default 9x9).
+
+	stats is an optional instrumentation.Record for counters and phase times.
+	"""
+	if box == 3:
+		board = [[0 for _ in range(9)] for _ in range(9)]
+		with phase(stats, "diagonal fill"):
+			fill_diagonal(board, rng)
+		with phase(stats, "full solve"):
+			sudoku_solver.solve(board, rng, stats)
+		return sudoku_solver.board_to_cells(board)
+	# Larger boards: exact cover with random restarts, which cuts off the rare
+	# searches that would otherwise run for minutes on a 25x25 board
+	size = box * box
+	solver = dlx_solver.ExactCover(box)
+	while True:
+		board = [[0 for _ in range(size)] for _ in range(size)]
+		with phase(stats, "diagonal fill"):
+			fill_diagonal(board, rng, box)
+		try:
+			with phase(stats, "full solve"):
+				return solver.solve(sudoku_solver.board_to_cells(board), rng, SOLVE_BUDGET * size * size, stats)
+		except dlx_solver.SearchLimit:
+			continue
+
+
+def remove_random(solution, to_remove, rng=random):
+	"""Blank to_remove random cells without checking uniqueness"""
+	puzzle = list(solution)
+	cells = list(range(len(solution)))
+	rng.shuffle(cells)
+	for i in cells[:to_remove]:
+		puzzle[i] = 0
+	return puzzle
+
+
+def remove_unique(solution, to_remove, rng=random, until=None, stats=None, allow=None):
+	"""Blank up to to_remove cells one at a time, keeping a unique solution.
+
+	Cells are tried in random order, preferring the ones whose row, column and
+	box still hold the most clues so the givens stay evenly spread (sparse
+	units are where alternative solutions appear first). A clue that cannot be
+	removed stays necessary for the rest of the run, so every cell is tried at
+	most once. Returns fewer blanks than asked for if no further clue can go.
+
+	If until is given, removal carries on past to_remove until until(puzzle)
+	returns True. If allow is given, a removal it returns False for (called
+	with the puzzle after the removal, before until) is undone like one that
+	breaks uniqueness.
+	"""
+	puzzle = list(solution)
+	row_clues = [9] * 9
+	col_clues = [9] * 9
+	box_clues = [9] * 9
+	remaining = list(range(81))
+	rng.shuffle(remaining)
+	removed = 0
+	done = until is None
+	while remaining and (removed < to_remove or not done):
+		best = 0
+		best_score = -1
+		for k, i in enumerate(remaining):
+			score = row_clues[ROW_OF[i]] + col_clues[COL_OF[i]] + box_clues[BOX_OF[i]]
+			if score > best_score:
+				best, best_score = k, score
+		i = remaining.pop(best)
+		value = puzzle[i]
+		puzzle[i] = 0
+		if sudoku_solver.has_other_solution(puzzle, i, value, stats):
+			puzzle[i] = value
+			continue
+		if allow is not None and not allow(puzzle):
+			puzzle[i] = value
+			continue
+		removed += 1
+		row_clues[ROW_OF[i]] -= 1
+		col_clues[COL_OF[i]] -= 1
+		box_clues[BOX_OF[i]] -= 1
+		if removed >= to_remove and not done:
+			done = until(puzzle)
+	return puzzle
+
+
+def _deducible(puzzle, i, box, used, hidden=True):
+	"""True if empty cell i is a naked single in puzzle, or a hidden one with hidden=True.
+
+	used holds the digit mask of the givens of every unit, numbered as in
+	sudoku_solver.geometry.
+	"""
+	units, cell_units, _ = sudoku_solver.geometry(box)
+	r, c, b = cell_units[i]
+	free = ~(used[r] | used[c] | used[b]) & ((1 << box * box) - 1)
+	if not free & (free - 1):
+		return True
+	while hidden and free:
+		digit = free & -free
+		free ^= digit
+		for u in (r, c, b):
+			for j in units[u]:
+				if j != i and not puzzle[j]:
+					rj, cj, bj = cell_units[j]
+					if not (used[rj] | used[cj] | used[bj]) & digit:
+						break # digit still fits elsewhere in this unit
+			else:
+				return True
+	return False
+
+
+def remove_large(solution, to_remove, rng=random, box=4, stats=None, hidden=True, searches=None):
+	"""Blank up to to_remove cells of a board above 9x9, keeping a unique solution.
+
+	A removal is free when the blanked cell is a naked single in what is
+	left (or a hidden one, with hidden=True), since it can then be filled
+	straight back in; the puzzle is then solved by singles in the reverse
+	order of removal. Other cells need an exact-cover search per alternative
+	digit, so only searches of those are tried (LARGE_SEARCHES by default);
+	cells whose search runs over budget are kept.
+	"""
+	size = box * box
+	if searches is None:
+		searches = LARGE_SEARCHES.get(box, 0)
+	_, cell_units, _ = sudoku_solver.geometry(box)
+	puzzle = list(solution)
+	used = [(1 << size) - 1] * (3 * size)
+	cells = list(range(size * size))
+	rng.shuffle(cells)
+	solver = None
+	removed = 0
+	for i in cells:
+		if removed >= to_remove:
+			break
+		value = puzzle[i]
+		digit = 1 << (value - 1)
+		r, c, b = cell_units[i]
+		puzzle[i] = 0
+		used[r] &= ~digit
+		used[c] &= ~digit
+		used[b] &= ~digit
+		unique = _deducible(puzzle, i, box, used, hidden)
+		if not unique and searches > 0:
+			searches -= 1
+			solver = solver or dlx_solver.ExactCover(box)
+			unique = True
+			taken = used[r] | used[c] | used[b]
+			for d in range(1, size + 1):
+				if d == value or taken >> (d - 1) & 1:
+					continue
+				puzzle[i] = d
+				try:
+					unique = solver.solve(puzzle, max_nodes=size * size, stats=stats) is None
+				except dlx_solver.SearchLimit:
+					unique = False
+				if not unique:
+					break
+			puzzle[i] = 0
+		if unique:
+			removed += 1
+		else:
+			puzzle[i] = value
+			used[r] |= digit
+			used[c] |= digit
+			used[b] |= digit
+	return puzzle
+
+
+def grade_rank(puzzle):
+	"""Index of the puzzle's grade in difficulty_rater.GRADES"""
+	return difficulty_rater.GRADES.index(difficulty_rater.rate(puzzle)[0])
+
+
+def remove_rated(solution, difficulty, rng=random, stats=None):
+	"""Remove clues until the rater grades the puzzle at difficulty.
+
+	Returns (puzzle, grade rank). Removal goes on past the removal ratio of
+	the difficulty until the grade is reached. Grades only get harder as
+	clues are removed, but one removal can skip a grade, so removals that make
+	the puzzle too hard are undone and other clues tried instead. If the
+	grade is never hit, the result is whichever is closer of where removal
+	stopped and the first puzzle that was too hard (the harder on a tie).
+	"""
+	target = difficulty_rater.GRADES.index(difficulty)
+	ranks = []
+	over = [] # (rank, puzzle) of the first removal that went too far
+
+	def not_too_hard(puzzle):
+		ranks.append(grade_rank(puzzle))
+		if ranks[-1] > target and not over:
+			over.append((ranks[-1], list(puzzle)))
+		return ranks[-1] <= target
+
+	def hard_enough(puzzle):
+		return ranks[-1] >= target
+
+	to_remove = int(81 * removal_ratio(difficulty))
+	puzzle = remove_unique(solution, to_remove, rng, until=hard_enough, stats=stats, allow=not_too_hard)
+	rank = grade_rank(puzzle)
+	if rank < target and over and over[0][0] - target <= target - rank:
+		rank, puzzle = over[0]
+	return puzzle, rank
+
+
+def generate_puzzle(difficulty="medium", unique=True, rng=random, rated=True, box=3):
+	"""Generate a puzzle; returns (board, solution) as 9x9 lists.
+
+	With unique=True clues are removed one at a time and each removal is
+	checked so the puzzle keeps exactly one solution. For "easy", "medium" and
+	"hard" with rated=True the puzzle must also be graded at that level by
+	difficulty_rater; after RATING_ATTEMPTS misses the closest puzzle is used,
+	the harder one on a tie (so hard falls back to a puzzle beyond the
+	rater's techniques rather than a medium one).
+
+	box=4 or box=5 gives a 16x16 or 25x25 board (size x size lists); those are
+	built by exact cover and are not rated, and "easy", "medium" and "hard"
+	pick the techniques of LARGE_LEVELS. Singles run out before the removal
+	ratio is reached, so these levels blank fewer cells than on 9x9.
+
+	When instrumentation has a sink, each call sends it a "generate" record.
+	"""
+	record = instrumentation.start("generate", difficulty=difficulty, box=box)
+	if box != 3:
+		size = box * box
+		solution = generate_solution(rng, box, record)
+		to_remove = int(size * size * removal_ratio(difficulty))
+		with phase(record, "clue removal"):
+			if unique:
+				hidden, search = LARGE_LEVELS.get(difficulty, LARGE_LEVELS["hard"])
+				searches = LARGE_SEARCHES.get(box, 0) if search else 0
+				puzzle = remove_large(solution, to_remove, rng, box, record, hidden, searches)
+			else:
+				puzzle = remove_random(solution, to_remove, rng)
+		instrumentation.finish(record)
+		board = [puzzle[r * size:r * size + size] for r in range(size)]
+		return board, [solution[r * size:r * size + size] for r in range(size)]
+	if unique and rated and difficulty in DIFFICULTY_LEVELS:
+		target = difficulty_rater.GRADES.index(difficulty)
+		best = None
+		attempts = 0
+		for _ in range(RATING_ATTEMPTS):
+			attempts += 1
+			solution = generate_solution(rng, 3, record)
+			with phase(record, "clue removal"):
+				puzzle, rank = remove_rated(solution, difficulty, rng, record)
+			miss = (abs(rank - target), rank < target)
+			if best is None or miss < best[0]:
+				best = (miss, puzzle, solution)
+			if rank == target:
+				break
+		_, puzzle, solution = best
+		if record is not None:
+			record.context['attempts'] = attempts
+	else:
+		solution = generate_solution(rng, 3, record)
+		to_remove = int(81 * removal_ratio(difficulty))
+		with phase(record, "clue removal"):
+			if unique:
+				puzzle = remove_unique(solution, to_remove, rng, stats=record)
+			else:
+				puzzle = remove_random(solution, to_remove, rng)
+	instrumentation.finish(record)
+	board = [puzzle[r * 9:r * 9 + 9] for r in range(9)]
+	return board, [solution[r * 9:r * 9 + 9] for r in range(9)]
+
+
+def transform_puzzle(board, solution, rng=random):
+	"""A random symmetry of a puzzle and its solution, given as flat cells.
+
+	Relabels the digits, shuffles rows within bands and columns within stacks,
+	shuffles the bands and the stacks, and transposes half the time; both
+	grids get the same transform, returned as size x size lists. The result
+	plays exactly like the original (same solution, same grade) and costs
+	tens of microseconds instead of a generator run. Works for any box size.
+	"""
+	size = int(len(board) ** 0.5)
+	box = int(size ** 0.5)
+
+	def line_order():
+		bands = list(range(box))
+		rng.shuffle(bands)
+		order = []
+		for band in bands:
+			lines = list(range(band * box, band * box + box))
+			rng.shuffle(lines)
+			order += lines
+		return order
+
+	row_order, col_order = line_order(), line_order()
+	relabel = list(range(1, size + 1))
+	rng.shuffle(relabel)
+	relabel.insert(0, 0) # Blanks stay blank
+	if rng.random() < 0.5:
+		# Transposed: cell (r, c) comes from (c, r)
+		return tuple(
+			[[relabel[cells[c * size + r]] for c in col_order] for r in row_order] for cells in (board, solution)
+		)
+	return tuple(
+		[[relabel[cells[r * size + c]] for c in col_order] for r in row_order] for cells in (board, solution)
+	)
+
+
+def generate_seeded(difficulty="medium", box=3, seed=None):
+	"""generate_puzzle() with unique=True from its own random.Random(seed).
+
+	Returns (board, solution, seed); a new seed is drawn when none is given.
+	The same seed, difficulty and box always give the same puzzle, so the
+	seed is enough to regenerate the puzzle a game was played on.
+	"""
+	if seed is None:
+		seed = random.randrange(1, 1 << 63)
+	board, solution = generate_puzzle(difficulty, True, random.Random(seed), box=box)
+	return board, solution, seed
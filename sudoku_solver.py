@@ -0,0 +1,337 @@
+# Bitmask Sudoku solver.
+# Row, column and box occupancy are kept as 9-bit masks (bit d-1 set when
+# digit d is used), so a candidate lookup is a couple of ORs instead of the
+# row/column/box scans done by Sudoku.is_valid.
+
+ALL_DIGITS = 0x1FF
+
+ROW_OF = [i // 9 for i in range(81)]
+COL_OF = [i % 9 for i in range(81)]
+BOX_OF = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+
+
+_GEOMETRY = {} # box -> tables; a plain dict keeps functools out of the import
+
+def geometry(box=3):
+	"""Unit tables for a board of box x box boxes: (units, cell_units, peers).
+
+	units lists the rows, then columns, then boxes as lists of cell indexes;
+	cell_units[i] is the (row, column, box) unit numbers of cell i and
+	peers[i] the cells sharing a unit with it (20 on a 9x9 board).
+	"""
+	if box in _GEOMETRY:
+		return _GEOMETRY[box]
+	size = box * box
+	units = (
+		[[r * size + c for c in range(size)] for r in range(size)]
+		+ [[r * size + c for r in range(size)] for c in range(size)]
+		+ [[((b // box) * box + k // box) * size + (b % box) * box + k % box for k in range(size)] for b in range(size)]
+	)
+	cell_units = [
+		(i // size, size + i % size, 2 * size + (i // size // box) * box + i % size // box)
+		for i in range(size * size)
+	]
+	peers = [sorted({j for u in cell_units[i] for j in units[u]} - {i}) for i in range(size * size)]
+	_GEOMETRY[box] = units, cell_units, peers
+	return _GEOMETRY[box]
+
+
+# The 27 units (rows, columns, boxes) of the 9x9 board, and the units and
+# 20 peers of each cell
+UNITS, CELL_UNITS, PEERS = geometry(3)
+
+BIT = [0] + [1 << (d - 1) for d in range(1, 10)]
+DIGIT_OF = {1 << (d - 1): d for d in range(1, 10)}
+# Digits of every 9-bit mask in ascending order, each list built from the
+# mask without its highest digit (cheaper at import than testing all 9 bits)
+DIGITS_OF = [[]]
+for _m in range(1, 512):
+	DIGITS_OF.append(DIGITS_OF[_m & ~(1 << (_m.bit_length() - 1))] + [_m.bit_length()])
+POPCOUNT = [len(_d) for _d in DIGITS_OF]
+
+
+def board_to_cells(board):
+	"""Flatten a 9x9 list-of-lists board into a list of 81 ints"""
+	return [v for row in board for v in row]
+
+
+def cells_to_board(cells, board):
+	"""Copy 81 flat cells back into a 9x9 list-of-lists board"""
+	for r in range(9):
+		board[r][:] = cells[r * 9:r * 9 + 9]
+
+
+def _masks(cells):
+	"""Build row/column/box masks, or None if the givens already clash"""
+	rows = [0] * 9
+	cols = [0] * 9
+	boxes = [0] * 9
+	for i in range(81):
+		v = cells[i]
+		if v:
+			bit = BIT[v]
+			r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+			if (rows[r] | cols[c] | boxes[b]) & bit:
+				return None
+			rows[r] |= bit
+			cols[c] |= bit
+			boxes[b] |= bit
+	return rows, cols, boxes
+
+
+def _propagate(cells, rows, cols, boxes):
+	"""Apply naked and hidden singles until nothing changes.
+
+	Returns (index, candidates) of the most constrained empty cell,
+	(-1, 0) when the grid is full, or None on a contradiction.
+	"""
+	while True:
+		progress = False
+		best = -1
+		best_cands = 0
+		best_count = 10
+		# Naked singles, and pick the most constrained cell on the way
+		for i in range(81):
+			if cells[i]:
+				continue
+			r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+			cands = ALL_DIGITS & ~(rows[r] | cols[c] | boxes[b])
+			if not cands:
+				return None
+			if not cands & (cands - 1):
+				cells[i] = DIGIT_OF[cands]
+				rows[r] |= cands
+				cols[c] |= cands
+				boxes[b] |= cands
+				progress = True
+			elif not progress:
+				count = POPCOUNT[cands]
+				if count < best_count:
+					best, best_cands, best_count = i, cands, count
+		if progress:
+			continue
+
+		# Hidden singles: a digit with only one possible cell in a unit
+		for unit in UNITS:
+			once = twice = placed = 0
+			for i in unit:
+				v = cells[i]
+				if v:
+					placed |= BIT[v]
+					continue
+				cands = ALL_DIGITS & ~(rows[ROW_OF[i]] | cols[COL_OF[i]] | boxes[BOX_OF[i]])
+				twice |= once & cands
+				once |= cands
+			if (once | placed) != ALL_DIGITS:
+				return None
+			hidden = once & ~twice
+			while hidden:
+				bit = hidden & -hidden
+				hidden ^= bit
+				for i in unit:
+					if not cells[i] and not (rows[ROW_OF[i]] | cols[COL_OF[i]] | boxes[BOX_OF[i]]) & bit:
+						cells[i] = DIGIT_OF[bit]
+						rows[ROW_OF[i]] |= bit
+						cols[COL_OF[i]] |= bit
+						boxes[BOX_OF[i]] |= bit
+						break
+				else:
+					# Another hidden single already took the only cell
+					return None
+				progress = True
+		if not progress:
+			return best, best_cands
+
+
+def _search(cells, rows, cols, boxes, rng, stats=None):
+	"""Depth-first search with propagation; returns solved cells or None.
+
+	stats, if given, is an instrumentation.Record whose search counters are
+	updated.
+	"""
+	try:
+		next(_steps(cells, rows, cols, boxes, rng, None, None, stats))
+	except StopIteration as done:
+		return done.value
+
+
+def solve_cells(cells, rng=None, stats=None):
+	"""Solve 81 flat cells; returns a new solved list or None.
+
+	Pass an rng (e.g. the random module) to randomize the value order, and
+	an instrumentation.Record as stats to count the search.
+	"""
+	masks = _masks(cells)
+	if masks is None:
+		return None
+	return _search(list(cells), *masks, rng, stats)
+
+
+def solve_steps(cells, rng=None, max_nodes=None, max_seconds=None, stats=None):
+	"""solve_cells as a generator that can be paused, with an explicit stack.
+
+	Searches the same nodes in the same order as solve_cells (so the same rng
+	gives the same solution), but yields the cells of the node it is at after
+	every max_nodes nodes or max_seconds seconds, whichever comes first; with
+	neither it never yields. The solved cells, or None, are the generator's
+	return value (what `yield from` gives). Stop iterating to cancel.
+	"""
+	masks = _masks(cells)
+	if masks is None:
+		return None
+	return (yield from _steps(list(cells), *masks, rng, max_nodes, max_seconds, stats))
+
+
+def _steps(cells, rows, cols, boxes, rng, max_nodes, max_seconds, stats):
+	# The search of solve_steps from a node given with its masks; a stack
+	# rather than recursion, at the same speed
+	if max_seconds is not None:
+		from time import perf_counter
+		deadline = perf_counter() + max_seconds
+	left = max_nodes
+	stack = [] # (cells, rows, cols, boxes, cell, digits left) of every node with children to try
+	node = (cells, rows, cols, boxes)
+	while True:
+		cells, rows, cols, boxes = node
+		if stats is not None:
+			stats.nodes += 1
+			if len(stack) > stats.max_depth:
+				stats.max_depth = len(stack)
+		found = _propagate(cells, rows, cols, boxes)
+		fresh = False
+		if found is not None:
+			i, cands = found
+			if i < 0:
+				return cells
+			digits = DIGITS_OF[cands]
+			if rng is not None:
+				digits = rng.sample(digits, len(digits))
+			stack.append((cells, rows, cols, boxes, i, iter(digits)))
+			fresh = True
+		if left is not None:
+			left -= 1
+			if not left:
+				yield cells
+				left = max_nodes
+				if max_seconds is not None:
+					deadline = perf_counter() + max_seconds
+		if max_seconds is not None and perf_counter() >= deadline:
+			yield cells
+			left = max_nodes
+			deadline = perf_counter() + max_seconds
+		# Next digit of the deepest node that has one left
+		while stack:
+			if fresh:
+				fresh = False
+			elif stats is not None:
+				stats.backtracks += 1 # The last child tried here failed
+			cells, rows, cols, boxes, i, digits = stack[-1]
+			d = next(digits, 0)
+			if d:
+				break
+			stack.pop()
+		else:
+			return None
+		if stats is not None:
+			stats.candidates += 1
+		bit = BIT[d]
+		r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+		next_cells = cells[:]
+		next_cells[i] = d
+		next_rows = rows[:]
+		next_cols = cols[:]
+		next_boxes = boxes[:]
+		next_rows[r] |= bit
+		next_cols[c] |= bit
+		next_boxes[b] |= bit
+		node = (next_cells, next_rows, next_cols, next_boxes)
+
+
+def solve(board, rng=None, stats=None):
+	"""Solve a 9x9 board in place, like Sudoku.solve_board. Returns True if solved"""
+	solved = solve_cells(board_to_cells(board), rng, stats)
+	if solved is None:
+		return False
+	cells_to_board(solved, board)
+	return True
+
+
+
+def _count(cells, rows, cols, boxes, limit, found=None):
+	"""Count solutions below this node, stopping once limit is reached.
+
+	The first solution reached is appended to found, if given.
+	"""
+	node = _propagate(cells, rows, cols, boxes)
+	if node is None:
+		return 0
+	i, cands = node
+	if i < 0:
+		if found is not None and not found:
+			found.append(cells)
+		return 1
+	r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+	total = 0
+	for d in DIGITS_OF[cands]:
+		bit = BIT[d]
+		next_cells = cells[:]
+		next_cells[i] = d
+		next_rows = rows[:]
+		next_cols = cols[:]
+		next_boxes = boxes[:]
+		next_rows[r] |= bit
+		next_cols[c] |= bit
+		next_boxes[b] |= bit
+		total += _count(next_cells, next_rows, next_cols, next_boxes, limit - total, found)
+		if total >= limit:
+			break
+	return total
+
+
+def count_solutions(cells, limit=2):
+	"""Count the solutions of 81 flat cells, stopping early at limit"""
+	masks = _masks(cells)
+	if masks is None:
+		return 0
+	return _count(list(cells), *masks, limit)
+
+
+def solve_unique(cells):
+	"""Solve 81 flat cells and check uniqueness in one search.
+
+	Returns (first solution or None, number of solutions found up to 2).
+	"""
+	masks = _masks(cells)
+	if masks is None:
+		return None, 0
+	found = []
+	count = _count(list(cells), *masks, 2, found)
+	return (found[0] if found else None), count
+
+
+def has_other_solution(cells, index, value, stats=None):
+	"""True if the puzzle can be solved with something other than value at index.
+
+	cells[index] must be empty. When the puzzle is known to be solvable with
+	value there, this is a uniqueness check that only needs one search per
+	alternative digit instead of a full two-solution count.
+	"""
+	masks = _masks(cells)
+	if masks is None:
+		return False
+	rows, cols, boxes = masks
+	r, c, b = ROW_OF[index], COL_OF[index], BOX_OF[index]
+	cands = ALL_DIGITS & ~(rows[r] | cols[c] | boxes[b]) & ~BIT[value]
+	for d in DIGITS_OF[cands]:
+		bit = BIT[d]
+		next_cells = list(cells)
+		next_cells[index] = d
+		next_rows = rows[:]
+		next_cols = cols[:]
+		next_boxes = boxes[:]
+		next_rows[r] |= bit
+		next_cols[c] |= bit
+		next_boxes[b] |= bit
+		if _search(next_cells, next_rows, next_cols, next_boxes, None, stats) is not None:
+			return True
+	return False
@@ -0,0 +1,61 @@
+from collections import deque
+
+# Entries kept before the oldest ones are compacted
+DEFAULT_MAX_ENTRIES = 500
+
+
+class UndoLog:
+	"""Undo/redo log of single-cell changes.
+
+	Every operation in the game touches one cell, so an entry is just
+	(row, col, before, after), where before/after are whatever state tuple the
+	game records for that cell. Undo and redo move one entry between the two
+	stacks in O(1).
+
+	When the log grows past max_entries the oldest entries are compacted:
+	two oldest entries for the same cell are merged into one, otherwise the
+	oldest entry is dropped.
+	"""
+
+	def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+		self.max_entries = max_entries
+		self.done = deque()
+		self.undone = []
+
+	def __len__(self):
+		return len(self.done)
+
+	def record(self, row, col, before, after):
+		if before == after:
+			return
+		self.done.append((row, col, before, after))
+		self.undone.clear()
+		if len(self.done) > self.max_entries:
+			self.compact()
+
+	def undo(self):
+		"""Pop the last change, or None; apply its before state"""
+		if not self.done:
+			return None
+		entry = self.done.pop()
+		self.undone.append(entry)
+		return entry
+
+	def redo(self):
+		"""Pop the last undone change, or None; apply its after state"""
+		if not self.undone:
+			return None
+		entry = self.undone.pop()
+		self.done.append(entry)
+		return entry
+
+	def compact(self):
+		while len(self.done) > self.max_entries:
+			row, col, before, _ = self.done.popleft()
+			next_row, next_col, _, after = self.done[0]
+			if (row, col) == (next_row, next_col):
+				self.done[0] = (row, col, before, after)
+
+	def clear(self):
+		self.done.clear()
+		self.undone.clear()